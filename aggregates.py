@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Enregistrements compacts (__slots__) des agrégats de EnterpriseMonitor.
+Pas de dict par instance : chaque compteur est un attribut typé, ce qui réduit
+la RSS par endpoint et remplace les lookups par clé texte dans la boucle de parsing.
+"""
+
+import os
+import random
+from collections import defaultdict
+
+from rollups import merge_buffer
+from routes import ROUTE_OVERFLOW, endpoint_key
+from sketches import QuantileSketch, UniqueCounter
+
+# Taille du réservoir d'événements par (jour, heure) pour le Session Inspector
+HOURLY_SAMPLE_SIZE = int(os.getenv("HOURLY_SAMPLE_SIZE", "2500"))
+# Graine optionnelle pour un échantillon reproductible
+_rng = random.Random(os.getenv("HOURLY_SAMPLE_SEED"))
+
+# Champs des tuples d'événements stockés dans les réservoirs
+EVENT_FIELDS = ('time', 'ip', 'path', 'sql', 'dur', 'mem', 'type', 'cc')
+
+
+class OverviewStats:
+    __slots__ = ('total_reqs', 'total_sql', 'total_egress_kb', 'max_ram', 'unique_ips')
+
+    def __init__(self):
+        self.total_reqs = 0
+        self.total_sql = 0
+        self.total_egress_kb = 0.0
+        self.max_ram = 0.0
+        self.unique_ips = UniqueCounter(precision=14)
+
+    def merge(self, other):
+        self.total_reqs += other.total_reqs
+        self.total_sql += other.total_sql
+        self.total_egress_kb += other.total_egress_kb
+        if other.max_ram > self.max_ram: self.max_ram = other.max_ram
+        self.unique_ips.merge(other.unique_ips)
+
+
+class DailyBucket:
+    __slots__ = ('reqs', 'sql', 'egress_kb', 'ips', 'duration_sum')
+
+    def __init__(self):
+        self.reqs = 0
+        self.sql = 0
+        self.egress_kb = 0.0
+        self.ips = UniqueCounter()
+        self.duration_sum = 0.0
+
+    def merge(self, other):
+        self.reqs += other.reqs
+        self.sql += other.sql
+        self.egress_kb += other.egress_kb
+        self.ips.merge(other.ips)
+        self.duration_sum += other.duration_sum
+
+
+class HourlyBucket:
+    __slots__ = ('reqs', 'sql', 'egress_kb', 'ips')
+
+    def __init__(self):
+        self.reqs = 0
+        self.sql = 0
+        self.egress_kb = 0.0
+        self.ips = UniqueCounter()
+
+    def merge(self, other):
+        self.reqs += other.reqs
+        self.sql += other.sql
+        self.egress_kb += other.egress_kb
+        self.ips.merge(other.ips)
+
+
+class HistoryBucket:
+    """Historique journalier d'un endpoint."""
+    __slots__ = ('hits', 'sql_sum', 'dur_sum', 'mem_max')
+
+    def __init__(self):
+        self.hits = 0
+        self.sql_sum = 0
+        self.dur_sum = 0.0
+        self.mem_max = 0.0
+
+    def merge(self, other):
+        self.hits += other.hits
+        self.sql_sum += other.sql_sum
+        self.dur_sum += other.dur_sum
+        if other.mem_max > self.mem_max: self.mem_max = other.mem_max
+
+    @property
+    def avg_sql(self):
+        return self.sql_sum / self.hits if self.hits else 0
+
+
+class EndpointStats:
+    """
+    Statistiques cumulées d'un endpoint.
+    sql/rows/egress partagent le compteur `hits` ; le sketch des durées n'est
+    alloué qu'à la première durée observée (les endpoints WEB n'en ont souvent pas).
+    """
+    __slots__ = ('hits', 'type', 'sql_total', 'rows_total', 'egress_kb', 'dur_sketch', 'mem_max', 'history')
+
+    def __init__(self):
+        self.hits = 0
+        self.type = 'WEB'
+        self.sql_total = 0
+        self.rows_total = 0
+        self.egress_kb = 0.0
+        self.dur_sketch = None
+        self.mem_max = 0.0
+        self.history = defaultdict(HistoryBucket)
+
+    def add_duration(self, duration):
+        if self.dur_sketch is None:
+            self.dur_sketch = QuantileSketch()
+        self.dur_sketch.add(duration)
+
+    def merge(self, other):
+        """Fusionne un agrégat partiel postérieur (le type suit la dernière ligne vue, comme en séquentiel)."""
+        self.hits += other.hits
+        self.type = other.type
+        self.sql_total += other.sql_total
+        self.rows_total += other.rows_total
+        self.egress_kb += other.egress_kb
+        if other.dur_sketch is not None:
+            if self.dur_sketch is None:
+                self.dur_sketch = other.dur_sketch
+            else:
+                self.dur_sketch.merge(other.dur_sketch)
+        if other.mem_max > self.mem_max: self.mem_max = other.mem_max
+        _merge_map(self.history, other.history)
+
+    @property
+    def avg_sql(self):
+        return self.sql_total / self.hits if self.hits else 0
+
+    @property
+    def avg_rows(self):
+        return self.rows_total / self.hits if self.hits else 0
+
+
+class EventReservoir:
+    """
+    Échantillon uniforme (algorithme R) des événements d'une heure.
+    `seen` compte tous les événements offerts, `events` en garde au plus `size`
+    sous forme de tuples (EVENT_FIELDS), quel que soit le moment de l'heure.
+    """
+    __slots__ = ('size', 'seen', 'events')
+
+    def __init__(self, size=HOURLY_SAMPLE_SIZE):
+        self.size = size
+        self.seen = 0
+        self.events = []
+
+    def slot(self):
+        """Index où ranger l'événement offert, -1 s'il n'est pas retenu (le tuple n'est construit qu'au besoin)."""
+        self.seen += 1
+        n = len(self.events)
+        if n < self.size:
+            self.events.append(None)
+            return n
+        # Retenu avec une probabilité size/seen, à une place uniforme
+        r = _rng.random() * self.seen
+        return int(r) if r < self.size else -1
+
+    @property
+    def sampled(self):
+        return self.seen > len(self.events)
+
+    def merge(self, other):
+        """Échantillon uniforme de l'union : chaque tirage vient de A ou B au prorata des événements restants."""
+        if self.seen + other.seen <= self.size:
+            self.events.extend(other.events)
+            self.seen += other.seen
+            return
+        pool_a, pool_b = list(self.events), list(other.events)
+        _rng.shuffle(pool_a)
+        _rng.shuffle(pool_b)
+        left_a, left_b = self.seen, other.seen
+        merged = []
+        for _ in range(self.size):
+            if _rng.random() * (left_a + left_b) < left_a:
+                merged.append(pool_a.pop())
+                left_a -= 1
+            else:
+                merged.append(pool_b.pop())
+                left_b -= 1
+        self.events = merged
+        self.seen += other.seen
+
+    def __len__(self):
+        return len(self.events)
+
+
+def new_hourly_day():
+    return defaultdict(HourlyBucket)
+
+
+def new_events_day():
+    return defaultdict(EventReservoir)
+
+
+def new_stats(with_events=False, with_rollups=False):
+    """
+    Agrégats vides ; `with_events` ajoute le stockage colonnaire de tous les événements (NumPy),
+    `with_rollups` le buffer {(route, date, 'HH:MM'): compteurs} versé ensuite dans les rollups SQLite.
+    """
+    events = None
+    if with_events:
+        from event_store import EventStore
+        events = EventStore()
+    return {
+        'overview': OverviewStats(),
+        'daily': defaultdict(DailyBucket),
+        'hourly': defaultdict(new_hourly_day),
+        'hourly_events': defaultdict(new_events_day),
+        'endpoints': defaultdict(EndpointStats),
+        'events': events,
+        'rollups': {} if with_rollups else None
+    }
+
+
+def _merge_map(into, other):
+    # Clé absente : on reprend l'objet tel quel (l'ordre d'insertion reste celui du premier passage)
+    for key, value in other.items():
+        if key in into:
+            into[key].merge(value)
+        else:
+            into[key] = value
+
+
+def merge_stats(into, other):
+    """
+    Fusionne l'agrégat partiel `other` (plage de fichier postérieure) dans `into`.
+    Appelé dans l'ordre des plages, le résultat est celui du parcours séquentiel.
+    """
+    into['overview'].merge(other['overview'])
+    _merge_map(into['daily'], other['daily'])
+    for date, hours in other['hourly'].items():
+        _merge_map(into['hourly'][date], hours)
+    for date, hours in other['hourly_events'].items():
+        _merge_map(into['hourly_events'][date], hours)
+    # Même plafond de templates qu'en séquentiel : les routes en trop rejoignent ROUTE_OVERFLOW
+    endpoints = into['endpoints']
+    for route, value in other['endpoints'].items():
+        key = endpoint_key(endpoints, route)
+        if key in endpoints:
+            endpoints[key].merge(value)
+        else:
+            endpoints[key] = value
+    if into['events'] is not None and other['events'] is not None:
+        into['events'].merge(other['events'])
+    if into['rollups'] is not None and other['rollups'] is not None:
+        merge_buffer(into['rollups'], other['rollups'], lambda route: route if route in endpoints else ROUTE_OVERFLOW)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Détection de régressions par endpoint (NumPy) : SQL par requête, durée par requête et
+pic mémoire sont comparés à la référence propre de chaque endpoint — moyenne et variance
+EWMA de ses périodes précédentes — au lieu de seuils fixes sur la moyenne à vie.
+Une matrice métriques × endpoints × périodes ; la récurrence EWMA avance d'une colonne
+à la fois sur tous les endpoints et toutes les métriques (T pas vectorisés, pas E × T en Python).
+"""
+
+import os
+
+import numpy as np
+
+# z-score au-delà duquel une période est signalée (hausse seulement : une baisse n'est pas une régression)
+ANOMALY_Z = float(os.getenv("ANOMALY_Z", "4"))
+# Poids de la dernière période dans la référence EWMA
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.2"))
+# Périodes observées avant de juger un endpoint
+ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", "7"))
+# Requêtes minimum pour qu'une période compte (moyennes trop bruitées en dessous)
+ANOMALY_MIN_HITS = int(os.getenv("ANOMALY_MIN_HITS", "20"))
+# Seules les `window` dernières périodes sont rapportées
+ANOMALY_WINDOW = {'day': 3, 'hour': 6}
+# Jours de rollups horaires analysés (24 périodes par jour)
+ANOMALY_HOURLY_DAYS = int(os.getenv("ANOMALY_HOURLY_DAYS", "7"))
+
+METRICS = ('sql', 'dur', 'mem')
+# Écart-type plancher : max(relatif × référence, absolu) ; une référence parfaitement stable
+# ne transforme pas un écart minuscule en z-score énorme
+STD_FLOOR_RELATIVE = 0.1
+STD_FLOOR_ABSOLUTE = np.array([1.0, 0.05, 5.0])  # requêtes, secondes, MB
+
+
+class HistoryMatrix:
+    """
+    Séries denses d'endpoints sur des périodes régulières : hits[E, T] et values[M, E, T]
+    (M = METRICS : SQL / requête, durée / requête, pic mémoire) ; périodes sans trafic à 0.
+    """
+    __slots__ = ('routes', 'periods', 'hits', 'values')
+
+    def __init__(self, routes, periods, hits, values):
+        self.routes = routes
+        self.periods = periods
+        self.hits = hits
+        self.values = values
+
+    @classmethod
+    def from_columns(cls, routes, periods, row, col, hits, sql_sum, dur_sum, mem_max):
+        """Construit les matrices depuis des colonnes (endpoint, période) en une affectation vectorisée."""
+        shape = (len(routes), len(periods))
+        # float32 : 50k endpoints × 90 jours × 3 métriques tiennent en ~55 MB
+        matrix_hits = np.zeros(shape, dtype=np.float32)
+        values = np.zeros((len(METRICS),) + shape, dtype=np.float32)
+        matrix_hits[row, col] = hits
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values[0, row, col] = np.where(hits > 0, sql_sum / hits, 0)
+            values[1, row, col] = np.where(hits > 0, dur_sum / hits, 0)
+        values[2, row, col] = mem_max
+        return cls(routes, periods, matrix_hits, values)
+
+    @classmethod
+    def from_endpoints(cls, endpoints, dates):
+        """Historique journalier (EndpointStats.history) des endpoints sur `dates` (triées)."""
+        col_of = {d: i for i, d in enumerate(dates)}
+        routes, row, col, hits, sql_sum, dur_sum, mem_max = [], [], [], [], [], [], []
+        for path, data in endpoints.items():
+            i = len(routes)
+            kept = False
+            for d, h in data.history.items():
+                c = col_of.get(d)
+                if c is None or not h.hits: continue
+                row.append(i)
+                col.append(c)
+                hits.append(h.hits)
+                sql_sum.append(h.sql_sum)
+                dur_sum.append(h.dur_sum)
+                mem_max.append(h.mem_max)
+                kept = True
+            if kept: routes.append(path)
+        return cls.from_columns(
+            routes, list(dates), np.array(row, dtype=np.intp), np.array(col, dtype=np.intp),
+            np.array(hits, dtype=np.float64), np.array(sql_sum, dtype=np.float64),
+            np.array(dur_sum, dtype=np.float64), np.array(mem_max, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_rollups(cls, db, tier, start, size):
+        """Lignes par endpoint d'un niveau de rollups SQLite (ex. 'hour') depuis `start` (epoch)."""
+        rows = db.execute(
+            "SELECT endpoint, bucket, reqs, sql, dur_sum, mem_max FROM rollups "
+            "WHERE tier = ? AND endpoint != '' AND bucket >= ? AND reqs > 0", (tier, start)
+        ).fetchall()
+        if not rows:
+            return cls([], [], np.zeros((0, 0)), np.zeros((len(METRICS), 0, 0)))
+        names, buckets, hits, sql_sum, dur_sum, mem_max = zip(*rows)
+        routes, row = np.unique(np.array(names, dtype=object), return_inverse=True)
+        buckets = np.array(buckets, dtype=np.int64)
+        first = buckets.min()
+        col = (buckets - first) // size
+        periods = [int(first + i * size) for i in range(int(col.max()) + 1)]
+        return cls.from_columns(
+            list(routes), periods, row, col, np.array(hits, dtype=np.float64),
+            np.array(sql_sum, dtype=np.float64), np.array(dur_sum, dtype=np.float64),
+            np.array(mem_max, dtype=np.float64),
+        )
+
+
+def ewma_zscores(hits, values, alpha=ANOMALY_ALPHA, warmup=ANOMALY_WARMUP, min_hits=ANOMALY_MIN_HITS):
+    """
+    z-scores [M, E, T] de chaque période face à la référence EWMA des périodes observées avant elle,
+    et la référence [M, E, T] correspondante. Les périodes non observées (trafic < min_hits,
+    ou pas de mémoire mesurée) ne jugent ni ne bougent la référence ; z = 0 avant `warmup` observations.
+    """
+    n_metrics, n_routes, n_periods = values.shape
+    # Parcours en temps : copies [T, M, E] pour que chaque pas lise et écrive des blocs contigus
+    series = np.ascontiguousarray(values.transpose(2, 0, 1))
+    observed = np.repeat((hits >= min_hits).T[:, None, :], n_metrics, axis=1)
+    # Pic mémoire absent (ligne sans champ Mem) : pas une observation à 0 MB
+    observed[:, 2] &= series[:, 2] > 0
+    mean = np.zeros((n_metrics, n_routes), dtype=np.float32)
+    var = np.zeros((n_metrics, n_routes), dtype=np.float32)
+    count = np.zeros((n_metrics, n_routes), dtype=np.int32)
+    zscores = np.zeros(series.shape, dtype=np.float32)
+    baselines = np.empty(series.shape, dtype=np.float32)
+    floor_absolute = STD_FLOOR_ABSOLUTE[:n_metrics, None].astype(np.float32)
+    for t in range(n_periods):
+        x, obs = series[t], observed[t]
+        std = np.maximum(np.sqrt(var), np.maximum(STD_FLOOR_RELATIVE * np.abs(mean), floor_absolute))
+        judged = obs & (count >= warmup)
+        np.divide(x - mean, std, out=zscores[t], where=judged)
+        baselines[t] = mean
+        # Mise à jour EWMA (moyenne puis variance) des seules séries observées ; la première observation initialise
+        diff = np.where(obs, x - mean, 0)
+        incr = alpha * diff
+        var = (1 - alpha) * (var + diff * incr) * obs + var * ~obs
+        mean += incr
+        first = obs & (count == 0)
+        mean[first] = x[first]
+        var[first] = 0
+        count += obs
+    zscores, baselines = zscores.transpose(1, 2, 0), baselines.transpose(1, 2, 0)
+    return zscores, baselines
+
+
+def find_anomalies(matrix, threshold=ANOMALY_Z, window=3, **options):
+    """
+    Régressions des `window` dernières périodes : pour chaque (endpoint, métrique), la plus récente
+    au-delà de `threshold`. Liste de dicts triée par z décroissant.
+    """
+    if not matrix.routes or not matrix.periods:
+        return []
+    zscores, baselines = ewma_zscores(matrix.hits, matrix.values, **options)
+    recent = zscores[:, :, -window:]
+    flagged = recent > threshold
+    hit = flagged.any(axis=2)
+    # Dernière période signalée de chaque série
+    last = recent.shape[2] - 1 - np.argmax(flagged[:, :, ::-1], axis=2)
+    offset = zscores.shape[2] - recent.shape[2]
+    anomalies = []
+    for m, e in zip(*np.nonzero(hit)):
+        t = offset + last[m, e]
+        anomalies.append({
+            'path': matrix.routes[e],
+            'metric': METRICS[m],
+            'period': matrix.periods[t],
+            'value': round(float(matrix.values[m, e, t]), 3),
+            'baseline': round(float(baselines[m, e, t]), 3),
+            'z': round(float(zscores[m, e, t]), 1),
+            'hits': int(matrix.hits[e, t]),
+        })
+    anomalies.sort(key=lambda a: -a['z'])
+    return anomalies
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Archives rotées (FETCH_ROTATED_ARCHIVES) dans le snapshot de parse_logs : une archive
+dont le fichier vivant d'origine est encore dans le buffer local (sync du fichier vivant
+échouée) ne recompte pas les lignes déjà analysées depuis ce fichier.
+Usage : python -m pytest -q archives_test.py
+"""
+
+import gzip
+import os
+import tempfile
+
+from loggen import LogGenerator
+from remote_analyzer import EnterpriseMonitor
+
+
+def read_lines(files):
+    contents = []
+    for f in files:
+        with open(f, 'rb') as fh:
+            contents.append(fh.readlines())
+    return contents
+
+
+def test_archive_of_unsynced_live_file():
+    with tempfile.TemporaryDirectory() as directory:
+        generated = LogGenerator(paths=100, ips=300, days=2, seed=17).write(os.path.join(directory, 'all'), 9000)
+        live = [os.path.join(directory, os.path.basename(f)) for f in generated]
+        contents = read_lines(generated)
+        for f, lines in zip(live, contents):
+            with open(f, 'wb') as fh:
+                fh.writelines(lines[:len(lines) // 3])
+        monitor = EnterpriseMonitor()
+        monitor.parse_logs(live)
+        synced = monitor.stats['overview'].total_reqs
+
+        # Rotation côté serveur : l'archive (2/3 des lignes) arrive, le fichier vivant reste l'ancien
+        archives = [f + '.1.gz' for f in live]
+        for archive, lines in zip(archives, contents):
+            with gzip.open(archive, 'wb') as fh:
+                fh.writelines(lines[:len(lines) * 2 // 3])
+        monitor.parse_logs(archives + live)
+        archived = sum(len(lines) * 2 // 3 for lines in contents)
+        assert monitor.stats['overview'].total_reqs == archived > synced
+
+        # Sync suivante réussie : nouveau fichier vivant, ré-analyse complète sans perte ni doublon
+        for f, lines in zip(live, contents):
+            with open(f, 'wb') as fh:
+                fh.writelines(lines[len(lines) * 2 // 3:])
+        monitor.parse_logs(archives + live)
+        assert monitor.stats['overview'].total_reqs == 9000
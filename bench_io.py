@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark des backends de lecture des buffers locaux sur un fichier réel
+(multi-GB de préférence) : boucle texte historique (open 'r', errors='ignore')
+contre les backends IO_BACKENDS de remote_analyzer.
+Usage : python bench_io.py logs_buffer/db_traffic_v17.log [--aggregate]
+"""
+
+import os
+import sys
+import time
+
+from aggregates import new_stats
+from remote_analyzer import IO_BACKENDS, aggregate_range, parse_line, _last_line_end
+
+
+def text_mode_loop(file_path, start, end):
+    """Référence : boucle texte d'origine (décodage UTF-8 + str pour chaque ligne)."""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            rec = parse_line(line)
+            if rec is not None: yield 0, rec
+
+
+def run(label, fn, file_path, end):
+    t0 = time.perf_counter()
+    n = fn(file_path, end)
+    elapsed = time.perf_counter() - t0
+    print(f"   {label:<22} {elapsed:>8.2f}s  {end / elapsed / 1024 / 1024:>8.1f} MB/s  ({n:,} lignes reconnues)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    file_path = sys.argv[1]
+    with_aggregation = "--aggregate" in sys.argv
+    end = _last_line_end(file_path, 0)
+    print(f"📏 {file_path}: {os.path.getsize(file_path) / 1024 / 1024:.1f} MB (lecture + parsing)")
+
+    backends = {'text (historique)': text_mode_loop}
+    backends.update(IO_BACKENDS)
+    for label, backend in backends.items():
+        run(label, lambda path, end, backend=backend: sum(1 for _ in backend(path, 0, end)), file_path, end)
+
+    if with_aggregation:
+        print("   --- avec agrégation ---")
+        for label in IO_BACKENDS:
+            def aggregate(path, end, name=label):
+                stats = new_stats()
+                aggregate_range(stats, path, 0, end, "cmd" in path.lower(), name)
+                return stats['overview'].total_reqs
+            run(label, aggregate, file_path, end)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark du parsing ligne à ligne : LOG_PATTERN.search (référence)
+contre le chemin rapide parse_line.
+Usage : python bench_parser.py [nb_lignes]
+"""
+
+import random
+import sys
+import time
+
+from remote_analyzer import parse_line, _parse_line_regex
+
+
+def sample_lines(n, seed=42):
+    rnd = random.Random(seed)
+    lines = []
+    for i in range(n):
+        line = (
+            f"INFO {2026}-01-{1 + i % 28:02d} {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d},{rnd.randint(0, 999):03d} "
+            f"cicaw.middleware IP: 10.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)} | "
+            f"Path: /product/{rnd.randint(1, 5000)}/ | Queries: {rnd.randint(0, 120)} | Rows: {rnd.randint(0, 4000)} | "
+            f"Est. Size: {rnd.uniform(0, 800):.2f} KB"
+        )
+        if rnd.random() < 0.3: line += f" | Duration: {rnd.uniform(0, 9):.3f}s"
+        if rnd.random() < 0.3: line += f" | Mem: {rnd.uniform(0, 300):.1f} MB"
+        if rnd.random() < 0.1: line = "WARNING" + line[4:]
+        lines.append(line + "\n")
+    return lines
+
+
+def bench(fn, lines, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for line in lines:
+            fn(line)
+        best = min(best, time.perf_counter() - t0)
+    return len(lines) / best
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    lines = sample_lines(n)
+    mismatches = sum(1 for line in lines if parse_line(line) != _parse_line_regex(line))
+    regex_lps = bench(_parse_line_regex, lines)
+    fast_lps = bench(parse_line, lines)
+    print(f"📏 {n:,} lignes (divergences fast/regex: {mismatches})")
+    print(f"   LOG_PATTERN.search : {regex_lps:>12,.0f} lignes/s")
+    print(f"   parse_line         : {fast_lps:>12,.0f} lignes/s  (x{fast_lps / regex_lps:.2f})")
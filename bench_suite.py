@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suite de benchmarks de bout en bout sur logs synthétiques (loggen) :
+parse_logs, calculate_percentile et generate_html à plusieurs volumes.
+Chaque volume tourne dans un processus neuf (pic RSS propre à la mesure) ;
+les résultats sont écrits en JSON pour comparer deux exécutions.
+Usage : python bench_suite.py [100000,1000000,10000000] [--workers N] [--paths N]
+        [--ips N] [--days N] [--seed N] [--output fichier.json] [--compare ancien.json]
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from loggen import LogGenerator, _option
+from profiling import peak_rss_mb
+
+DEFAULT_SIZES = (100_000, 1_000_000, 10_000_000)
+# Métriques comparées avec --compare (sens : plus haut = mieux ?)
+COMPARED = {'lines_per_sec': True, 'parse_s': False, 'percentile_ms': False, 'html_s': False,
+            'html_peak_mb': False, 'html_kb': False, 'peak_rss_mb': False}
+
+
+def run_child(directory, workers):
+    """Mesures d'un volume, dans ce processus ; imprime une ligne JSON sur stdout."""
+    import html_stream
+    import remote_analyzer
+    files = [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith('.log')]
+    lines = 0
+    for f in files:
+        with open(f, 'rb') as fh:
+            lines += sum(block.count(b'\n') for block in iter(lambda: fh.read(1 << 20), b''))
+
+    monitor = remote_analyzer.EnterpriseMonitor(workers=workers)
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            t0 = time.perf_counter()
+            monitor.parse_logs(files)
+            parse_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            for data in monitor.stats['endpoints'].values():
+                monitor.calculate_percentile(data.dur_sketch, 95)
+            percentile_ms = (time.perf_counter() - t0) * 1000
+
+            os.chdir(directory)
+            t0 = time.perf_counter()
+            monitor.generate_html()
+            html_s = time.perf_counter() - t0
+            # Pic d'allocations du rendu seul, sur un second passage (tracemalloc fausserait le chrono)
+            tracemalloc.start()
+            monitor.generate_html()
+            html_peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+        finally:
+            sys.stdout = stdout
+
+    html_kb = os.path.getsize(remote_analyzer.OUTPUT_FILENAME) / 1024
+    print(json.dumps({
+        'lines': lines,
+        'input_mb': round(sum(os.path.getsize(f) for f in files) / 1024 / 1024, 1),
+        'endpoints': len(monitor.stats['endpoints']),
+        'parse_s': round(parse_s, 3),
+        'lines_per_sec': round(lines / parse_s) if parse_s else 0,
+        'percentile_ms': round(percentile_ms, 2),
+        'html_s': round(html_s, 3),
+        'html_peak_mb': round(html_peak_mb, 1),
+        'json_backend': html_stream.JSON_BACKEND,
+        'html_kb': round(html_kb, 1),
+        'html_gzip_kb': round(len(monitor.dashboard_artifacts['gzip']) / 1024, 1),
+        'peak_rss_mb': peak_rss_mb(),
+    }))
+
+
+def run_size(n, options):
+    with tempfile.TemporaryDirectory(prefix='bench_') as directory:
+        generator = LogGenerator(paths=options['paths'], ips=options['ips'], days=options['days'], seed=options['seed'])
+        t0 = time.perf_counter()
+        generator.write(directory, n)
+        generate_s = time.perf_counter() - t0
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', directory, str(options['workers'])],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Benchmark {n:,} lignes en échec :\n{proc.stderr}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['generate_s'] = round(generate_s, 2)
+        return result
+
+
+def print_table(results, previous=None):
+    print(f"\n{'lignes':>12} {'lignes/s':>12} {'parse':>8} {'p95 ms':>8} {'html':>7} {'pic HTML':>9} {'HTML KB':>9} {'RSS MB':>8}")
+    for r in results:
+        print(f"{r['lines']:>12,} {r['lines_per_sec']:>12,} {r['parse_s']:>7.2f}s {r['percentile_ms']:>8.1f} "
+              f"{r['html_s']:>6.2f}s {r.get('html_peak_mb', 0):>6.1f} MB {r['html_kb']:>9,.0f} {r['peak_rss_mb']:>8,.0f}")
+        before = (previous or {}).get(str(r['size']))
+        if before:
+            deltas = []
+            for key, higher_is_better in COMPARED.items():
+                if before.get(key):
+                    change = (r[key] - before[key]) / before[key] * 100
+                    worse = change < -5 if higher_is_better else change > 5
+                    deltas.append(f"{key} {change:+.1f}%{' ⚠️' if worse else ''}")
+            print(f"{'':>12} vs référence : {', '.join(deltas)}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ['--child']:
+        run_child(args[1], int(args[2]))
+        sys.exit(0)
+
+    sizes = DEFAULT_SIZES
+    if args and not args[0].startswith('--'):
+        sizes = [int(s) for s in args[0].split(',')]
+    options = {
+        'workers': _option(args, '--workers', 1), 'paths': _option(args, '--paths', 2000),
+        'ips': _option(args, '--ips', 20000), 'days': _option(args, '--days', 14), 'seed': _option(args, '--seed', 42),
+    }
+    output = _option(args, '--output', time.strftime("bench_results_%Y%m%d_%H%M%S.json"), str)
+    compare = _option(args, '--compare', None, str)
+    previous = None
+    if compare:
+        with open(compare, 'r', encoding='utf-8') as f:
+            previous = {str(r['size']): r for r in json.load(f)['results']}
+
+    print(f"⏱️ Benchmark {', '.join(f'{n:,}' for n in sizes)} lignes ({options})")
+    results = []
+    for n in sizes:
+        print(f"   ↳ {n:,} lignes...", flush=True)
+        result = run_size(n, options)
+        result['size'] = n
+        results.append(result)
+
+    print_table(results, previous)
+    report = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'options': options,
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Résultats : {os.path.abspath(output)}")
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import paramiko
 import os
 import re
 import json
@@ -9,6 +8,8 @@ from io import StringIO
 from datetime import datetime
 from dotenv import load_dotenv
 
+import pa_transport
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Mission Control - Performance", layout="wide", page_icon="🚀")
 
@@ -41,38 +42,34 @@ def fetch_data_from_pa(host, user, password):
     status_text.text("🔌 Connexion à PythonAnywhere...")
 
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(host, username=user, password=password)
-        sftp = ssh.open_sftp()
+        # Connexion SSH partagée du processus : pas de handshake à chaque rafraîchissement
+        client = pa_transport.get_client(host, user, password)
 
-        # 1. Récupérer les Logs
-        for log_path in LOG_FILES:
-            try:
-                status_text.text(f"📥 Téléchargement de {os.path.basename(log_path)}...")
-                with sftp.open(log_path, 'r') as f:
-                    content = f.read().decode('utf-8')
-                    # On ajoute une étiquette source pour savoir d'où ça vient
-                    source_tag = "CMD" if "cmd" in log_path else "WEB"
-                    logs_content.append((source_tag, content))
-            except FileNotFoundError:
+        # 1. Récupérer les Logs (téléchargements parallèles, un canal SFTP par fichier)
+        status_text.text(f"📥 Téléchargement de {len(LOG_FILES)} fichiers de logs...")
+        for log_path, content in pa_transport.read_many(LOG_FILES, client=client).items():
+            if isinstance(content, FileNotFoundError):
                 st.warning(f"Fichier non trouvé: {log_path}")
+                continue
+            if isinstance(content, Exception):
+                raise content
+            # On ajoute une étiquette source pour savoir d'où ça vient
+            source_tag = "CMD" if "cmd" in log_path else "WEB"
+            logs_content.append((source_tag, content.decode('utf-8')))
 
         # 2. Récupérer les fichiers N+1 (JSON)
         try:
             status_text.text("🕵️ Recherche des rapports N+1...")
-            files = sftp.listdir(NPLUS1_DIR)
-            json_files = [f for f in files if f.endswith('.json')]
-            
-            for jf in json_files:
-                with sftp.open(f"{NPLUS1_DIR}/{jf}", 'r') as f:
-                    data = json.load(f)
-                    nplus1_files.append(data)
+            files = pa_transport.listdir(NPLUS1_DIR, client=client)
+            json_files = [f"{NPLUS1_DIR}/{f}" for f in files if f.endswith('.json')]
+
+            for content in pa_transport.read_many(json_files, client=client).values():
+                if isinstance(content, Exception):
+                    raise content
+                nplus1_files.append(json.loads(content))
         except FileNotFoundError:
             pass # Le dossier n'existe peut-être pas encore
 
-        sftp.close()
-        ssh.close()
         status_text.empty()
         return logs_content, nplus1_files
 
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index du tableau des endpoints servi par /api/endpoints.
+Toutes les lignes sont gardées côté serveur, avec un ordre pré-trié par clé :
+trier, filtrer (préfixe ou sous-chaîne) et paginer ne coûte qu'une tranche,
+sans renvoyer ni re-trier le tableau complet dans le navigateur.
+"""
+
+from bisect import bisect_left
+
+SORT_KEYS = ('total_egress', 'hits', 'avg_sql', 'p95_dur', 'risk_score', 'path')
+FILTER_MODES = ('substring', 'prefix')
+PAGE_SIZE = 100
+PAGE_SIZE_MAX = 1000
+
+
+class EndpointIndex:
+    """Lignes endpoint_row + permutations croissantes par clé (égalités départagées par chemin)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.names = [row['clean_path'].lower() for row in rows]
+        by_name = sorted(range(len(rows)), key=self.names.__getitem__)
+        self.orders = {'path': by_name}
+        for key in SORT_KEYS:
+            if key != 'path':
+                # Tri stable sur l'ordre alphabétique : égalités départagées par chemin
+                self.orders[key] = sorted(by_name, key=lambda i: rows[i][key])
+        # Rang de chaque ligne dans chaque ordre : re-trier un sous-ensemble filtré en O(m log m)
+        self.ranks = {}
+        for key, order in self.orders.items():
+            rank = [0] * len(rows)
+            for position, i in enumerate(order):
+                rank[i] = position
+            self.ranks[key] = rank
+        self.sorted_names = [self.names[i] for i in by_name]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _matching(self, q, mode):
+        if mode == 'prefix':
+            # Les noms triés rendent les préfixes contigus
+            lo = bisect_left(self.sorted_names, q)
+            hi = bisect_left(self.sorted_names, q + '\uffff', lo)
+            return self.orders['path'][lo:hi]
+        return [i for i, name in enumerate(self.names) if q in name]
+
+    def query(self, sort='total_egress', direction='desc', q='', mode='substring', page=0, size=PAGE_SIZE):
+        """Page `page` (à partir de 0) des lignes filtrées puis triées ; total = nombre de lignes filtrées."""
+        if sort not in self.orders:
+            raise ValueError(f"Tri inconnu: {sort} (choix: {', '.join(SORT_KEYS)})")
+        if direction not in ('asc', 'desc'):
+            raise ValueError(f"Sens de tri inconnu: {direction} (asc ou desc)")
+        if mode not in FILTER_MODES:
+            raise ValueError(f"Filtre inconnu: {mode} (choix: {', '.join(FILTER_MODES)})")
+        page, size = max(0, int(page)), min(max(1, int(size)), PAGE_SIZE_MAX)
+
+        order = self.orders[sort]
+        q = q.strip().lower()
+        if q:
+            order = sorted(self._matching(q, mode), key=self.ranks[sort].__getitem__)
+        total = len(order)
+        if direction == 'asc':
+            selected = order[page * size:(page + 1) * size]
+        else:
+            # Tranche prise depuis la fin, sans inverser toute la permutation
+            start, end = max(0, total - (page + 1) * size), max(0, total - page * size)
+            selected = order[start:end][::-1]
+        return {
+            'rows': [self.rows[i] for i in selected],
+            'total': total,
+            'page': page,
+            'size': size,
+        }
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stockage colonnaire optionnel de tous les événements parsés (EVENT_STORE=1).
+Une colonne NumPy par champ (timestamps int64, path/IP encodés par dictionnaire,
+métriques int32/float32), agrandie par doublement. Les vues globales, journalières,
+horaires, par endpoint ou par IP se recalculent par group-by vectorisé, sur
+n'importe quelle fenêtre de temps, sans re-parser les logs bruts.
+"""
+
+import calendar
+import time
+
+import numpy as np
+
+# Ligne tamponnée avant conversion en colonnes (un tuple par événement)
+RECORD_DTYPE = np.dtype([
+    ('ts', np.int64), ('path', np.int32), ('ip', np.int32),
+    ('queries', np.int32), ('rows', np.int32),
+    ('size_kb', np.float32), ('duration', np.float32), ('mem', np.float32),
+    ('is_cmd', np.int8),
+])
+FLUSH_ROWS = 65536
+GROUP_KEYS = ('day', 'hour', 'path', 'ip')
+
+
+def parse_time(value):
+    """'YYYY-MM-DD', 'YYYY-MM-DD HH' ou 'YYYY-MM-DD HH:MM' -> timestamp epoch ; None si vide."""
+    if not value: return None
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d %H', '%Y-%m-%d'):
+        try:
+            return calendar.timegm(time.strptime(value.strip(), fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"Date invalide: {value}")
+
+
+class StringDictionary:
+    """Encodage dictionnaire : chaîne -> code int32 (ordre de première apparition)."""
+    __slots__ = ('codes', 'values')
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def remap(self, other):
+        """Table de traduction des codes de `other` vers ce dictionnaire."""
+        return np.array([self.encode(v) for v in other.values], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class EventStore:
+    def __init__(self, capacity=FLUSH_ROWS):
+        self.size = 0
+        self.columns = {name: np.empty(capacity, RECORD_DTYPE[name]) for name in RECORD_DTYPE.names}
+        self.pending = []
+        self.paths = StringDictionary()
+        self.ips = StringDictionary()
+        self._day_epoch = {}
+
+    # --- ÉCRITURE ---
+    def append(self, date, time_str, ip, path, queries, rows, size, duration, mem, is_cmd):
+        midnight = self._day_epoch.get(date)
+        if midnight is None:
+            midnight = self._day_epoch[date] = parse_time(date)
+        ts = midnight + int(time_str[:2]) * 3600 + int(time_str[3:5]) * 60 + int(time_str[6:8])
+        self.pending.append((ts, self.paths.encode(path), self.ips.encode(ip), queries, rows, size, duration, mem, is_cmd))
+        if len(self.pending) >= FLUSH_ROWS:
+            self.flush()
+
+    def _reserve(self, needed):
+        capacity = len(self.columns['ts'])
+        if needed <= capacity: return
+        while capacity < needed: capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def _extend(self, chunk):
+        n = len(chunk[RECORD_DTYPE.names[0]])
+        self._reserve(self.size + n)
+        for name in RECORD_DTYPE.names:
+            self.columns[name][self.size:self.size + n] = chunk[name]
+        self.size += n
+
+    def flush(self):
+        """Convertit le tampon de tuples en colonnes (une seule copie par bloc)."""
+        if not self.pending: return
+        chunk = np.array(self.pending, dtype=RECORD_DTYPE)
+        self.pending = []
+        self._extend(chunk)
+
+    def merge(self, other):
+        """Ajoute les événements d'un store partiel postérieur (codes path/IP retraduits)."""
+        other.flush()
+        self.flush()
+        chunk = {name: other.column(name) for name in RECORD_DTYPE.names}
+        if len(other.paths): chunk['path'] = self.paths.remap(other.paths)[chunk['path']]
+        if len(other.ips): chunk['ip'] = self.ips.remap(other.ips)[chunk['ip']]
+        self._extend(chunk)
+
+    def __len__(self):
+        return self.size + len(self.pending)
+
+    def __getstate__(self):
+        # Snapshot : colonnes tronquées à la taille utile
+        self.flush()
+        state = {name: getattr(self, name) for name in ('size', 'paths', 'ips', '_day_epoch')}
+        state['columns'] = {name: column[:self.size].copy() for name, column in self.columns.items()}
+        state['pending'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.size == 0:
+            self.columns = {name: np.empty(FLUSH_ROWS, RECORD_DTYPE[name]) for name in RECORD_DTYPE.names}
+
+    # --- LECTURE ---
+    def column(self, name):
+        self.flush()
+        return self.columns[name][:self.size]
+
+    def _window(self, start=None, end=None):
+        """Masque booléen des événements dans [start, end) (timestamps epoch), None = pas de filtre."""
+        if start is None and end is None: return None
+        ts = self.column('ts')
+        mask = np.ones(self.size, dtype=bool)
+        if start is not None: mask &= ts >= start
+        if end is not None: mask &= ts < end
+        return mask
+
+    def _select(self, name, mask):
+        column = self.column(name)
+        return column if mask is None else column[mask]
+
+    def overview(self, start=None, end=None):
+        mask = self._window(start, end)
+        queries = self._select('queries', mask)
+        mem = self._select('mem', mask)
+        return {
+            'total_reqs': int(len(queries)),
+            'total_sql': int(queries.sum(dtype=np.int64)),
+            'total_egress_kb': float(self._select('size_kb', mask).sum(dtype=np.float64)),
+            'max_ram': float(mem.max()) if len(mem) else 0.0,
+            'unique_ips': int(len(np.unique(self._select('ip', mask)))),
+        }
+
+    def group_by(self, key, start=None, end=None):
+        """
+        Agrégats vectorisés par 'day', 'hour', 'path' ou 'ip' sur la fenêtre [start, end).
+        Retourne des colonnes alignées : keys, reqs, sql, rows, egress_kb, dur_max, mem_max.
+        """
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Clé de regroupement inconnue: {key} (choix: {', '.join(GROUP_KEYS)})")
+        mask = self._window(start, end)
+        if key == 'day':
+            codes = self._select('ts', mask) // 86400
+        elif key == 'hour':
+            codes = self._select('ts', mask) // 3600
+        else:
+            codes = self._select(key, mask)
+
+        uniques, inverse = np.unique(codes, return_inverse=True)
+        groups = len(uniques)
+        dur_max = np.zeros(groups, dtype=np.float32)
+        mem_max = np.zeros(groups, dtype=np.float32)
+        np.maximum.at(dur_max, inverse, self._select('duration', mask))
+        np.maximum.at(mem_max, inverse, self._select('mem', mask))
+        return {
+            'keys': self._labels(key, uniques),
+            'reqs': np.bincount(inverse, minlength=groups),
+            'sql': np.bincount(inverse, weights=self._select('queries', mask), minlength=groups),
+            'rows': np.bincount(inverse, weights=self._select('rows', mask), minlength=groups),
+            'egress_kb': np.bincount(inverse, weights=self._select('size_kb', mask), minlength=groups),
+            'dur_max': dur_max,
+            'mem_max': mem_max,
+        }
+
+    def _labels(self, key, codes):
+        if key == 'day':
+            return [time.strftime('%Y-%m-%d', time.gmtime(int(c) * 86400)) for c in codes]
+        if key == 'hour':
+            return [time.strftime('%Y-%m-%d %H', time.gmtime(int(c) * 3600)) for c in codes]
+        values = self.paths.values if key == 'path' else self.ips.values
+        return [values[c] for c in codes]
+
+    def top(self, key, sort='reqs', limit=50, start=None, end=None):
+        """Lignes JSON des `limit` premiers groupes, triés par `sort` décroissant."""
+        grouped = self.group_by(key, start, end)
+        if sort not in grouped or sort == 'keys':
+            raise ValueError(f"Tri inconnu: {sort}")
+        order = np.argsort(grouped[sort], kind='stable')[::-1][:limit]
+        return [
+            {
+                'key': grouped['keys'][i],
+                'reqs': int(grouped['reqs'][i]),
+                'sql': int(grouped['sql'][i]),
+                'avg_sql': round(float(grouped['sql'][i] / grouped['reqs'][i]), 1),
+                'rows': int(grouped['rows'][i]),
+                'egress_mb': round(float(grouped['egress_kb'][i]) / 1024, 2),
+                'dur_max': round(float(grouped['dur_max'][i]), 3),
+                'mem_max': round(float(grouped['mem_max'][i]), 1),
+            }
+            for i in order
+        ]
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Résolution GeoIP locale (pays) pour le Session Inspector.
+Base de plages IP triées (entiers) interrogée par recherche dichotomique, avec
+cache LRU par IP : aucune requête réseau, utilisable hors ligne.
+
+Format du fichier GEOIP_DB (CSV, type db-ip / ip2location « country lite ») :
+    1.0.0.0,1.0.0.255,AU        (début, fin, pays)
+    2a03:2880::/32,IE           (ou bloc CIDR, pays)
+Les bornes peuvent aussi être des entiers.
+"""
+
+import os
+import csv
+import heapq
+import ipaddress
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+
+GEOIP_DB = os.getenv("GEOIP_DB", "geoip_ranges.csv")
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "65536"))
+
+# Crawlers connus (Meta, Google), résolus même sans base installée
+BUILTIN_RANGES = [
+    ("57.141.0.0/16", "US"), ("157.240.0.0/16", "US"), ("66.220.0.0/16", "US"),
+    ("66.249.0.0/16", "US"), ("64.233.0.0/16", "US"),
+]
+
+
+def _to_int(value):
+    value = value.strip()
+    if value.isdigit(): return int(value)
+    return int(ipaddress.ip_address(value))
+
+
+def _resolve_overlaps(rows):
+    """
+    (début, fin, pays, priorité) -> plages disjointes (début, fin, pays) triées.
+    Sur une zone couverte par plusieurs plages, la priorité la plus haute l'emporte
+    (base chargée > plages intégrées), puis la plage la plus étroite.
+    """
+    rows.sort()
+    if all(a[1] < b[0] for a, b in zip(rows, rows[1:])):
+        return [r[:3] for r in rows]  # Cas courant : base sans chevauchement
+    bounds = sorted({r[0] for r in rows} | {r[1] + 1 for r in rows})
+    active, resolved, i = [], [], 0
+    for lo, next_lo in zip(bounds, bounds[1:]):
+        while i < len(rows) and rows[i][0] <= lo:
+            start, end, country, priority = rows[i]
+            heapq.heappush(active, (-priority, end - start, end, country))
+            i += 1
+        while active and active[0][2] < lo:
+            heapq.heappop(active)  # Plage terminée avant ce segment
+        if not active: continue
+        country = active[0][3]
+        if resolved and resolved[-1][1] == lo - 1 and resolved[-1][2] == country:
+            resolved[-1] = (resolved[-1][0], next_lo - 1, country)
+        else:
+            resolved.append((lo, next_lo - 1, country))
+    return resolved
+
+
+class GeoIPDatabase:
+    """Plages [début, fin] disjointes triées par début ; IPv4 dans des array compacts, IPv6 en listes d'entiers."""
+
+    def __init__(self, path=None):
+        self.path = path
+        # (début, fin, pays, priorité) : les plages de la base priment sur BUILTIN_RANGES
+        ranges = {4: [], 6: []}
+        for cidr, country in BUILTIN_RANGES:
+            self._add_network(ranges, ipaddress.ip_network(cidr), country, priority=0)
+        # False : seules les plages intégrées sont résolues
+        self.loaded = bool(path) and os.path.exists(path)
+        if self.loaded:
+            self._load_csv(path, ranges)
+
+        self.tables = {}
+        for version, rows in ranges.items():
+            rows = _resolve_overlaps(rows)
+            starts, ends = [r[0] for r in rows], [r[1] for r in rows]
+            if version == 4:
+                starts, ends = array('L', starts), array('L', ends)
+            self.tables[version] = (starts, ends, [r[2] for r in rows])
+
+    def _add_network(self, ranges, network, country, priority=1):
+        ranges[network.version].append((int(network.network_address), int(network.broadcast_address), country, priority))
+
+    def _load_csv(self, path, ranges):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.reader(f):
+                try:
+                    if len(row) == 2 and '/' in row[0]:
+                        self._add_network(ranges, ipaddress.ip_network(row[0].strip(), strict=False), row[1].strip().upper())
+                    elif len(row) >= 3:
+                        start, end = _to_int(row[0]), _to_int(row[1])
+                        version = 6 if (':' in row[0] or end > 0xFFFFFFFF) else 4
+                        ranges[version].append((start, end, row[2].strip().upper(), 1))
+                except ValueError:
+                    continue  # En-tête ou ligne invalide
+
+    def __len__(self):
+        return sum(len(t[0]) for t in self.tables.values())
+
+    def lookup(self, ip):
+        """Code pays ISO (ex. 'FR') ou '' si inconnu."""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return ''
+        starts, ends, countries = self.tables[address.version]
+        value = int(address)
+        i = bisect_right(starts, value) - 1
+        if i >= 0 and value <= ends[i]:
+            return countries[i]
+        return ''
+
+
+_database = None
+
+
+def get_database():
+    """Base chargée une fois par processus (y compris dans chaque worker de parsing)."""
+    global _database
+    if _database is None:
+        _database = GeoIPDatabase(GEOIP_DB)
+    return _database
+
+
+@lru_cache(maxsize=GEOIP_CACHE_SIZE)
+def country_code(ip):
+    return get_database().lookup(ip)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests de la résolution GeoIP : plages de la base chevauchant les plages intégrées
+(BUILTIN_RANGES) ou imbriquées entre elles.
+Usage : python -m pytest -q geoip_test.py
+"""
+
+import os
+import tempfile
+
+from geoip import GeoIPDatabase
+
+
+def database(rows):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'ranges.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(rows) + '\n')
+        return GeoIPDatabase(path)
+
+
+def test_builtin_only():
+    db = GeoIPDatabase(None)
+    assert not db.loaded
+    assert db.lookup('66.249.66.1') == 'US'
+    assert db.lookup('8.8.8.8') == ''
+    assert db.lookup('pas-une-ip') == ''
+
+
+def test_csv_row_covering_builtin_ranges():
+    # 66.0.0.0/8 englobe 66.220.0.0/16 et 66.249.0.0/16 : toute la plage doit rester résolue
+    db = database(['66.0.0.0,66.255.255.255,US'])
+    for ip in ('66.0.0.1', '66.221.0.1', '66.220.5.5', '66.249.66.1', '66.250.1.1', '66.255.255.255'):
+        assert db.lookup(ip) == 'US', ip
+    assert db.lookup('67.0.0.0') == ''
+
+
+def test_database_wins_over_builtin():
+    db = database(['66.249.0.0,66.249.255.255,IE', '157.240.0.0/16,GB'])
+    assert db.lookup('66.249.1.1') == 'IE'
+    assert db.lookup('157.240.3.4') == 'GB'
+    assert db.lookup('66.220.1.1') == 'US'
+
+
+def test_nested_database_ranges():
+    # Plage large puis exception plus étroite au milieu : la plus précise l'emporte
+    db = database(['10.0.0.0,10.255.255.255,FR', '10.1.0.0,10.1.255.255,BE', '2a03:2880::/32,IE'])
+    assert db.lookup('10.0.255.255') == 'FR'
+    assert db.lookup('10.1.2.3') == 'BE'
+    assert db.lookup('10.2.0.0') == 'FR'
+    assert db.lookup('2a03:2880::1') == 'IE'
+    assert db.lookup('2a03:2881::1') == ''
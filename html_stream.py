@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Écriture en flux du dashboard : fragments du template et blocs de données JSON
+sérialisés élément par élément directement vers le fichier, sans construire la page
+entière en mémoire. Variantes gzip / brotli et empreinte de l'ETag sont calculées au
+fil de l'écriture. orjson est utilisé s'il est installé (JSON_BACKEND=json pour forcer
+la bibliothèque standard).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+# Optionnel : sérialisation JSON plus rapide
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optionnel : variante Brotli
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson" if orjson is not None else "json")
+# Octets accumulés avant d'alimenter fichier, compresseurs et hash
+BUFFER_SIZE = 64 * 1024
+
+_encode_std = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def dumps(obj):
+    """Sérialisation JSON compacte d'un élément, en bytes UTF-8."""
+    if JSON_BACKEND == 'orjson' and orjson is not None:
+        return orjson.dumps(obj)
+    return _encode_std(obj).encode('utf-8')
+
+
+class HtmlStream:
+    """
+    Sortie en flux vers `path` (+ `path`.gz / .br) ; write() pour le texte du template,
+    write_object() / write_array() pour les blocs de données, éventuellement produits à la demande.
+    """
+
+    def __init__(self, path, compress=True):
+        self.path = path
+        self.size = 0
+        self.digest = hashlib.sha1()
+        self._pending = []
+        self._pending_size = 0
+        self._file = open(path, 'wb')
+        self._gzip_file = self._gzip = self._brotli_file = self._brotli = None
+        if compress:
+            self._gzip_file = open(path + '.gz', 'wb')
+            # filename='' et mtime=0 : en-tête stable, même ETag gzip pour un même contenu
+            self._gzip = gzip.GzipFile(filename='', mode='wb', fileobj=self._gzip_file, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self._brotli_file = open(path + '.br', 'wb')
+                self._brotli = brotli.Compressor()
+
+    def write(self, text):
+        self._append(text.encode('utf-8'))
+
+    def _append(self, data):
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= BUFFER_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending: return
+        data = b''.join(self._pending)
+        self._pending, self._pending_size = [], 0
+        self.size += len(data)
+        self.digest.update(data)
+        self._file.write(data)
+        if self._gzip is not None:
+            self._gzip.write(data)
+        if self._brotli is not None:
+            self._brotli_file.write(self._brotli.process(data))
+
+    def write_json(self, obj):
+        self._append(dumps(obj))
+
+    def write_object(self, pairs):
+        """Objet JSON depuis des paires (clé, valeur) : une seule valeur sérialisée à la fois."""
+        self._append(b'{')
+        first = True
+        for key, value in pairs:
+            if not first: self._append(b',')
+            first = False
+            self._append(dumps(str(key)))
+            self._append(b':')
+            self._append(dumps(value))
+        self._append(b'}')
+
+    def write_array(self, items):
+        self._append(b'[')
+        first = True
+        for item in items:
+            if not first: self._append(b',')
+            first = False
+            self._append(dumps(item))
+        self._append(b']')
+
+    def close(self):
+        self._flush()
+        self._file.close()
+        if self._gzip is not None:
+            self._gzip.close()
+            self._gzip_file.close()
+        if self._brotli is not None:
+            self._brotli_file.write(self._brotli.finish())
+            self._brotli_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def variants(self):
+        """Variantes compressées écrites à côté du HTML (relues une fois le flux fermé)."""
+        found = {}
+        for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+            if (self._gzip if encoding == 'gzip' else self._brotli) is not None:
+                with open(self.path + suffix, 'rb') as f:
+                    found[encoding] = f.read()
+        return found
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Générateur déterministe de logs synthétiques au format du middleware
+(db_traffic / cmd_traffic), pour les benchmarks et les essais hors ligne.
+Même graine + mêmes paramètres = fichiers identiques octet pour octet.
+Usage : python loggen.py <dossier> [nb_lignes] [--paths N] [--ips N] [--days N]
+        [--start YYYY-MM-DD] [--cmd-ratio R] [--optional R] [--seed N]
+"""
+
+import calendar
+import os
+import random
+import sys
+import time
+from itertools import accumulate
+
+from remote_analyzer import REMOTE_LOGS
+
+DB_LOG_NAME = os.path.basename(REMOTE_LOGS[0])
+CMD_LOG_NAME = os.path.basename(REMOTE_LOGS[1])
+
+# Familles de routes ; chaque chemin concret remplit {n} (id) et/ou {h} (hash)
+ROUTE_SHAPES = [
+    "/product/{n}/", "/api/v1/orders/{n}/", "/api/v1/cart/{n}/items/", "/shop/{n}/reviews/",
+    "/media/cache/{h}/", "/account/{n}/", "/search/", "/", "/api/v1/products/", "/checkout/{n}/confirm/",
+]
+COMMANDS = ["sync_stock", "send_newsletter", "rebuild_index", "clearsessions", "import_catalog", "compute_reports"]
+LOGGERS = ["django.request", "cicaw.middleware"]
+
+
+class LogGenerator:
+    """
+    Lignes chronologiques réparties uniformément sur `days` jours à partir de `start`.
+    `paths` chemins web distincts et `ips` clients, tirés selon une loi de Zipf (quelques routes
+    et IPs dominantes, longue traîne) ; Duration/Mem présents avec la probabilité `optional`.
+    """
+
+    def __init__(self, paths=1000, ips=5000, days=7, start="2026-01-01", cmd_ratio=0.05, optional=0.3, seed=42):
+        self.rnd = random.Random(seed)
+        self.days = max(1, days)
+        self.start = calendar.timegm(time.strptime(start, "%Y-%m-%d"))
+        self.cmd_ratio = cmd_ratio
+        self.optional = optional
+        self.paths = [self._concrete_path(i) for i in range(max(1, paths))]
+        self.ips = [self._ip(i) for i in range(max(1, ips))]
+        self.path_weights = list(accumulate(1 / (i + 1) for i in range(len(self.paths))))
+        self.ip_weights = list(accumulate(1 / (i + 1) ** 0.8 for i in range(len(self.ips))))
+
+    def _concrete_path(self, i):
+        shape = ROUTE_SHAPES[i % len(ROUTE_SHAPES)]
+        return shape.format(n=i // len(ROUTE_SHAPES) + 1, h=f"{self.rnd.getrandbits(80):020x}")
+
+    def _ip(self, i):
+        return f"{10 + i % 200}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+
+    def _timestamp(self, i, n):
+        ts = self.start + self.days * 86400 * i / n
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts)) + f",{int(ts * 1000) % 1000:03d}"
+
+    def line(self, ts, path, ip, is_cmd):
+        rnd = self.rnd
+        if is_cmd:
+            queries, rows = rnd.randint(0, 2000), rnd.randint(0, 50000)
+        else:
+            queries, rows = int(rnd.expovariate(1 / 12)), int(rnd.expovariate(1 / 300))
+        line = (
+            f"INFO {ts} {LOGGERS[is_cmd]} IP: {ip} | Path: {path} | Queries: {queries} | "
+            f"Rows: {rows} | Est. Size: {rnd.expovariate(1 / 40):.2f} KB"
+        )
+        # Les commandes chronomètrent toujours leur exécution
+        if is_cmd or rnd.random() < self.optional:
+            line += f" | Duration: {rnd.expovariate(1 / (30 if is_cmd else 0.4)):.3f}s"
+            if is_cmd or rnd.random() < self.optional:
+                line += f" | Mem: {rnd.uniform(20, 400):.1f} MB"
+        return line + "\n"
+
+    def generate(self, n):
+        """Itère sur (is_cmd, ligne) pour `n` lignes au total, dans l'ordre chronologique."""
+        rnd = self.rnd
+        batch = 4096
+        for offset in range(0, n, batch):
+            k = min(batch, n - offset)
+            paths = rnd.choices(self.paths, cum_weights=self.path_weights, k=k)
+            ips = rnd.choices(self.ips, cum_weights=self.ip_weights, k=k)
+            for j in range(k):
+                is_cmd = rnd.random() < self.cmd_ratio
+                path = f"CMD::{COMMANDS[j % len(COMMANDS)]}" if is_cmd else paths[j]
+                yield is_cmd, self.line(self._timestamp(offset + j, n), path, "127.0.0.1" if is_cmd else ips[j], is_cmd)
+
+    def write(self, directory, n):
+        """Écrit db_traffic / cmd_traffic dans `directory` ; retourne les chemins des deux fichiers."""
+        os.makedirs(directory, exist_ok=True)
+        files = [os.path.join(directory, DB_LOG_NAME), os.path.join(directory, CMD_LOG_NAME)]
+        with open(files[0], 'w', encoding='utf-8') as db, open(files[1], 'w', encoding='utf-8') as cmd:
+            outputs = (db, cmd)
+            for is_cmd, line in self.generate(n):
+                outputs[is_cmd].write(line)
+        return files
+
+
+def _option(args, name, default, cast=int):
+    if name in args:
+        return cast(args[args.index(name) + 1])
+    return default
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0].startswith('--'):
+        print(__doc__)
+        sys.exit(1)
+    n = int(args[1]) if len(args) > 1 and not args[1].startswith('--') else 100_000
+    generator = LogGenerator(
+        paths=_option(args, '--paths', 1000), ips=_option(args, '--ips', 5000),
+        days=_option(args, '--days', 7), start=_option(args, '--start', "2026-01-01", str),
+        cmd_ratio=_option(args, '--cmd-ratio', 0.05, float), optional=_option(args, '--optional', 0.3, float),
+        seed=_option(args, '--seed', 42),
+    )
+    t0 = time.perf_counter()
+    files = generator.write(args[0], n)
+    elapsed = time.perf_counter() - t0
+    total = sum(os.path.getsize(f) for f in files)
+    print(f"🧪 {n:,} lignes générées en {elapsed:.1f}s ({total / 1024 / 1024:.1f} MB)")
+    for f in files:
+        print(f"   ↳ {f}")
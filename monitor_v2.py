@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import paramiko
 import os
 import re
 import numpy as np
@@ -9,6 +8,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 from sklearn.linear_model import LinearRegression
 
+import pa_transport
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="OmniView v3 - Full Metrics", layout="wide", page_icon="🧠")
 
@@ -88,23 +89,18 @@ def fetch_and_process_data():
     logs_data = []
     
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        connect_kwargs = {"hostname": PA_HOST, "username": PA_USER, "timeout": 10}
-        if PA_PASSWORD: connect_kwargs["password"] = PA_PASSWORD
-        
-        ssh.connect(**connect_kwargs)
-        sftp = ssh.open_sftp()
-        
+        # Transport SSH partagé (keepalive) : la connexion survit aux rafraîchissements du cache
+        client = pa_transport.get_client(PA_HOST, PA_USER, PA_PASSWORD)
+
         raw_content = ""
-        for log_path in REMOTE_LOGS:
-            try:
-                with sftp.open(log_path, 'r') as f:
-                    raw_content += f.read().decode('utf-8')
-            except Exception: pass
-            
-        sftp.close()
-        ssh.close()
+        for log_path, content in pa_transport.read_many(REMOTE_LOGS, client=client).items():
+            # read_many renvoie l'exception à la place du contenu : fichier absent signalé, le reste remonté
+            if isinstance(content, FileNotFoundError):
+                st.warning(f"Fichier non trouvé: {log_path}")
+                continue
+            if isinstance(content, Exception):
+                raise content
+            raw_content += content.decode('utf-8')
         
     except Exception as e:
         st.error(f"Erreur SSH: {e}")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transport SSH partagé vers PythonAnywhere.
+Une seule connexion authentifiée par processus (keepalive), réutilisée d'un
+rafraîchissement à l'autre par remote_analyzer, dashboard et monitor_v2 ;
+les téléchargements passent par plusieurs canaux SFTP en parallèle.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import paramiko
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+PA_HOST = os.getenv("PA_HOST", "ssh.pythonanywhere.com")
+PA_USER = os.getenv("PA_USER", "Cicaw")
+PA_PASSWORD = os.getenv("PA_PASSWORD", "")
+
+SSH_KEEPALIVE = int(os.getenv("SSH_KEEPALIVE", "30"))  # secondes, 0 = désactivé
+SFTP_CHANNELS = int(os.getenv("SFTP_CHANNELS", "4"))
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(host=PA_HOST, user=PA_USER, password=PA_PASSWORD):
+    """
+    Client SSH partagé pour (host, user) : connecté et authentifié au premier appel,
+    puis réutilisé tant que le transport est actif (reconnexion sinon).
+    """
+    key = (host, user, password)
+    with _lock:
+        client = _clients.get(key)
+        transport = client.get_transport() if client is not None else None
+        if transport is not None and transport.is_active():
+            return client
+        if client is not None:
+            client.close()
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        print(f"🔄 Connexion au cluster {host}...")
+        connect_kwargs = {"hostname": host, "username": user, "timeout": 10}
+        if password:
+            connect_kwargs["password"] = password
+        client.connect(**connect_kwargs)
+        if SSH_KEEPALIVE:
+            client.get_transport().set_keepalive(SSH_KEEPALIVE)
+        _clients[key] = client
+        return client
+
+
+def close_all():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def map_sftp(fn, items, channels=SFTP_CHANNELS, client=None):
+    """
+    Applique fn(sftp, item) à chaque élément, en parallèle sur `channels` canaux SFTP
+    ouverts sur le même transport (un canal par thread). Résultats dans l'ordre de `items`.
+    """
+    client = client or get_client()
+    items = list(items)
+    local = threading.local()
+    opened = []
+
+    def run(item):
+        sftp = getattr(local, 'sftp', None)
+        if sftp is None:
+            sftp = local.sftp = client.open_sftp()
+            opened.append(sftp)
+        return fn(sftp, item)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(channels, len(items)))) as pool:
+            return list(pool.map(run, items))
+    finally:
+        for sftp in opened:
+            sftp.close()
+
+
+def read_file(sftp, remote):
+    """Contenu (bytes) d'un fichier distant, en lectures pipelinées (prefetch)."""
+    with sftp.open(remote, 'rb') as f:
+        # Sans prefetch, chaque bloc de 32 KB coûte un aller-retour réseau
+        f.prefetch()
+        return f.read()
+
+
+def read_many(paths, channels=SFTP_CHANNELS, client=None):
+    """{chemin: bytes} ; l'exception est renvoyée à la place du contenu si la lecture échoue."""
+    def read(sftp, path):
+        try:
+            return read_file(sftp, path)
+        except Exception as e:
+            return e
+
+    paths = list(paths)
+    return dict(zip(paths, map_sftp(read, paths, channels, client)))
+
+
+def listdir(remote_dir, client=None):
+    client = client or get_client()
+    sftp = client.open_sftp()
+    try:
+        return sftp.listdir(remote_dir)
+    finally:
+        sftp.close()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentation par étape (--profile) : temps mur, temps CPU (workers de parsing
+compris), octets traités et pic mémoire de chaque étape du pipeline, résumés en
+tableau et écrits en JSON. Dump cProfile optionnel (--cprofile), lisible par
+pstats / snakeviz et convertible en flamegraph (flameprof, gprof2dot).
+Sans profileur actif, stage() ne coûte qu'un context manager vide.
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Absent sous Windows : pic mémoire non mesuré
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "profile_stages.json")
+PROFILE_DUMP = os.getenv("PROFILE_DUMP", "profile.prof")
+
+_active = None
+
+
+def peak_rss_mb(children=False):
+    """Pic de mémoire résidente (MB) du processus, ou de ses enfants terminés ; None sans module resource."""
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux : KB ; macOS : octets
+    return round(peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def _cpu_seconds():
+    t = os.times()
+    # Les workers du ProcessPoolExecutor sont comptés une fois terminés (pool.shutdown)
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class StageProfiler:
+    def __init__(self, cprofile_path=None):
+        self.stages = []
+        self.cprofile_path = cprofile_path
+        self.cprofile = cProfile.Profile() if cprofile_path else None
+        self._depth = 0
+        self.started = time.time()
+
+    @contextmanager
+    def stage(self, name):
+        """Mesure le bloc ; l'appelant peut renseigner record['bytes']. Les étapes imbriquées sont indentées."""
+        record = {'stage': name, 'depth': self._depth, 'bytes': 0}
+        self.stages.append(record)
+        self._depth += 1
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record['wall_s'] = round(time.perf_counter() - wall, 4)
+            record['cpu_s'] = round(_cpu_seconds() - cpu, 4)
+            # Pic du processus atteint à la fin de l'étape (high-water mark, jamais décroissant)
+            record['peak_rss_mb'] = peak_rss_mb()
+            record['children_peak_rss_mb'] = peak_rss_mb(children=True)
+
+    def summary(self):
+        print(f"\n⏱️ Profil par étape")
+        print(f"   {'étape':<28} {'mur':>9} {'CPU':>9} {'octets':>12} {'pic RSS':>10}")
+        for r in self.stages:
+            if 'wall_s' not in r: continue  # Étape en cours (serve)
+            label = '  ' * r['depth'] + r['stage']
+            rss = f"{r['peak_rss_mb']:,.0f} MB" if r['peak_rss_mb'] is not None else '-'
+            print(f"   {label:<28} {r['wall_s']:>8.3f}s {r['cpu_s']:>8.3f}s {_human_bytes(r['bytes']):>12} {rss:>10}")
+
+    def write(self, path=PROFILE_OUTPUT):
+        report = {
+            'started': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            'argv': sys.argv[1:],
+            'stages': [r for r in self.stages if 'wall_s' in r],
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(self.cprofile_path)
+        print(f"💾 Profil : {os.path.abspath(path)}"
+              + (f" (cProfile : {os.path.abspath(self.cprofile_path)})" if self.cprofile is not None else ""))
+
+
+def _human_bytes(n):
+    if not n: return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024: return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.2f} GB"
+
+
+def enable(cprofile_path=None):
+    """Active le profileur du processus ; cProfile démarre immédiatement si demandé."""
+    global _active
+    _active = StageProfiler(cprofile_path)
+    if _active.cprofile is not None:
+        _active.cprofile.enable()
+    return _active
+
+
+def stage(name):
+    """Étape mesurée si --profile est actif (context manager neutre sinon)."""
+    # Les cycles du thread --live ne sont pas mélangés au profil du lancement
+    if _active is None or threading.current_thread() is not threading.main_thread():
+        return nullcontext({})
+    return _active.stage(name)
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agrégats partagés dans Redis (REDIS_URL) : un seul processus ingère les logs (--ingest)
+et pousse ses incréments par jour, heure et endpoint en un pipeline MULTI/EXEC ;
+les dashboards relisent ces agrégats au lieu de télécharger et parser chacun les logs.
+Les planchers par lignée de fichier source (empreinte des premiers octets, pas le
+chemin) sont écrits dans la même transaction : une ré-analyse ne pousse jamais deux
+fois les mêmes lignes, même une fois x.log roté en x.log.1.gz.
+REDIS_URL=memory:// utilise MemoryRedis, stand-in en processus (tests, essais sans serveur).
+"""
+
+import json
+import os
+import threading
+from collections import defaultdict
+
+from aggregates import EndpointStats, EventReservoir, HistoryBucket, new_stats
+from routes import ROUTE_OVERFLOW, ROUTE_TEMPLATES_MAX
+from sketches import QuantileSketch, UniqueCounter
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+REDIS_URL = os.getenv("REDIS_URL", "")
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "omniview")
+
+# Schéma des clés (P = REDIS_PREFIX) :
+#   P:overview            hash  reqs, sql, egress_kb
+#   P:max                 zset  maxima écrits par ZADD GT ('ram', 'ep|<route>', 'dur|<route>', 'eph|<route>|<date>')
+#   P:ips, P:ips|d|<date>, P:ips|h|<date>|<HH>   UniqueCounter.to_bytes()
+#   P:days / P:hours|<date>                       set des jours / heures connus
+#   P:d|<date>, P:h|<date>|<HH>                   hash des compteurs journaliers / horaires
+#   P:endpoints           zset  route -> hits (ZINCRBY), au plus ROUTE_TEMPLATES_MAX routes + ROUTE_OVERFLOW
+#   P:ep|<route>          hash  compteurs, type, dur_count / dur_zero
+#   P:dur|<route>         hash  buckets du QuantileSketch des durées
+#   P:eph|<route>         hash  historique journalier '<date>|hits', '<date>|sql_sum', '<date>|dur_sum'
+#   P:ev|<date>|<HH>      list  événements JSON (réservoir uniforme de l'heure, HOURLY_SAMPLE_SIZE au plus)
+#   P:seen                hash  '<date>|<HH>' -> événements offerts
+#   P:ingested            hash  empreinte (hex) -> {"file", "offset"} (offset décompressé pour une archive)
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class MemoryRedis:
+    """
+    Sous-ensemble de redis.Redis en mémoire (réponses en bytes, comme redis-py).
+    Un pipeline accumule les commandes et les exécute d'un bloc sous le verrou.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def _b(value):
+        if isinstance(value, bytes): return value
+        if isinstance(value, float): return repr(value).encode()
+        return str(value).encode()
+
+    def pipeline(self, transaction=True):
+        return MemoryPipeline(self)
+
+    def flushdb(self):
+        with self.lock:
+            self.data.clear()
+        return True
+
+    def keys(self, pattern='*'):
+        prefix = pattern.rstrip('*').encode()
+        with self.lock:
+            return [k for k in self.data if k.startswith(prefix)]
+
+    def get(self, name):
+        return self.data.get(self._b(name))
+
+    def mget(self, names):
+        return [self.data.get(self._b(name)) for name in names]
+
+    def set(self, name, value):
+        self.data[self._b(name)] = self._b(value)
+        return True
+
+    def hincrby(self, name, key, amount=1):
+        h = self.data.setdefault(self._b(name), {})
+        value = int(h.get(self._b(key), 0)) + amount
+        h[self._b(key)] = self._b(value)
+        return value
+
+    def hincrbyfloat(self, name, key, amount=1.0):
+        h = self.data.setdefault(self._b(name), {})
+        value = float(h.get(self._b(key), 0)) + amount
+        h[self._b(key)] = self._b(value)
+        return value
+
+    def hset(self, name, key, value):
+        h = self.data.setdefault(self._b(name), {})
+        new = self._b(key) not in h
+        h[self._b(key)] = self._b(value)
+        return int(new)
+
+    def hget(self, name, key):
+        return self.data.get(self._b(name), {}).get(self._b(key))
+
+    def hgetall(self, name):
+        return dict(self.data.get(self._b(name), {}))
+
+    def sadd(self, name, *values):
+        s = self.data.setdefault(self._b(name), set())
+        before = len(s)
+        s.update(self._b(v) for v in values)
+        return len(s) - before
+
+    def smembers(self, name):
+        return set(self.data.get(self._b(name), set()))
+
+    def zincrby(self, name, amount, value):
+        z = self.data.setdefault(self._b(name), {})
+        score = z.get(self._b(value), 0.0) + amount
+        z[self._b(value)] = score
+        return score
+
+    def zadd(self, name, mapping, gt=False):
+        z = self.data.setdefault(self._b(name), {})
+        added = 0
+        for member, score in mapping.items():
+            member = self._b(member)
+            current = z.get(member)
+            if current is None:
+                added += 1
+            elif gt and score <= current:
+                continue
+            z[member] = float(score)
+        return added
+
+    def zcard(self, name):
+        return len(self.data.get(self._b(name), {}))
+
+    def zscore(self, name, value):
+        return self.data.get(self._b(name), {}).get(self._b(value))
+
+    def zrange(self, name, start, end, withscores=False):
+        z = self.data.get(self._b(name), {})
+        items = sorted(z.items(), key=lambda item: (item[1], item[0]))
+        items = items[start:(end + 1) or None]
+        return items if withscores else [member for member, _ in items]
+
+    def rpush(self, name, *values):
+        items = self.data.setdefault(self._b(name), [])
+        items.extend(self._b(v) for v in values)
+        return len(items)
+
+    def ltrim(self, name, start, end):
+        items = self.data.get(self._b(name))
+        if items is not None:
+            self.data[self._b(name)] = items[start:(end + 1) or None]
+        return True
+
+    def lrange(self, name, start, end):
+        return list(self.data.get(self._b(name), [])[start:(end + 1) or None])
+
+    def delete(self, *names):
+        return sum(self.data.pop(self._b(name), None) is not None for name in names)
+
+
+class MemoryPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, command):
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        with self.client.lock:
+            return [getattr(self.client, command)(*args, **kwargs) for command, args, kwargs in commands]
+
+
+_memory = None
+
+
+def connect(url=REDIS_URL):
+    """Client Redis pour `url` ; memory:// partage un MemoryRedis unique dans le processus."""
+    global _memory
+    if url.startswith('memory://'):
+        if _memory is None:
+            _memory = MemoryRedis()
+        return _memory
+    if redis is None:
+        raise RuntimeError("REDIS_URL défini mais le module redis est absent (pip install redis)")
+    return redis.Redis.from_url(url)
+
+
+class AggregateStore:
+    def __init__(self, client, prefix=REDIS_PREFIX, templates_max=ROUTE_TEMPLATES_MAX):
+        self.client = client
+        self.prefix = prefix
+        # Plafond de routes distinctes sous ce préfixe, tous incréments confondus (None = sans plafond)
+        self.templates_max = templates_max
+
+    def key(self, *parts):
+        return f"{self.prefix}:{'|'.join(parts)}"
+
+    # --- ÉCRITURE (ingesteur unique) ---
+    def checkpoint(self, head):
+        """
+        Plancher {"file", "offset"} de la lignée d'empreinte `head` ; None si rien (fichier nouveau
+        ou réécrit). Sans entrée exacte, la plus longue empreinte enregistrée qui en est un préfixe
+        (un petit fichier a pu grossir depuis).
+        """
+        if not head: return None
+        raw = self.client.hget(self.key('ingested'), head)
+        if raw is not None:
+            return json.loads(raw)
+        best, best_head = None, ''
+        for field, raw in self.client.hgetall(self.key('ingested')).items():
+            stored = _text(field)
+            if stored and len(stored) > len(best_head) and head.startswith(stored):
+                best, best_head = json.loads(raw), stored
+        return best
+
+    def _merged_uniques(self, stats):
+        # Pas de commande Redis pour l'union de deux UniqueCounter : lecture, fusion puis réécriture
+        # dans la transaction (sûr tant qu'un seul ingesteur écrit sous ce préfixe)
+        k = self.key
+        counters = {k('ips'): stats['overview'].unique_ips}
+        for date, b in stats['daily'].items():
+            counters[k('ips', 'd', date)] = b.ips
+        for date, hours in stats['hourly'].items():
+            for hour, b in hours.items():
+                counters[k('ips', 'h', date, hour)] = b.ips
+        names = list(counters)
+        for name, blob in zip(names, self.client.mget(names)):
+            if blob is not None:
+                stored = UniqueCounter.from_bytes(blob)
+                stored.merge(counters[name])
+                counters[name] = stored
+        return counters
+
+    def _merged_reservoirs(self, stats):
+        # Même schéma que les IPs uniques : réservoir stocké relu, fusionné (EventReservoir.merge)
+        # avec celui de l'incrément, puis réécrit en entier dans la transaction
+        k = self.key
+        slots = [(date, hour, reservoir) for date, hours in stats['hourly_events'].items()
+                 for hour, reservoir in hours.items() if reservoir.seen]
+        pipe = self.client.pipeline(transaction=False)
+        for date, hour, _ in slots:
+            pipe.lrange(k('ev', date, hour), 0, -1)
+            pipe.hget(k('seen'), f'{date}|{hour}')
+        replies = pipe.execute()
+        merged = {}
+        for i, (date, hour, reservoir) in enumerate(slots):
+            events, seen = replies[2 * i:2 * i + 2]
+            stored = EventReservoir()
+            stored.events = [tuple(json.loads(event)) for event in events]
+            stored.seen = int(seen) if seen is not None else 0
+            stored.merge(reservoir)
+            merged[(date, hour)] = stored
+        return merged
+
+    def _capped_endpoints(self, stats):
+        # Chaque incrément est plafonné seul (new_stats neuf) : le plafond global se vérifie ici contre
+        # les routes déjà stockées, les nouvelles routes au-delà rejoignent ROUTE_OVERFLOW.
+        # Lecture hors transaction : sans danger avec un seul ingesteur, comme pour les uniques.
+        endpoints = stats['endpoints']
+        if self.templates_max is None: return endpoints
+        routes = [route for route in endpoints if route != ROUTE_OVERFLOW]
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zcard(self.key('endpoints'))
+        pipe.zscore(self.key('endpoints'), ROUTE_OVERFLOW)
+        for route in routes:
+            pipe.zscore(self.key('endpoints'), route)
+        count, overflow, *scores = pipe.execute()
+        if overflow is not None: count -= 1
+        capped = defaultdict(EndpointStats)
+        for route, score in zip(routes, scores):
+            key = route
+            if score is None:
+                if count < self.templates_max: count += 1
+                else: key = ROUTE_OVERFLOW
+            capped[key].merge(endpoints[route])
+        if ROUTE_OVERFLOW in endpoints:
+            capped[ROUTE_OVERFLOW].merge(endpoints[ROUTE_OVERFLOW])
+        return capped
+
+    def push(self, stats, file_offsets):
+        """
+        Pousse l'agrégat partiel `stats` (lignes au-delà des planchers) et les nouveaux planchers
+        {fichier: (head, offset)} en une seule transaction. Retourne le nombre de commandes.
+        """
+        k = self.key
+        counters = self._merged_uniques(stats)
+        reservoirs = self._merged_reservoirs(stats)
+        pipe = self.client.pipeline(transaction=True)
+
+        o = stats['overview']
+        pipe.hincrby(k('overview'), 'reqs', o.total_reqs)
+        pipe.hincrby(k('overview'), 'sql', o.total_sql)
+        pipe.hincrbyfloat(k('overview'), 'egress_kb', o.total_egress_kb)
+        maxima = {'ram': o.max_ram}
+        for name, counter in counters.items():
+            pipe.set(name, counter.to_bytes())
+
+        for date, b in stats['daily'].items():
+            name = k('d', date)
+            pipe.sadd(k('days'), date)
+            pipe.hincrby(name, 'reqs', b.reqs)
+            pipe.hincrby(name, 'sql', b.sql)
+            pipe.hincrbyfloat(name, 'egress_kb', b.egress_kb)
+            pipe.hincrbyfloat(name, 'duration_sum', b.duration_sum)
+        for date, hours in stats['hourly'].items():
+            if not hours: continue
+            pipe.sadd(k('hours', date), *hours)
+            for hour, b in hours.items():
+                name = k('h', date, hour)
+                pipe.hincrby(name, 'reqs', b.reqs)
+                pipe.hincrby(name, 'sql', b.sql)
+                pipe.hincrbyfloat(name, 'egress_kb', b.egress_kb)
+
+        for route, ep in self._capped_endpoints(stats).items():
+            name = k('ep', route)
+            pipe.zincrby(k('endpoints'), ep.hits, route)
+            pipe.hincrby(name, 'sql_total', ep.sql_total)
+            pipe.hincrby(name, 'rows_total', ep.rows_total)
+            pipe.hincrbyfloat(name, 'egress_kb', ep.egress_kb)
+            pipe.hset(name, 'type', ep.type)
+            maxima[f'ep|{route}'] = ep.mem_max
+            sketch = ep.dur_sketch
+            if sketch is not None:
+                pipe.hincrby(name, 'dur_count', sketch.count)
+                pipe.hincrby(name, 'dur_zero', sketch.zero_count)
+                for bucket, count in sketch.bins.items():
+                    pipe.hincrby(k('dur', route), bucket, count)
+                maxima[f'dur|{route}'] = sketch.max
+            history = k('eph', route)
+            for date, h in ep.history.items():
+                pipe.hincrby(history, f'{date}|hits', h.hits)
+                pipe.hincrby(history, f'{date}|sql_sum', h.sql_sum)
+                pipe.hincrbyfloat(history, f'{date}|dur_sum', h.dur_sum)
+                maxima[f'eph|{route}|{date}'] = h.mem_max
+        # ZADD GT (Redis >= 6.2) : un maximum n'est remplacé que par plus grand
+        pipe.zadd(k('max'), maxima, gt=True)
+
+        for (date, hour), reservoir in reservoirs.items():
+            name = k('ev', date, hour)
+            pipe.hset(k('seen'), f'{date}|{hour}', reservoir.seen)
+            pipe.delete(name)
+            pipe.rpush(name, *(json.dumps(event) for event in reservoir.events))
+
+        for file_path, (head, offset) in file_offsets.items():
+            if head:
+                pipe.hset(k('ingested'), head, json.dumps({'file': file_path, 'offset': offset}))
+        return len(pipe.execute())
+
+    # --- LECTURE (dashboards) ---
+    def load_stats(self):
+        """Reconstruit un agrégat complet (format new_stats) depuis Redis, en trois allers-retours pipelinés."""
+        k = self.key
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(k('overview'))
+        pipe.get(k('ips'))
+        pipe.smembers(k('days'))
+        pipe.zrange(k('endpoints'), 0, -1, withscores=True)
+        pipe.zrange(k('max'), 0, -1, withscores=True)
+        pipe.hgetall(k('seen'))
+        overview, ips, days, routes, maxima, seen = pipe.execute()
+        maxima = {_text(member): score for member, score in maxima}
+        seen = {_text(key): int(value) for key, value in seen.items()}
+
+        stats = new_stats()
+        o = stats['overview']
+        o.total_reqs = int(overview.get(b'reqs', 0))
+        o.total_sql = int(overview.get(b'sql', 0))
+        o.total_egress_kb = float(overview.get(b'egress_kb', 0))
+        o.max_ram = maxima.get('ram', 0.0)
+        if ips is not None:
+            o.unique_ips = UniqueCounter.from_bytes(ips)
+
+        days = sorted(_text(d) for d in days)
+        pipe = self.client.pipeline(transaction=False)
+        for date in days:
+            pipe.hgetall(k('d', date))
+            pipe.get(k('ips', 'd', date))
+            pipe.smembers(k('hours', date))
+        replies = pipe.execute()
+        hours_of = {}
+        for i, date in enumerate(days):
+            counters, blob, hours = replies[3 * i:3 * i + 3]
+            b = stats['daily'][date]
+            b.reqs, b.sql = int(counters.get(b'reqs', 0)), int(counters.get(b'sql', 0))
+            b.egress_kb, b.duration_sum = float(counters.get(b'egress_kb', 0)), float(counters.get(b'duration_sum', 0))
+            if blob is not None: b.ips = UniqueCounter.from_bytes(blob)
+            hours_of[date] = sorted(_text(h) for h in hours)
+
+        slots = [(date, hour) for date in days for hour in hours_of[date]]
+        routes = [(_text(route), int(hits)) for route, hits in routes]
+        pipe = self.client.pipeline(transaction=False)
+        for date, hour in slots:
+            pipe.hgetall(k('h', date, hour))
+            pipe.get(k('ips', 'h', date, hour))
+            pipe.lrange(k('ev', date, hour), 0, -1)
+        for route, _ in routes:
+            pipe.hgetall(k('ep', route))
+            pipe.hgetall(k('dur', route))
+            pipe.hgetall(k('eph', route))
+        replies = pipe.execute()
+
+        for i, (date, hour) in enumerate(slots):
+            counters, blob, events = replies[3 * i:3 * i + 3]
+            b = stats['hourly'][date][hour]
+            b.reqs, b.sql = int(counters.get(b'reqs', 0)), int(counters.get(b'sql', 0))
+            b.egress_kb = float(counters.get(b'egress_kb', 0))
+            if blob is not None: b.ips = UniqueCounter.from_bytes(blob)
+            reservoir = EventReservoir()
+            reservoir.events = [tuple(json.loads(event)) for event in events]
+            reservoir.seen = max(seen.get(f'{date}|{hour}', 0), len(reservoir.events))
+            stats['hourly_events'][date][hour] = reservoir
+
+        base = 3 * len(slots)
+        # Ordre d'insertion par hits décroissants, comme un parsing qui rencontre d'abord les routes chaudes
+        for j, (route, hits) in sorted(enumerate(routes), key=lambda item: -item[1][1]):
+            counters, bins, history = replies[base + 3 * j:base + 3 * j + 3]
+            ep = stats['endpoints'][route]
+            ep.hits = hits
+            ep.type = _text(counters.get(b'type', b'WEB'))
+            ep.sql_total, ep.rows_total = int(counters.get(b'sql_total', 0)), int(counters.get(b'rows_total', 0))
+            ep.egress_kb = float(counters.get(b'egress_kb', 0))
+            ep.mem_max = maxima.get(f'ep|{route}', 0.0)
+            if b'dur_count' in counters:
+                sketch = ep.dur_sketch = QuantileSketch()
+                sketch.count, sketch.zero_count = int(counters[b'dur_count']), int(counters.get(b'dur_zero', 0))
+                sketch.bins = {int(bucket): int(count) for bucket, count in bins.items()}
+                sketch.max = maxima.get(f'dur|{route}', 0.0)
+            days_seen = defaultdict(HistoryBucket)
+            for field, value in history.items():
+                date, metric = _text(field).rsplit('|', 1)
+                setattr(days_seen[date], metric, float(value) if metric == 'dur_sum' else int(value))
+            for date in sorted(days_seen):
+                h = ep.history[date] = days_seen[date]
+                h.mem_max = maxima.get(f'eph|{route}|{date}', 0.0)
+        return stats
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests du store d'agrégats Redis : contre un redis-server local si REDIS_URL est défini
+(ex. REDIS_URL=redis://localhost:6379/15), sinon contre le stand-in MemoryRedis.
+Les agrégats relus depuis Redis doivent égaler ceux d'un parsing local des mêmes logs.
+Usage : python -m pytest -q redis_test.py
+"""
+
+import gzip
+import os
+import tempfile
+import uuid
+from collections import Counter
+
+from aggregates import HOURLY_SAMPLE_SIZE, new_stats
+from loggen import LogGenerator
+from redis_store import REDIS_URL, AggregateStore, MemoryRedis, connect
+from remote_analyzer import EnterpriseMonitor
+from routes import ROUTE_OVERFLOW
+from sketches import UniqueCounter
+
+
+def new_store():
+    client = connect(REDIS_URL) if REDIS_URL else MemoryRedis()
+    # Préfixe unique : les tests ne se marchent pas dessus sur un serveur partagé
+    return AggregateStore(client, prefix=f"test-{uuid.uuid4().hex[:8]}")
+
+
+def cleanup(store):
+    keys = store.client.keys(f"{store.prefix}:*")
+    if keys and not isinstance(store.client, MemoryRedis):
+        store.client.delete(*keys)
+
+
+def local_stats(files):
+    monitor = EnterpriseMonitor()
+    monitor.parse_logs(files)
+    return monitor.stats
+
+
+def assert_same(expected, actual):
+    o, r = expected['overview'], actual['overview']
+    assert (o.total_reqs, o.total_sql, o.max_ram) == (r.total_reqs, r.total_sql, r.max_ram)
+    assert abs(o.total_egress_kb - r.total_egress_kb) < 1e-6 * max(1, o.total_egress_kb)
+    assert len(o.unique_ips) == len(r.unique_ips)
+
+    assert sorted(expected['daily']) == sorted(actual['daily'])
+    for date, b in expected['daily'].items():
+        c = actual['daily'][date]
+        assert (b.reqs, b.sql, len(b.ips)) == (c.reqs, c.sql, len(c.ips))
+        assert abs(b.duration_sum - c.duration_sum) < 1e-6 * max(1, b.duration_sum)
+        assert sorted(expected['hourly'][date]) == sorted(actual['hourly'][date])
+        for hour, h in expected['hourly'][date].items():
+            g = actual['hourly'][date][hour]
+            assert (h.reqs, h.sql, len(h.ips)) == (g.reqs, g.sql, len(g.ips))
+            # Réservoirs uniformes tirés indépendamment : seuls le volume et la taille sont comparés
+            e, a = expected['hourly_events'][date][hour], actual['hourly_events'][date][hour]
+            assert (e.seen, len(e.events)) == (a.seen, len(a.events))
+
+    assert sorted(expected['endpoints']) == sorted(actual['endpoints'])
+    for route, ep in expected['endpoints'].items():
+        got = actual['endpoints'][route]
+        assert (ep.hits, ep.type, ep.sql_total, ep.rows_total, ep.mem_max) == \
+               (got.hits, got.type, got.sql_total, got.rows_total, got.mem_max)
+        if ep.dur_sketch is None:
+            assert got.dur_sketch is None
+        else:
+            assert ep.dur_sketch.count == got.dur_sketch.count
+            assert ep.dur_sketch.quantile(0.95) == got.dur_sketch.quantile(0.95)
+        assert sorted(ep.history) == sorted(got.history)
+        for date, h in ep.history.items():
+            g = got.history[date]
+            assert (h.hits, h.sql_sum, h.mem_max) == (g.hits, g.sql_sum, g.mem_max)
+
+
+def test_unique_counter_bytes():
+    for n in (0, 50, 20000):
+        counter = UniqueCounter()
+        for i in range(n):
+            counter.add(f"10.0.{i >> 8}.{i & 255}")
+        restored = UniqueCounter.from_bytes(counter.to_bytes())
+        assert len(restored) == len(counter)
+        assert (restored.exact is None) == (counter.exact is None)
+
+
+def test_roundtrip_matches_local_parse():
+    store = new_store()
+    with tempfile.TemporaryDirectory() as directory:
+        files = LogGenerator(paths=300, ips=800, days=3, seed=7).write(directory, 20000)
+        monitor = EnterpriseMonitor(shared=store, ingest=True)
+        assert monitor.ingest_shared(files) == 20000
+        assert_same(local_stats(files), store.load_stats())
+    cleanup(store)
+
+
+def test_reingest_is_idempotent():
+    store = new_store()
+    with tempfile.TemporaryDirectory() as directory:
+        files = LogGenerator(paths=100, ips=300, days=2, seed=3).write(directory, 5000)
+        monitor = EnterpriseMonitor(shared=store, ingest=True)
+        monitor.ingest_shared(files)
+        # Les planchers poussés avec les compteurs : rien n'est recompté
+        assert monitor.ingest_shared(files) == 0
+        assert_same(local_stats(files), store.load_stats())
+    cleanup(store)
+
+
+def test_incremental_ingest():
+    store = new_store()
+    with tempfile.TemporaryDirectory() as directory:
+        files = LogGenerator(paths=200, ips=500, days=2, seed=11).write(directory, 8000)
+        contents = []
+        for f in files:
+            with open(f, 'r', encoding='utf-8') as fh:
+                contents.append(fh.readlines())
+        # Première moitié, puis ajout du reste (tail de logs)
+        for f, lines in zip(files, contents):
+            with open(f, 'w', encoding='utf-8') as fh:
+                fh.writelines(lines[:len(lines) // 2])
+        monitor = EnterpriseMonitor(shared=store, ingest=True)
+        first = monitor.ingest_shared(files)
+        for f, lines in zip(files, contents):
+            with open(f, 'a', encoding='utf-8') as fh:
+                fh.writelines(lines[len(lines) // 2:])
+        assert first + monitor.ingest_shared(files) == 8000
+        assert_same(local_stats(files), store.load_stats())
+    cleanup(store)
+
+
+def test_rotation_does_not_double_count():
+    store = new_store()
+    with tempfile.TemporaryDirectory() as directory:
+        generated = LogGenerator(paths=200, ips=500, days=2, seed=13).write(os.path.join(directory, 'all'), 9000)
+        live = [os.path.join(directory, os.path.basename(f)) for f in generated]
+        contents = []
+        for f in generated:
+            with open(f, 'rb') as fh:
+                contents.append(fh.readlines())
+        # 6k lignes dont la moitié poussée avant la rotation, 3k après dans un x.log neuf
+        for f, lines in zip(live, contents):
+            with open(f, 'wb') as fh:
+                fh.writelines(lines[:len(lines) // 3])
+        monitor = EnterpriseMonitor(shared=store, ingest=True)
+        first = monitor.ingest_shared(live)
+        archives = [f + '.1.gz' for f in live]
+        for f, archive, lines in zip(live, archives, contents):
+            cut = len(lines) * 2 // 3
+            with gzip.open(archive, 'wb') as fh:
+                fh.writelines(lines[:cut])
+            with open(f, 'wb') as fh:
+                fh.writelines(lines[cut:])
+        assert first + monitor.ingest_shared(archives + live) == 9000
+        assert monitor.ingest_shared(archives + live) == 0
+        assert store.load_stats()['overview'].total_reqs == 9000
+    cleanup(store)
+
+
+def test_event_sample_stays_uniform_across_pushes():
+    store = new_store()
+    # Dix incréments successifs de la même heure : le réservoir fusionné doit les représenter tous
+    for batch in range(10):
+        stats = new_stats()
+        stats['daily']['2026-01-01'].reqs = stats['hourly']['2026-01-01']['10'].reqs = 1000
+        reservoir = stats['hourly_events']['2026-01-01']['10']
+        for i in range(1000):
+            slot = reservoir.slot()
+            if slot >= 0:
+                reservoir.events[slot] = ('10:00:00', '10.0.0.1', f'/batch/{batch}/', 1, 0.0, 0.0, 'WEB', '')
+        store.push(stats, {})
+    merged = store.load_stats()['hourly_events']['2026-01-01']['10']
+    assert merged.seen == 10000 and len(merged.events) == HOURLY_SAMPLE_SIZE
+    per_batch = Counter(event[2] for event in merged.events)
+    assert len(per_batch) == 10
+    assert min(per_batch.values()) > HOURLY_SAMPLE_SIZE / 10 * 0.6
+    cleanup(store)
+
+
+def test_route_cap_holds_across_pushes():
+    client = connect(REDIS_URL) if REDIS_URL else MemoryRedis()
+    store = AggregateStore(client, prefix=f"test-{uuid.uuid4().hex[:8]}", templates_max=5)
+    # Quatre incréments de 10 routes nouvelles : le plafond vaut pour tout le préfixe, pas par push
+    for batch in range(4):
+        stats = new_stats()
+        for i in range(10):
+            ep = stats['endpoints'][f'/batch/{batch}/{i}/']
+            ep.hits, ep.type = i + 1, 'WEB'
+        store.push(stats, {})
+    endpoints = store.load_stats()['endpoints']
+    assert len(endpoints) == 6 and ROUTE_OVERFLOW in endpoints
+    assert sorted(r for r in endpoints if r != ROUTE_OVERFLOW) == [f'/batch/0/{i}/' for i in range(5)]
+    assert sum(ep.hits for ep in endpoints.values()) == 4 * 55
+    assert endpoints[ROUTE_OVERFLOW].hits == 4 * 55 - 15
+    cleanup(store)
+
+
+def test_reader_sees_ingested_stats():
+    store = new_store()
+    with tempfile.TemporaryDirectory() as directory:
+        files = LogGenerator(paths=50, ips=100, days=1, seed=5).write(directory, 2000)
+        EnterpriseMonitor(shared=store, ingest=True).sync_shared(files)
+        reader = EnterpriseMonitor(shared=AggregateStore(store.client, store.prefix))
+        reader.sync_shared([])
+        assert reader.stats['overview'].total_reqs == 2000
+        assert len(reader.endpoint_index()) == len(reader.stats['endpoints'])
+    cleanup(store)
@@ -1,20 +1,40 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import paramiko
 import os
 import re
 import json
+import pickle
+import mmap
+import gzip
+import io
+import zlib
 import math
-import statistics
+import sys
+import hashlib
+import queue
 import socket
 import webbrowser
-from http.server import SimpleHTTPRequestHandler
-from socketserver import TCPServer
-from collections import defaultdict
-from threading import Thread
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from concurrent.futures import ProcessPoolExecutor
+from threading import Thread, Lock, RLock
 import time
 
+import pa_transport
+import profiling
+import sparse_history
+from aggregates import new_stats, merge_stats, EVENT_FIELDS
+from endpoint_index import EndpointIndex, PAGE_SIZE
+from geoip import GEOIP_DB, country_code, get_database
+from html_stream import HtmlStream
+from profiling import stage
+from redis_store import REDIS_URL, AggregateStore, connect
+from rollups import ROLLUP_VIEW_DAYS, RollupStore, to_epoch
+from routes import ROUTE_OVERFLOW, ROUTE_TEMPLATES_MAX, endpoint_key, route_template
+from sketches import QuantileSketch, hash64
+
 # --- CHARGEMENT CONFIGURATION ---
 try:
     from dotenv import load_dotenv
@@ -22,6 +42,30 @@ try:
 except ImportError:
     pass
 
+# Optionnel : archives .zst et compression zstd du transfert
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Optionnel : variante Brotli du dashboard servi
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Optionnel : event store colonnaire (NumPy)
+try:
+    from event_store import parse_time
+except ImportError:
+    parse_time = None
+
+# Optionnel : détection de régressions par endpoint (NumPy)
+try:
+    import anomaly
+except ImportError:
+    anomaly = None
+
 # CONFIGURATION SSH & PATHS
 PA_HOST = os.getenv("PA_HOST", "ssh.pythonanywhere.com")
 PA_USER = os.getenv("PA_USER", "Cicaw")
@@ -45,147 +89,757 @@ LOG_PATTERN = re.compile(
     r"(?:\s+\|\s+Mem:\s+(?P<mem>[\d\.]+)\s*MB)?"
 )
 
+# Variante stricte du format nominal ; ancrée en fin de ligne pour qu'un champ optionnel
+# mal formé ne soit pas ignoré silencieusement (la ligne part alors vers LOG_PATTERN)
+FAST_LOG_PATTERN = re.compile(
+    r"INFO +(\d{4}-\d\d-\d\d) (\d\d:\d\d:\d\d)[^|]*?IP: ([\d.]+) \| Path: (.*?) \| "
+    r"Queries: (\d+) \| Rows: (\d+) \| Est\. Size: ([\d.]+) KB"
+    r"(?: \| Duration: ([\d.]+)s)?(?: \| Mem: ([\d.]+) MB)?\s*$"
+)
+_fast_match = FAST_LOG_PATTERN.match
+# Même format, sur octets bruts et en multiligne pour finditer sur un buffer mmap
+# (aucun motif ne peut franchir un '\n'). Pas de '^' : le préfixe littéral INFO permet
+# au moteur de sauter directement aux candidats ; le début de ligne est vérifié à part.
+FAST_LOG_SCAN = re.compile(
+    rb"INFO +(\d{4}-\d\d-\d\d) (\d\d:\d\d:\d\d)[^|\n]*?IP: ([\d.]+) \| Path: (.*?) \| "
+    rb"Queries: (\d+) \| Rows: (\d+) \| Est\. Size: ([\d.]+) KB"
+    rb"(?: \| Duration: ([\d.]+)s)?(?: \| Mem: ([\d.]+) MB)?[ \t\r\f\v]*$",
+    re.MULTILINE
+)
+
+def _parse_line_regex(line):
+    match = LOG_PATTERN.search(line)
+    if not match: return None
+    d = match.groupdict()
+    return (
+        d['date'], d['time'], d['ip'], d['path'].strip(),
+        int(d['queries']), int(d['rows']), float(d['size']),
+        float(d['duration']) if d['duration'] else 0.0,
+        float(d['mem']) if d['mem'] else 0.0,
+    )
+
+def parse_line(line):
+    """
+    Parse une ligne au format fixe du middleware :
+    INFO <date> <heure>... IP: x | Path: p | Queries: n | Rows: n | Est. Size: f KB [| Duration: fs] [| Mem: f MB]
+    Retourne (date, time, ip, path, queries, rows, size, duration, mem) ou None.
+    FAST_LOG_PATTERN est ancré (match, séparateurs exacts, pas de recherche paresseuse
+    depuis chaque position) et renvoie un tuple sans groupdict ; toute anomalie de mise
+    en forme est confiée à LOG_PATTERN, qui reste la référence.
+    """
+    m = _fast_match(line)
+    if m is None:
+        # LOG_PATTERN exige les deux : inutile de le lancer sinon
+        if not line.startswith('INFO') or 'IP:' not in line: return None
+        try:
+            return _parse_line_regex(line)
+        except ValueError:
+            return None  # Nombre mal formé (ex: "1.2.3") : ligne ignorée
+    date, time_str, ip, path, queries, rows, size, duration, mem = m.groups()
+    try:
+        return (
+            date, time_str, ip, path.strip(), int(queries), int(rows), float(size),
+            float(duration) if duration else 0.0, float(mem) if mem else 0.0,
+        )
+    except ValueError:
+        return None
+
 OUTPUT_FILENAME = "dashboard_omniview_v9.html"
+# Mode production (--serve) : écoute sur toutes les interfaces, sans ouvrir de navigateur
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+# Mode --live : intervalle de tail des logs distants et heartbeat SSE (secondes)
+LIVE_INTERVAL = int(os.getenv("LIVE_INTERVAL", "15"))
+LIVE_HEARTBEAT = 15
+LIVE_MAX_ENDPOINTS = 500
 LOCAL_LOG_DIR = "logs_buffer"
+SYNC_STATE_FILE = os.path.join(LOCAL_LOG_DIR, "sync_state.json")
+SYNC_CHUNK_SIZE = 1024 * 1024
+SYNC_HEAD_BYTES = 64  # Empreinte du début de fichier, détecte une rotation même sans inode
+STATE_FILE = os.path.join(LOCAL_LOG_DIR, "monitor_state.pkl")
+STATE_VERSION = 9
+# Parsing multi-processus : nombre de workers et taille minimale de la plage à découper
+# (en dessous, le coût de démarrage du pool dépasse le gain)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+# Backend de lecture des buffers locaux : 'mmap' (octets bruts) ou 'lines' (ligne à ligne)
+PARSE_IO_BACKEND = os.getenv("PARSE_IO_BACKEND", "mmap")
+# Stockage colonnaire (NumPy) de tous les événements, pour les requêtes ad hoc de /api/query
+EVENT_STORE = os.getenv("EVENT_STORE", "0") == "1"
+# Rollups minute / heure / jour persistés (historique au-delà des logs bruts conservés)
+ROLLUPS = os.getenv("ROLLUPS", "1") == "1"
+ROLLUP_DB = os.path.join(LOCAL_LOG_DIR, "rollups.sqlite")
+# Agrégats partagés Redis (REDIS_URL) : seule l'instance lancée avec --ingest télécharge et parse
+REDIS_INGEST = "--ingest" in sys.argv or os.getenv("REDIS_INGEST", "0") == "1"
+# Compression du transfert (optionnelle, désactivée par défaut) : REMOTE_COMPRESSION=gzip ou zstd
+# lance `tail -c | head -c | gzip` (ou zstd) sur le serveur via exec_command à chaque synchronisation,
+# au lieu d'une simple lecture SFTP. Vide (défaut) : SFTP brut, sans commande distante.
+REMOTE_COMPRESSION = os.getenv("REMOTE_COMPRESSION", "")
+REMOTE_COMPRESSORS = {'gzip': "gzip -1 -c", 'zstd': "zstd -1 -c -q"}
+# Récupère aussi les archives déjà rotées (db_traffic_v17.log.1.gz, ...), analysées sans décompression sur disque
+FETCH_ROTATED_ARCHIVES = os.getenv("FETCH_ROTATED_ARCHIVES", "0") == "1"
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+def _file_head(file_path):
+    """
+    Empreinte des premiers octets d'un fichier (détecte un buffer réécrit). Pour une archive,
+    celle du contenu décompressé : x.log.1.gz garde l'empreinte du x.log dont elle est issue.
+    """
+    if file_path.endswith(COMPRESSED_SUFFIXES):
+        with _open_compressed(file_path) as f:
+            return f.read(SYNC_HEAD_BYTES).hex()
+    with open(file_path, 'rb') as f:
+        return f.read(SYNC_HEAD_BYTES).hex()
+
+def _last_line_end(file_path, start):
+    """Position juste après le dernier '\\n' du fichier (une ligne partielle en fin n'est pas analysée)."""
+    with open(file_path, 'rb') as f:
+        pos = f.seek(0, os.SEEK_END)
+        while pos > start:
+            block_start = max(start, pos - 65536)
+            f.seek(block_start)
+            idx = f.read(pos - block_start).rfind(b'\n')
+            if idx != -1:
+                return block_start + idx + 1
+            pos = block_start
+    return start
+
+def _split_ranges(file_path, start, end, parts):
+    """Découpe [start, end) en `parts` plages alignées sur les fins de ligne."""
+    bounds = [start]
+    with open(file_path, 'rb') as f:
+        for i in range(1, parts):
+            guess = start + (end - start) * i // parts
+            if guess <= bounds[-1]: continue
+            f.seek(guess)
+            f.readline()
+            cut = min(f.tell(), end)
+            if cut > bounds[-1] and cut < end: bounds.append(cut)
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# --- BACKENDS D'I/O ---
+# Chaque backend produit (offset après la ligne, enregistrement parse_line) pour les lignes reconnues
+def _records_lines(file_path, start, end):
+    """Lecture ligne à ligne (un objet bytes par ligne, décodage des seules lignes INFO)."""
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        pos = start
+        for raw in f:
+            # Ligne en cours d'écriture côté serveur : on la reprendra au prochain passage
+            if pos >= end or not raw.endswith(b'\n'): break
+            pos += len(raw)
+            # Rejet des lignes non-INFO avant tout décodage
+            if not raw.startswith(b'INFO'): continue
+            rec = parse_line(raw.decode('utf-8', errors='ignore'))
+            if rec is not None: yield pos, rec
+
+def _gap_records(mm, start, end):
+    """Lignes ignorées par le scan rapide : seules les lignes INFO avec 'IP:' passent par parse_line."""
+    pos = start
+    while pos < end:
+        eol = mm.find(b'\n', pos, end)
+        if eol < 0: eol = end
+        if mm[pos:pos + 4] == b'INFO' and mm.find(b'IP:', pos, eol) >= 0:
+            rec = parse_line(mm[pos:eol].decode('utf-8', errors='ignore'))
+            if rec is not None: yield eol + 1, rec
+        pos = eol + 1
+
+def _records_mmap(file_path, start, end):
+    """
+    Lecture mmap : FAST_LOG_SCAN parcourt le buffer brut en C (finditer multiligne),
+    seuls les champs capturés sont décodés et les lignes non reconnues ne sont jamais
+    copiées. Entre deux correspondances, un trou contenant 'IP:' signale une ligne
+    anormale, confiée à parse_line (et donc à LOG_PATTERN).
+    """
+    if end <= start: return
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        prev = start
+        for m in FAST_LOG_SCAN.finditer(mm, start, end):
+            line_start = m.start()
+            if line_start != start and mm[line_start - 1] != 10: continue  # 'INFO' en milieu de ligne
+            if line_start > prev and mm.find(b'IP:', prev, line_start) >= 0:
+                yield from _gap_records(mm, prev, line_start)
+            prev = m.end() + 1
+            date, time_str, ip, path, queries, rows, size, duration, mem = m.groups()
+            try:
+                rec = (
+                    date.decode(), time_str.decode(), ip.decode(), path.decode('utf-8', errors='ignore').strip(),
+                    int(queries), int(rows), float(size),
+                    float(duration) if duration else 0.0, float(mem) if mem else 0.0,
+                )
+            except ValueError:
+                continue  # Nombre mal formé : ligne ignorée, comme parse_line
+            yield prev, rec
+        if prev < end and mm.find(b'IP:', prev, end) >= 0:
+            yield from _gap_records(mm, prev, end)
+
+IO_BACKENDS = {'lines': _records_lines, 'mmap': _records_mmap}
+
+def _decompressor(codec):
+    if codec == 'zstd': return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj(wbits=31)  # En-tête gzip
+
+def _open_compressed(file_path):
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rb')
+    if zstandard is None:
+        raise RuntimeError("module 'zstandard' requis pour lire les archives .zst")
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True))
+
+def _records_compressed(file_path, start, end):
+    """
+    Archive .gz/.zst décompressée en flux : rien n'est écrit dans logs_buffer.
+    Une archive est immuable et lue en entier ; les offsets produits sont ceux du contenu
+    décompressé (mêmes positions que dans le fichier vivant d'avant la rotation), les lignes
+    finissant avant `start` sont sautées. `end` (octets compressés) ne sert qu'au ratio affiché.
+    """
+    t0 = time.perf_counter()
+    raw_bytes = 0
+    with _open_compressed(file_path) as f:
+        for raw in f:
+            raw_bytes += len(raw)
+            if raw_bytes <= start or not raw.startswith(b'INFO'): continue
+            rec = parse_line(raw.decode('utf-8', errors='ignore'))
+            if rec is not None: yield raw_bytes, rec
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    print(f"   🗜️ {os.path.basename(file_path)}: {raw_bytes / 1024 / 1024:.1f} MB décompressés et analysés "
+          f"en {elapsed:.2f}s ({raw_bytes / 1024 / 1024 / elapsed:.1f} MB/s, ratio x{raw_bytes / max(end, 1):.1f})")
+
+def aggregate_range(stats, file_path, start, end, is_cmd_file, io_backend='mmap', templates_max=ROUTE_TEMPLATES_MAX,
+                    rollup_from=-1):
+    """
+    Agrège les lignes complètes de [start, end) dans `stats`.
+    Seules les lignes finissant après `rollup_from` alimentent le buffer de rollups (déjà ingérées sinon).
+    Retourne l'offset atteint (< end si une erreur a interrompu la lecture) ; pour une archive,
+    l'offset décompressé après la dernière ligne analysée.
+    """
+    overview, daily, hourly = stats['overview'], stats['daily'], stats['hourly']
+    hourly_events, endpoints = stats['hourly_events'], stats['endpoints']
+    store, rollup = stats['events'], stats['rollups']
+    records = _records_compressed if file_path.endswith(COMPRESSED_SUFFIXES) else IO_BACKENDS[io_backend]
+    pos = start
+    try:
+        for pos, rec in records(file_path, start, end):
+            date, time_str, ip, path, queries, rows, size, duration, mem = rec
+            hour = time_str[:2]
+            
+            row_type = 'CMD' if (is_cmd_file or 'CMD::' in path or duration > 0) else 'WEB'
+            # Template de route (mémo LRU) : /product/123/ -> /product/{id}/
+            route = route_template(path)
+            # Hashé une fois, partagé par les compteurs d'IP uniques (global, jour, heure)
+            ip_hash = hash64(ip)
+            if store is not None:
+                store.append(date, time_str, ip, route, queries, rows, size, duration, mem, row_type == 'CMD')
+
+            # Overview
+            overview.total_reqs += 1
+            overview.total_sql += queries
+            overview.total_egress_kb += size
+            overview.unique_ips.add_hash(ip_hash)
+            if mem > overview.max_ram: overview.max_ram = mem
+
+            # Daily
+            day = daily[date]
+            day.reqs += 1
+            day.sql += queries
+            day.egress_kb += size
+            day.ips.add_hash(ip_hash)
+            if duration > 0: day.duration_sum += duration
+
+            # Hourly Stats
+            h_stats = hourly[date][hour]
+            h_stats.reqs += 1
+            h_stats.sql += queries
+            h_stats.egress_kb += size
+            h_stats.ips.add_hash(ip_hash)
+
+            # Hourly Events (réservoir uniforme pour la vue GeoIP, pays résolu localement)
+            reservoir = hourly_events[date][hour]
+            slot = reservoir.slot()
+            if slot >= 0:
+                reservoir.events[slot] = (
+                    time_str, ip, path.replace('CMD::', ''), queries, duration, mem, row_type, country_code(ip)
+                )
+
+            # Endpoints Aggregation (par template, plafonné à ROUTE_TEMPLATES_MAX)
+            ep = endpoints.get(route)
+            if ep is None:
+                route = endpoint_key(endpoints, route, templates_max)
+                ep = endpoints[route]
+            ep.type = row_type
+            ep.hits += 1
+            ep.sql_total += queries
+            ep.rows_total += rows
+            ep.egress_kb += size
+            if duration > 0: ep.add_duration(duration)
+            if mem > ep.mem_max: ep.mem_max = mem
+
+            # Endpoint History
+            hist = ep.history[date]
+            hist.hits += 1
+            hist.sql_sum += queries
+            hist.dur_sum += duration
+            if mem > hist.mem_max: hist.mem_max = mem
+
+            # Buffer des rollups SQLite : un agrégat par (endpoint, minute)
+            if rollup is not None and pos > rollup_from:
+                key = (route, date, time_str[:5])
+                acc = rollup.get(key)
+                if acc is None:
+                    acc = rollup[key] = [0, 0, 0, 0.0, 0.0, 0.0, 0.0]
+                acc[0] += 1
+                acc[1] += queries
+                acc[2] += rows
+                acc[3] += size
+                acc[4] += duration
+                if duration > acc[5]: acc[5] = duration
+                if mem > acc[6]: acc[6] = mem
+        if records is not _records_compressed:
+            pos = end
+    except Exception as e:
+        print(f"❌ Erreur lecture fichier {file_path}: {e}")
+    return pos
+
+def _parse_range_worker(task):
+    """Point d'entrée des workers : agrégat partiel d'une plage d'octets."""
+    file_path, start, end, is_cmd_file, io_backend, with_events, rollup_from = task
+    partial = new_stats(with_events, with_rollups=rollup_from is not None)
+    # Sans plafond de templates ici : merge_stats l'applique dans l'ordre, comme en séquentiel
+    reached = aggregate_range(partial, file_path, start, end, is_cmd_file, io_backend, templates_max=None,
+                              rollup_from=rollup_from if rollup_from is not None else -1)
+    return partial, reached
 
 class EnterpriseMonitor:
-    def __init__(self):
-        self.stats = {
-            'overview': {
-                'total_reqs': 0, 'total_sql': 0, 'total_egress_kb': 0,
-                'max_ram': 0, 'unique_ips': set()
-            },
-            'daily': defaultdict(lambda: {
-                'reqs': 0, 'sql': 0, 'egress_kb': 0, 
-                'ips': set(), 'duration_sum': 0
-            }),
-            'hourly': defaultdict(lambda: defaultdict(lambda: {
-                'reqs': 0, 'sql': 0, 'egress_kb': 0
-            })),
-            'hourly_events': defaultdict(lambda: defaultdict(list)),
-            'endpoints': defaultdict(lambda: {
-                'hits': 0, 
-                'sql': [], 
-                'rows': [], 
-                'size_kb': [], 
-                'durations': [], 
-                'mems': [], 
-                'type': 'WEB',
-                'history': defaultdict(lambda: {'hits': 0, 'sql_sum': 0, 'dur_sum': 0, 'mem_max': 0})
-            })
-        }
+    def __init__(self, state_file=None, workers=1, io_backend='mmap', event_store=False, rollup_db=None,
+                 shared=None, ingest=False):
+        if io_backend not in IO_BACKENDS:
+            raise ValueError(f"Backend d'I/O inconnu: {io_backend} (choix: {', '.join(IO_BACKENDS)})")
+        self.state_file = state_file
+        self.workers = workers
+        self.io_backend = io_backend
+        self.event_store = event_store
+        # Rollups SQLite (None = désactivés) : historique jour / heure / minute au-delà des logs bruts
+        self.rollups = RollupStore(rollup_db) if rollup_db else None
+        # Agrégats partagés (AggregateStore Redis, None = locaux) ; `ingest` : cette instance les alimente
+        self.shared = shared
+        self.ingest = ingest
+        # Protège sync_state / compteurs de transfert partagés entre canaux SFTP
+        self._sync_lock = Lock()
+        # HTML servi depuis la mémoire (+ variantes compressées), recalculé à chaque generate_html
+        self.dashboard_artifacts = None
+        # Sérialise parsing (thread --live) et lectures des routes /api
+        self.stats_lock = RLock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = new_stats(self.event_store, self.rollups is not None)
+        # Offset (octets) jusqu'auquel chaque fichier local a déjà été agrégé
+        self.file_offsets = {}
+        self._endpoint_index = None
+        self._anomalies = None
+
+    # --- SNAPSHOT DES AGRÉGATS ---
+    def load_state(self):
+        """Recharge le dernier snapshot (agrégats + offsets de parsing). Retourne True si chargé."""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return False
+        try:
+            with open(self.state_file, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('version') != STATE_VERSION:
+                print("⚠️ Snapshot d'une version antérieure ignoré, ré-analyse complète.")
+                return False
+            if self.event_store and state['stats']['events'] is None:
+                print("⚠️ Snapshot sans event store, ré-analyse complète pour le reconstruire.")
+                return False
+            if not self.event_store:
+                state['stats']['events'] = None
+            if self.rollups is not None and state['stats']['rollups'] is None:
+                # Les planchers d'ingestion évitent tout double comptage lors de cette ré-analyse
+                print("⚠️ Snapshot sans rollups, ré-analyse complète pour les alimenter.")
+                return False
+            if self.rollups is None:
+                state['stats']['rollups'] = None
+            self.stats = state['stats']
+            self.file_offsets = state['file_offsets']
+            print(f"♻️ Snapshot rechargé ({self.stats['overview'].total_reqs:,} requêtes déjà agrégées)")
+            return True
+        except Exception as e:
+            print(f"⚠️ Snapshot illisible ({e}), ré-analyse complète.")
+            self.reset_stats()
+            return False
+
+    def save_state(self):
+        if not self.state_file: return
+        tmp_name = self.state_file + ".tmp"
+        with open(tmp_name, 'wb') as f:
+            pickle.dump({'version': STATE_VERSION, 'stats': self.stats, 'file_offsets': self.file_offsets},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_name, self.state_file)
+
+    def _offsets_still_valid(self, files):
+        """Un fichier tronqué ou réécrit (rotation) invalide tout le snapshot : on ne sait pas soustraire."""
+        for file_path in files:
+            checkpoint = self.file_offsets.get(file_path)
+            if not checkpoint or not os.path.exists(file_path): continue
+            if os.path.getsize(file_path) < checkpoint['offset']: return False
+            if file_path.endswith(COMPRESSED_SUFFIXES) and os.path.getsize(file_path) != checkpoint['offset']: return False
+            if not _file_head(file_path).startswith(checkpoint['head']): return False
+        return True
 
     def fetch_logs(self):
         """Récupère les logs via SFTP ou utilise le cache local en cas d'erreur."""
         local_files = []
+        self.transfer_stats = {'raw_bytes': 0, 'wire_bytes': 0}
         if not os.path.exists(LOCAL_LOG_DIR):
             os.makedirs(LOCAL_LOG_DIR)
 
         try:
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            print(f"🔄 Connexion au cluster {PA_HOST}...")
-            
-            connect_kwargs = {"hostname": PA_HOST, "username": PA_USER, "timeout": 10}
-            if PA_PASSWORD:
-                connect_kwargs["password"] = PA_PASSWORD
-            
-            client.connect(**connect_kwargs)
-            sftp = client.open_sftp()
-            
-            for remote in REMOTE_LOGS:
-                local_name = os.path.join(LOCAL_LOG_DIR, os.path.basename(remote))
-                try:
-                    sftp.get(remote, local_name)
-                    local_files.append(local_name)
-                    print(f"✅ Sync Réussie: {remote}")
-                except Exception as e:
-                    print(f"⚠️ Erreur Sync {remote}: {e}")
-            
-            sftp.close()
-            client.close()
+            # Connexion partagée du processus : établie une fois, réutilisée aux rafraîchissements suivants
+            with stage('fetch_logs.connect'):
+                client = pa_transport.get_client(PA_HOST, PA_USER, PA_PASSWORD)
+            sync_state = self._load_sync_state()
+
+            # Un canal SFTP par fichier distant, téléchargés en parallèle sur le même transport
+            with stage('fetch_logs.transfer') as record:
+                synced = pa_transport.map_sftp(
+                    lambda sftp, remote: self._sync_one(client, sftp, remote, sync_state),
+                    REMOTE_LOGS, client=client
+                )
+                record['bytes'] = self.transfer_stats['wire_bytes']
+            for files in synced:
+                local_files.extend(files)
+
+            raw, wire = self.transfer_stats['raw_bytes'], self.transfer_stats['wire_bytes']
+            if wire:
+                print(f"📦 Transfert: {raw / 1024 / 1024:.2f} MB utiles pour {wire / 1024 / 1024:.2f} MB sur le réseau")
         except Exception as e:
             print(f"⚠️ Mode Offline activé (Erreur SSH): {e}")
-            # Utiliser les fichiers existants
+            # Utiliser les fichiers existants, tronqués au dernier checkpoint valide
+            sync_state = self._load_sync_state()
             for remote in REMOTE_LOGS:
                 local_name = os.path.join(LOCAL_LOG_DIR, os.path.basename(remote))
+                if FETCH_ROTATED_ARCHIVES:
+                    local_files.extend(self._local_archives(remote))
                 if os.path.exists(local_name):
+                    self._restore_checkpoint(local_name, sync_state.get(remote))
                     local_files.append(local_name)
-        
+
         return local_files
 
+    def _sync_one(self, client, sftp, remote, sync_state):
+        """Synchronise un fichier distant (et ses archives) ; retourne les fichiers locaux à analyser."""
+        local_name = os.path.join(LOCAL_LOG_DIR, os.path.basename(remote))
+        files = []
+        if FETCH_ROTATED_ARCHIVES:
+            try:
+                files.extend(self._sync_archives(sftp, remote))
+            except Exception as e:
+                print(f"⚠️ Erreur Sync archives {remote}: {e}")
+                files.extend(self._local_archives(remote))
+        try:
+            mode, fetched, wire = self._sync_remote_file(client, sftp, remote, local_name, sync_state)
+            with self._sync_lock:
+                self._save_sync_state(sync_state)
+            files.append(local_name)
+            print(f"✅ Sync Réussie ({mode}, +{fetched / 1024:.1f} KB, {wire / 1024:.1f} KB transférés): {remote}")
+        except Exception as e:
+            print(f"⚠️ Erreur Sync {remote}: {e}")
+            # Le buffer local reste cohérent avec le checkpoint précédent
+            if os.path.exists(local_name):
+                self._restore_checkpoint(local_name, sync_state.get(remote))
+                files.append(local_name)
+        return files
+
+    # --- SYNC INCREMENTALE ---
+    def _load_sync_state(self):
+        """Charge le checkpoint de synchronisation (offset, taille, inode, mtime par fichier distant)."""
+        try:
+            with open(SYNC_STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_sync_state(self, sync_state):
+        # Écriture atomique : un crash ne laisse jamais un checkpoint à moitié écrit
+        tmp_name = SYNC_STATE_FILE + ".tmp"
+        with open(tmp_name, 'w', encoding='utf-8') as f:
+            json.dump(sync_state, f, indent=2)
+        os.replace(tmp_name, SYNC_STATE_FILE)
+
+    def _remote_inode(self, client, remote):
+        """SFTP n'expose pas l'inode : on le demande au shell distant (None si indisponible)."""
+        try:
+            _, stdout, _ = client.exec_command(f"stat -c %i '{remote}'", timeout=10)
+            out = stdout.read().decode().strip()
+            return int(out) if out.isdigit() else None
+        except Exception:
+            return None
+
+    def _restore_checkpoint(self, local_name, checkpoint):
+        """Ramène le buffer local à l'offset du checkpoint (octets d'un append interrompu)."""
+        if not checkpoint: return
+        if os.path.getsize(local_name) > checkpoint['offset']:
+            with open(local_name, 'r+b') as f:
+                f.truncate(checkpoint['offset'])
+
+    def _sync_remote_file(self, client, sftp, remote, local_name, sync_state):
+        """
+        Synchronise un fichier distant vers le buffer local.
+        Ne télécharge que les octets ajoutés depuis le dernier checkpoint ;
+        bascule en téléchargement complet si rotation ou troncature détectée.
+        Retourne (mode, octets transférés).
+        """
+        attrs = sftp.stat(remote)
+        remote_size, remote_mtime = attrs.st_size, int(attrs.st_mtime)
+        inode = self._remote_inode(client, remote)
+        with sftp.open(remote, 'rb') as rf:
+            head = rf.read(SYNC_HEAD_BYTES).hex()
+        checkpoint = sync_state.get(remote)
+
+        incremental = (
+            checkpoint is not None
+            and os.path.exists(local_name)
+            and os.path.getsize(local_name) >= checkpoint['offset']
+            and remote_size >= checkpoint['offset']
+            and (inode is None or checkpoint.get('inode') is None or inode == checkpoint['inode'])
+            and head.startswith(checkpoint.get('head', ''))
+        )
+
+        if incremental:
+            self._restore_checkpoint(local_name, checkpoint)
+            offset = checkpoint['offset']
+            if remote_size == offset:
+                mode, fetched, wire = "inchangé", 0, 0
+            else:
+                with open(local_name, 'ab') as lf:
+                    fetched, wire = self._fetch_range(client, sftp, remote, offset, remote_size - offset, lf)
+                mode = "delta"
+                remote_size = offset + fetched
+        else:
+            # Premier passage, rotation (inode différent) ou troncature (taille < offset)
+            if checkpoint is not None:
+                print(f"🔁 Rotation/troncature détectée, re-téléchargement complet: {remote}")
+            part_name = local_name + ".part"
+            with open(part_name, 'wb') as lf:
+                fetched, wire = self._fetch_range(client, sftp, remote, 0, remote_size, lf)
+            os.replace(part_name, local_name)
+            remote_size = fetched
+            mode = "complet"
+
+        with self._sync_lock:
+            sync_state[remote] = {
+                'offset': remote_size, 'size': remote_size,
+                'inode': inode, 'mtime': remote_mtime, 'head': head,
+            }
+        return mode, fetched, wire
+
+    def _fetch_range(self, client, sftp, remote, offset, length, lf):
+        """
+        Copie [offset, offset + length) du fichier distant à la fin de `lf`.
+        Compressé côté serveur si REMOTE_COMPRESSION, sinon (ou en cas d'échec) SFTP brut.
+        Retourne (octets écrits, octets passés sur le réseau).
+        """
+        base = lf.tell()
+        if REMOTE_COMPRESSION:
+            try:
+                written, wire = self._fetch_range_compressed(client, remote, offset, length, lf)
+                self._count_transfer(written, wire)
+                return written, wire
+            except Exception as e:
+                print(f"⚠️ Transfert compressé indisponible ({e}), repli SFTP brut")
+                lf.seek(base)
+                lf.truncate()
+
+        written = 0
+        with sftp.open(remote, 'rb') as rf:
+            rf.seek(offset)
+            rf.prefetch(offset + length)
+            while written < length:
+                chunk = rf.read(min(SYNC_CHUNK_SIZE, length - written))
+                if not chunk: break
+                lf.write(chunk)
+                written += len(chunk)
+        self._count_transfer(written, written)
+        return written, written
+
+    def _fetch_range_compressed(self, client, remote, offset, length, lf):
+        codec = REMOTE_COMPRESSION if (REMOTE_COMPRESSION != 'zstd' or zstandard) else 'gzip'
+        cmd = f"tail -c +{offset + 1} '{remote}' | head -c {length} | {REMOTE_COMPRESSORS[codec]}"
+        _, stdout, _ = client.exec_command(cmd)
+        decompressor = _decompressor(codec)
+        written = wire = 0
+        while True:
+            chunk = stdout.read(SYNC_CHUNK_SIZE)
+            if not chunk: break
+            wire += len(chunk)
+            data = decompressor.decompress(chunk)
+            lf.write(data)
+            written += len(data)
+        data = decompressor.flush()
+        lf.write(data)
+        written += len(data)
+        status = stdout.channel.recv_exit_status()
+        if status != 0 or written != length:
+            raise IOError(f"{codec} distant: statut {status}, {written}/{length} octets")
+        return written, wire
+
+    def _count_transfer(self, written, wire):
+        with self._sync_lock:
+            self.transfer_stats['raw_bytes'] += written
+            self.transfer_stats['wire_bytes'] += wire
+
+    # --- ARCHIVES ROTÉES ---
+    def _local_archives(self, remote):
+        """Archives déjà présentes dans logs_buffer pour ce log (plus anciennes d'abord)."""
+        prefix = os.path.basename(remote) + "."
+        names = [n for n in os.listdir(LOCAL_LOG_DIR) if n.startswith(prefix) and n.endswith(COMPRESSED_SUFFIXES)]
+        # Sans 'zstandard', une .zst n'est même pas lisible pour son empreinte : ignorée comme à la synchro
+        names = [n for n in names if zstandard is not None or not n.endswith('.zst')]
+        paths = [os.path.join(LOCAL_LOG_DIR, n) for n in names]
+        return sorted(paths, key=os.path.getmtime)
+
+    def _sync_archives(self, sftp, remote):
+        """
+        Récupère telles quelles (déjà compressées) les archives rotées du log distant.
+        Une archive est immuable : on ne la retélécharge que si sa taille a changé.
+        """
+        remote_dir, base = os.path.split(remote)
+        archives = [
+            a for a in sftp.listdir_attr(remote_dir)
+            if a.filename.startswith(base + ".") and a.filename.endswith(COMPRESSED_SUFFIXES)
+        ]
+        local_paths = []
+        for attrs in sorted(archives, key=lambda a: a.st_mtime):
+            if attrs.filename.endswith('.zst') and zstandard is None:
+                print(f"⚠️ Archive ignorée (module 'zstandard' absent): {attrs.filename}")
+                continue
+            local_name = os.path.join(LOCAL_LOG_DIR, attrs.filename)
+            if not os.path.exists(local_name) or os.path.getsize(local_name) != attrs.st_size:
+                sftp.get(f"{remote_dir}/{attrs.filename}", local_name + ".part")
+                os.replace(local_name + ".part", local_name)
+                # Garde l'ordre chronologique des archives pour le prochain mode offline
+                os.utime(local_name, (attrs.st_mtime, attrs.st_mtime))
+                self._count_transfer(attrs.st_size, attrs.st_size)
+                print(f"🗜️ Archive récupérée: {attrs.filename} ({attrs.st_size / 1024:.1f} KB)")
+            local_paths.append(local_name)
+        return local_paths
+
     def parse_logs(self, files):
         print("📊 Analyse télémétrique & Clustering IP...")
+        if not self._offsets_still_valid(files):
+            print("🔁 Buffer local réécrit depuis le dernier snapshot, ré-analyse complète.")
+            self.reset_stats()
+
+        # Empreinte des buffers vivants analysés dans ce passage : une archive rotée de la même lignée
+        # (sync du fichier vivant échouée après celle des archives) n'en reprend que la suite
+        live_heads = {
+            f: _file_head(f) for f in files if not f.endswith(COMPRESSED_SUFFIXES) and os.path.exists(f)
+        }
+
+        pool = None
+        try:
+            for file_path in files:
+                is_cmd_file = "cmd" in file_path.lower()
+                start = self.file_offsets.get(file_path, {}).get('offset', 0)
+                if not os.path.exists(file_path):
+                    print(f"❌ Erreur lecture fichier {file_path}: introuvable")
+                    continue
+                head = _file_head(file_path)
+                # Plancher de la lignée (empreinte) : une archive rotée reprend celui de son fichier vivant
+                rollup_from = self.rollups.floor(head) if self.rollups is not None else None
+                if file_path.endswith(COMPRESSED_SUFFIXES):
+                    # Archive immuable : analysée une seule fois, en flux, jamais découpée
+                    end = os.path.getsize(file_path)
+                    if start < end:
+                        covered = max((_last_line_end(f, 0) for f, h in live_heads.items() if h and head.startswith(h)),
+                                      default=0)
+                        lines_end = aggregate_range(self.stats, file_path, covered, end, is_cmd_file,
+                                                    rollup_from=rollup_from if rollup_from is not None else -1)
+                        # 'offset' en octets compressés (snapshot), 'lines_end' en octets décompressés (rollups)
+                        self.file_offsets[file_path] = {'offset': end, 'head': head, 'lines_end': lines_end}
+                    continue
+                end = _last_line_end(file_path, start)
+
+                if self.workers > 1 and end - start >= PARALLEL_MIN_BYTES:
+                    if pool is None:
+                        pool = ProcessPoolExecutor(max_workers=self.workers)
+                    ranges = _split_ranges(file_path, start, end, self.workers)
+                    tasks = [(file_path, a, b, is_cmd_file, self.io_backend, self.event_store, rollup_from) for a, b in ranges]
+                    pos = start
+                    # Fusion dans l'ordre des plages : même résultat que le parcours séquentiel
+                    for (a, b), (partial, reached) in zip(ranges, pool.map(_parse_range_worker, tasks)):
+                        merge_stats(self.stats, partial)
+                        pos = reached
+                        if reached < b: break
+                else:
+                    pos = aggregate_range(self.stats, file_path, start, end, is_cmd_file, self.io_backend,
+                                          rollup_from=rollup_from if rollup_from is not None else -1)
+
+                self.file_offsets[file_path] = {'offset': pos, 'head': head}
+                if pos > start:
+                    print(f"   ↳ {os.path.basename(file_path)}: +{(pos - start) / 1024:.1f} KB analysés")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if self.rollups is not None and self.stats['rollups']:
+            written = self.rollups.ingest(self.stats, self.file_offsets)
+            print(f"   🗄️ Rollups SQLite: {written:,} lignes minute/heure/jour mises à jour")
+        # Index du tableau et régressions recalculés à la prochaine lecture
+        self._endpoint_index = None
+        self._anomalies = None
+        overflow = self.stats['endpoints'].get(ROUTE_OVERFLOW)
+        print(f"   🧭 {len(self.stats['endpoints']):,} routes distinctes"
+              + (f" ({overflow.hits:,} requêtes au-delà du plafond)" if overflow else ""))
+
+    # --- AGRÉGATS PARTAGÉS (REDIS) ---
+    def ingest_shared(self, files):
+        """
+        Ingesteur : agrège les lignes au-delà des planchers Redis (pas ceux du snapshot local)
+        et pousse l'incrément en une transaction. Retourne le nombre de requêtes poussées.
+        """
+        partial = new_stats()
+        offsets = {}
         for file_path in files:
+            if not os.path.exists(file_path):
+                print(f"❌ Erreur lecture fichier {file_path}: introuvable")
+                continue
             is_cmd_file = "cmd" in file_path.lower()
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    for line in f:
-                        match = LOG_PATTERN.search(line)
-                        if not match: continue
-
-                        d = match.groupdict()
-                        queries = int(d['queries'])
-                        rows = int(d['rows'])
-                        size = float(d['size'])
-                        duration = float(d['duration']) if d['duration'] else 0.0
-                        mem = float(d['mem']) if d['mem'] else 0.0
-                        path = d['path'].strip()
-                        date = d['date']
-                        time_str = d['time']
-                        hour = time_str.split(':')[0] 
-                        ip = d['ip']
-                        
-                        row_type = 'CMD' if (is_cmd_file or 'CMD::' in path or duration > 0) else 'WEB'
-
-                        # Overview
-                        self.stats['overview']['total_reqs'] += 1
-                        self.stats['overview']['total_sql'] += queries
-                        self.stats['overview']['total_egress_kb'] += size
-                        self.stats['overview']['unique_ips'].add(ip)
-                        if mem > self.stats['overview']['max_ram']: self.stats['overview']['max_ram'] = mem
-
-                        # Daily
-                        day = self.stats['daily'][date]
-                        day['reqs'] += 1
-                        day['sql'] += queries
-                        day['egress_kb'] += size
-                        day['ips'].add(ip)
-                        if duration > 0: day['duration_sum'] += duration
-
-                        # Hourly Stats
-                        h_stats = self.stats['hourly'][date][hour]
-                        h_stats['reqs'] += 1
-                        h_stats['sql'] += queries
-                        h_stats['egress_kb'] += size
-
-                        # Hourly Events (Limited storage for GeoIP detail view)
-                        if len(self.stats['hourly_events'][date][hour]) < 2500:
-                             self.stats['hourly_events'][date][hour].append({
-                                 'time': time_str, 'ip': ip, 'path': path.replace('CMD::', ''),
-                                 'sql': queries, 'dur': duration, 'mem': mem, 'type': row_type
-                             })
-
-                        # Endpoints Aggregation
-                        ep = self.stats['endpoints'][path]
-                        ep['type'] = row_type
-                        ep['hits'] += 1
-                        ep['sql'].append(queries)
-                        ep['rows'].append(rows)
-                        ep['size_kb'].append(size)
-                        if duration > 0: ep['durations'].append(duration)
-                        if mem > 0: ep['mems'].append(mem)
-
-                        # Endpoint History
-                        hist = ep['history'][date]
-                        hist['hits'] += 1
-                        hist['sql_sum'] += queries
-                        hist['dur_sum'] += duration
-                        if mem > hist['mem_max']: hist['mem_max'] = mem
-            except Exception as e:
-                print(f"❌ Erreur lecture fichier {file_path}: {e}")
+            head = _file_head(file_path)
+            # Plancher de la lignée (empreinte) : une archive rotée reprend celui de son fichier vivant
+            checkpoint = self.shared.checkpoint(head)
+            start = checkpoint['offset'] if checkpoint is not None else 0
+            if file_path.endswith(COMPRESSED_SUFFIXES):
+                # Archive immuable déjà poussée par elle-même : inutile de la décompresser à nouveau
+                if checkpoint is None or checkpoint['file'] != file_path:
+                    pos = aggregate_range(partial, file_path, start, os.path.getsize(file_path), is_cmd_file)
+                    offsets[file_path] = (head, pos)
+                continue
+            end = _last_line_end(file_path, start)
+            pos = aggregate_range(partial, file_path, start, end, is_cmd_file, self.io_backend) if end > start else start
+            offsets[file_path] = (head, pos)
+            if pos > start:
+                print(f"   ↳ {os.path.basename(file_path)}: +{(pos - start) / 1024:.1f} KB poussés vers Redis")
+        self.shared.push(partial, offsets)
+        return partial['overview'].total_reqs
+
+    def load_shared(self):
+        """Remplace les agrégats par ceux de Redis (lecture seule pour les dashboards)."""
+        self.stats = self.shared.load_stats()
+        self._endpoint_index = None
+        self._anomalies = None
+
+    def sync_shared(self, files):
+        """Cycle partagé : pousse les nouvelles lignes de `files` (ingesteur), puis relit Redis."""
+        if files:
+            pushed = self.ingest_shared(files)
+            print(f"   🧮 Redis: +{pushed:,} requêtes agrégées")
+        self.load_shared()
 
     def calculate_percentile(self, data, percentile=95):
+        if isinstance(data, QuantileSketch): return data.quantile(percentile / 100.0)
+        if data is None: return 0
         if not data: return 0
         data.sort()
         k = (len(data) - 1) * (percentile / 100.0)
@@ -204,89 +858,223 @@ class EnterpriseMonitor:
         if not report: report.append({ "level": "SUCCESS", "title": "Endpoint Sain", "desc": "R.A.S.", "action": "Monitoring continu." })
         return report
 
-    def get_peak_hours(self):
+    def detect_anomalies(self):
+        """
+        Régressions SQL / durée / mémoire de chaque endpoint face à son propre historique :
+        journalier (ROLLUP_VIEW_DAYS derniers jours) et horaire si les rollups sont actifs.
+        {route: [anomalies]} calculé une fois par parsing ; vide sans NumPy.
+        """
+        if self._anomalies is not None:
+            return self._anomalies
+        found = []
+        if anomaly is not None:
+            dates = sorted(self.stats['daily'])[-ROLLUP_VIEW_DAYS:]
+            matrix = anomaly.HistoryMatrix.from_endpoints(self.stats['endpoints'], dates)
+            for a in anomaly.find_anomalies(matrix, window=anomaly.ANOMALY_WINDOW['day']):
+                a['tier'] = 'day'
+                found.append(a)
+            start = self.rollups.window_start(anomaly.ANOMALY_HOURLY_DAYS) if self.rollups is not None else None
+            if start is not None:
+                matrix = anomaly.HistoryMatrix.from_rollups(self.rollups.db, 'hour', start, 3600)
+                for a in anomaly.find_anomalies(matrix, window=anomaly.ANOMALY_WINDOW['hour']):
+                    a['tier'] = 'hour'
+                    a['period'] = time.strftime('%Y-%m-%d %H:00', time.gmtime(a['period']))
+                    found.append(a)
+        self._anomalies = {}
+        for a in sorted(found, key=lambda a: -a['z']):
+            self._anomalies.setdefault(a['path'], []).append(a)
+        return self._anomalies
+
+    def anomaly_recommendations(self, found):
+        """Recommandations (format generate_recommendations) des régressions d'un endpoint."""
+        report = []
+        for a in found:
+            level = "CRITICAL" if a['z'] >= 2 * anomaly.ANOMALY_Z else "WARNING"
+            when = f"{'le' if a['tier'] == 'day' else 'à'} {a['period']} (z={a['z']})"
+            if a['metric'] == 'sql':
+                report.append({ "level": level, "title": "Régression SQL", "desc": f"{a['value']:.1f} requêtes/appel {when}, habituellement {a['baseline']:.1f}.", "action": "Comparez avec le dernier déploiement (N+1 introduit ?)." })
+            elif a['metric'] == 'dur':
+                report.append({ "level": level, "title": "Régression de latence", "desc": f"{a['value']:.2f}s/appel {when}, habituellement {a['baseline']:.2f}s.", "action": "Profilez la vue ; vérifiez index et verrous DB." })
+            else:
+                report.append({ "level": level, "title": "Pic mémoire anormal", "desc": f"{a['value']:.0f} MB {when}, habituellement {a['baseline']:.0f} MB.", "action": "Utilisez .iterator() ou paginez." })
+        return report
+
+    def get_peak_hours(self, hourly=None):
+        """Heures les plus chargées de `hourly` (séries affichées par le graphique, agrégats en mémoire par défaut)."""
         all_hours = []
-        for date, hours_data in self.stats['hourly'].items():
+        for date, hours_data in (self.stats['hourly'] if hourly is None else hourly).items():
             for hour, data in hours_data.items():
-                all_hours.append({ 'date': date, 'hour': hour, 'reqs': data['reqs'], 'sql': data['sql'] })
+                all_hours.append({ 'date': date, 'hour': hour, 'reqs': data.reqs, 'sql': data.sql })
         return sorted(all_hours, key=lambda x: x['reqs'], reverse=True)[:4]
 
-    def generate_html(self):
+    def header_totals(self):
+        """(requêtes, IPs uniques) de l'en-tête, sur la même source que les graphiques (fenêtre des rollups si actifs)."""
+        if self.rollups is not None:
+            reqs, ips = self.rollups.totals(ROLLUP_VIEW_DAYS)
+            return reqs, len(ips)
+        o = self.stats['overview']
+        return o.total_reqs, len(o.unique_ips)
+
+    # --- API JSON (chargée à la demande par le dashboard) ---
+    def endpoint_details(self, path, pack=None):
+        """
+        Détail d'un endpoint pour la modale (meta, recommandations, historique creux, cf. sparse_history) ;
+        None si inconnu. `pack='varint'` compacte les colonnes de l'historique.
+        """
+        data = self.stats['endpoints'].get(path)
+        if data is None or data.hits == 0: return None
+        avg_sql = data.avg_sql
+        p95_dur = self.calculate_percentile(data.dur_sketch, 95)
+        max_mem = data.mem_max
+        avg_rows = data.avg_rows
+
+        # History for Charts (rollups : même fenêtre que la vue globale, au-delà des logs bruts)
+        # Jours actifs seulement : le dashboard les replace sur son axe GLOBAL_DATA.labels
+        if self.rollups is not None:
+            history, hits_of = self.rollups.history(path, ROLLUP_VIEW_DAYS), lambda h: h.reqs
+        else:
+            history, hits_of = data.history, lambda h: h.hits
+        history_data = sparse_history.encode(history, hits_of, pack)
+
+        report = self.generate_recommendations(avg_sql, p95_dur, avg_rows, max_mem, data.hits)
+        regressions = self.detect_anomalies().get(path)
+        if regressions:
+            # Les régressions d'abord ; « Endpoint Sain » n'a plus lieu d'être
+            report = self.anomaly_recommendations(regressions) + [r for r in report if r['level'] != 'SUCCESS']
+
+        return {
+            'meta': {'hits': data.hits, 'avg_sql': round(avg_sql, 1), 'p95_dur': round(p95_dur, 2), 'max_mem': round(max_mem, 1), 'avg_rows': round(avg_rows, 0)},
+            'report': report,
+            'history': history_data
+        }
+
+    def endpoint_row(self, path, data):
+        """Ligne du tableau des endpoints (aussi poussée telle quelle par le flux --live)."""
+        avg_sql = data.avg_sql
+        p95_dur = self.calculate_percentile(data.dur_sketch, 95)
+        avg_rows = data.avg_rows
+        total_egress_mb = data.egress_kb / 1024
+        
+        # Risk Calculation
+        n1_class, n1_risk, risk_score = "text-slate-500", "LOW", 1
+        if avg_sql > 50: n1_class, n1_risk, risk_score = "text-red-500 font-bold", "CRITICAL", 3
+        elif avg_sql > 15: n1_class, n1_risk, risk_score = "text-orange-400 font-bold", "SUSPECT", 2
+        # Écart à son propre historique : signalé même sous les seuils fixes
+        if risk_score < 3 and path in self.detect_anomalies():
+            n1_class, n1_risk, risk_score = "text-fuchsia-400 font-bold", "RÉGRESSION", 3
+
+        # Data object for the frontend table
+        return {
+            'path': path, 
+            'clean_path': path.replace('CMD::', ''),
+            'risk_text': n1_risk,
+            'risk_score': risk_score,
+            'risk_class': n1_class,
+            'avg_sql': round(avg_sql, 1), 
+            'hits': data.hits,
+            'total_egress': round(total_egress_mb, 2),
+            'p95_dur': round(p95_dur, 2), 
+            'avg_rows': round(avg_rows, 0)
+        }
+
+    def endpoint_index(self):
+        """Index trié de toutes les lignes du tableau (construit à la demande après chaque parse_logs)."""
+        if self._endpoint_index is None:
+            rows = [self.endpoint_row(path, data) for path, data in self.stats['endpoints'].items() if data.hits]
+            self._endpoint_index = EndpointIndex(rows)
+        return self._endpoint_index
+
+    # --- MODE LIVE ---
+    def live_snapshot(self):
+        """Compteurs avant un cycle --live, pour n'envoyer ensuite que ce qui a bougé."""
+        s = self.stats
+        return {
+            'reqs': s['overview'].total_reqs,
+            'daily': {d: b.reqs for d, b in s['daily'].items()},
+            'hourly': {(d, h): b.reqs for d, hours in s['hourly'].items() for h, b in hours.items()},
+            'endpoints': {path: data.hits for path, data in s['endpoints'].items()},
+        }
+
+    def live_delta(self, before):
+        """
+        Delta SSE depuis `before` : compteurs globaux, jours/heures touchés et endpoints modifiés.
+        None si rien de nouveau ; {'reload': True} si les agrégats ont été reconstruits (rotation...).
+        """
+        s = self.stats
+        o = s['overview']
+        if o.total_reqs < before['reqs']: return {'reload': True}
+        if o.total_reqs == before['reqs']: return None
+
+        changed = [(path, data) for path, data in s['endpoints'].items() if data.hits != before['endpoints'].get(path)]
+        header_reqs, header_ips = self.header_totals()
+        rows = sorted((self.endpoint_row(path, data) for path, data in changed), key=lambda x: x['total_egress'], reverse=True)
+        return {
+            'new_reqs': o.total_reqs - before['reqs'],
+            'overview': {
+                'total_reqs': header_reqs, 'total_sql': o.total_sql,
+                'total_egress_mb': round(o.total_egress_kb / 1024, 2), 'max_ram': round(o.max_ram, 1),
+                'unique_ips': header_ips,
+            },
+            'daily': [
+                {'date': d, 'reqs': b.reqs, 'sql': b.sql, 'egress': round(b.egress_kb / 1024, 2), 'ips': len(b.ips)}
+                for d, b in sorted(s['daily'].items()) if b.reqs != before['daily'].get(d)
+            ],
+            'hours': [
+                {'date': d, 'hour': h, 'reqs': b.reqs, 'sql': b.sql, 'egress': round(b.egress_kb / 1024, 2), 'ips': len(b.ips)}
+                for d, hours in sorted(s['hourly'].items()) for h, b in sorted(hours.items())
+                if b.reqs != before['hourly'].get((d, h))
+            ],
+            'endpoints': rows[:LIVE_MAX_ENDPOINTS],
+        }
+
+    def hour_events(self, date, hour):
+        """Échantillon des événements d'une heure (vue GeoIP / clustering IP), trié par heure."""
+        reservoir = self.stats['hourly_events'].get(date, {}).get(hour)
+        if reservoir is None:
+            return {'events': [], 'seen': 0, 'sampled': False}
+        return {
+            'events': [dict(zip(EVENT_FIELDS, ev)) for ev in sorted(reservoir.events)],
+            'seen': reservoir.seen,
+            'sampled': reservoir.sampled,
+        }
+
+    def generate_html(self, live=False):
         s = self.stats
-        dates = sorted(s['daily'].keys())
+        # Séries jour / heure : rollups SQLite sur ROLLUP_VIEW_DAYS jours, sinon agrégats en mémoire
+        if self.rollups is not None:
+            daily, hourly = self.rollups.recent(ROLLUP_VIEW_DAYS)
+        else:
+            daily, hourly = s['daily'], s['hourly']
+        dates = sorted(daily.keys())
         global_labels = dates
         
         # Données Globales
-        global_egress = [round(s['daily'][d]['egress_kb'] / 1024, 2) for d in dates]
-        global_sql = [s['daily'][d]['sql'] for d in dates]
-        global_reqs = [s['daily'][d]['reqs'] for d in dates] # NOUVEAU INDICATEUR
-
-        # Hourly Data Construction
-        hourly_db = {}
-        hourly_events_db = {} 
-        for d in dates:
-            h_data = s['hourly'][d]
-            sorted_hours = sorted(h_data.keys())
-            hourly_db[d] = {
-                'labels': [f"{h}h" for h in sorted_hours],
-                'egress': [round(h_data[h]['egress_kb'] / 1024, 2) for h in sorted_hours],
-                'sql': [h_data[h]['sql'] for h in sorted_hours],
-                'reqs': [h_data[h]['reqs'] for h in sorted_hours], # NOUVEAU INDICATEUR
-                'raw_hours': sorted_hours
-            }
-            hourly_events_db[d] = {}
-            for h in sorted_hours:
-                hourly_events_db[d][h] = s['hourly_events'][d][h]
+        global_egress = [round(daily[d].egress_kb / 1024, 2) for d in dates]
+        global_sql = [daily[d].sql for d in dates]
+        global_reqs = [daily[d].reqs for d in dates] # NOUVEAU INDICATEUR
+        global_ips = [len(daily[d].ips) for d in dates]
 
-        # Endpoint Processing for Table & JS Database
-        endpoints_table_data = [] # List for the table (lighter)
-        endpoint_details_map = {} # Map for modals (heavier)
-
-        for path, data in s['endpoints'].items():
-            if data['hits'] == 0: continue
-            
-            avg_sql = statistics.mean(data['sql'])
-            p95_dur = self.calculate_percentile(data['durations'], 95) if data['durations'] else 0
-            max_mem = max(data['mems']) if data['mems'] else 0
-            avg_rows = statistics.mean(data['rows']) if data['rows'] else 0
-            total_egress_mb = sum(data['size_kb']) / 1024
-            
-            # Risk Calculation
-            n1_class, n1_risk, risk_score = "text-slate-500", "LOW", 1
-            if avg_sql > 50: n1_class, n1_risk, risk_score = "text-red-500 font-bold", "CRITICAL", 3
-            elif avg_sql > 15: n1_class, n1_risk, risk_score = "text-orange-400 font-bold", "SUSPECT", 2
-
-            # Data object for the frontend table
-            endpoints_table_data.append({
-                'path': path, 
-                'clean_path': path.replace('CMD::', ''),
-                'risk_text': n1_risk,
-                'risk_score': risk_score,
-                'risk_class': n1_class,
-                'avg_sql': round(avg_sql, 1), 
-                'hits': data['hits'],
-                'total_egress': round(total_egress_mb, 2),
-                'p95_dur': round(p95_dur, 2), 
-                'avg_rows': round(avg_rows, 0)
-            })
-
-            # History for Charts
-            history_data = []
+        # Hourly Data Construction (les événements détaillés sont servis par /api/hour)
+        # Générée jour par jour pendant l'écriture : jamais tout HOURLY_DB en mémoire
+        def hourly_db():
             for d in dates:
-                h = data['history'].get(d, {'hits': 0, 'sql_sum': 0})
-                history_data.append({ 'date': d, 'hits': h['hits'], 'avg_sql': round(h['sql_sum'] / h['hits'], 1) if h['hits'] else 0 })
+                h_data = hourly.get(d, {})
+                sorted_hours = sorted(h_data.keys())
+                yield d, {
+                    'labels': [f"{h}h" for h in sorted_hours],
+                    'egress': [round(h_data[h].egress_kb / 1024, 2) for h in sorted_hours],
+                    'sql': [h_data[h].sql for h in sorted_hours],
+                    'reqs': [h_data[h].reqs for h in sorted_hours], # NOUVEAU INDICATEUR
+                    'ips': [len(h_data[h].ips) for h in sorted_hours],
+                    'raw_hours': sorted_hours
+                }
 
-            endpoint_details_map[path] = {
-                'meta': {'hits': data['hits'], 'avg_sql': round(avg_sql, 1), 'p95_dur': round(p95_dur, 2), 'max_mem': round(max_mem, 1), 'avg_rows': round(avg_rows, 0)},
-                'report': self.generate_recommendations(avg_sql, p95_dur, avg_rows, max_mem, data['hits']),
-                'history': history_data
-            }
+        # Endpoint Table : première page embarquée, tri / filtre / pagination servis par /api/endpoints
+        first_page = self.endpoint_index().query(size=PAGE_SIZE)
+        peak_hours = self.get_peak_hours(hourly)
+        total_reqs, unique_ips = self.header_totals()
 
-        # Keep Top 500 significant endpoints to avoid browser lag, but sort logic is client-side
-        endpoints_table_data = sorted(endpoints_table_data, key=lambda x: x['total_egress'], reverse=True)[:500]
-        peak_hours = self.get_peak_hours()
-
-        html_content = f"""
+        html_head = f"""
         <!DOCTYPE html>
         <html lang="fr" class="dark">
         <head>
@@ -356,9 +1144,15 @@ class EnterpriseMonitor:
                     <h1 class="text-4xl font-black text-white mb-1">Cicaw<span class="text-blue-500">OmniView</span> <span class="text-sm bg-purple-900 text-purple-300 px-2 rounded">PRO v9.0</span></h1>
                     <p class="text-sm text-slate-500">Server Performance & Traffic Analytics</p>
                 </div>
-                <div class="text-right">
-                    <div class="text-3xl font-bold text-white">{s['overview']['total_reqs']:,}</div>
-                    <div class="text-xs text-slate-500 uppercase">Total Requests</div>
+                <div class="flex gap-8">
+                    <div class="text-right">
+                        <div id="uniqueIps" class="text-3xl font-bold text-amber-400">{unique_ips:,}</div>
+                        <div class="text-xs text-slate-500 uppercase">Unique IPs (≈)</div>
+                    </div>
+                    <div class="text-right">
+                        <div id="totalReqs" class="text-3xl font-bold text-white">{total_reqs:,}</div>
+                        <div class="text-xs text-slate-500 uppercase">Total Requests <span id="liveBadge" class="{'' if live else 'hidden '}text-green-400 font-bold">● LIVE</span></div>
+                    </div>
                 </div>
             </header>
 
@@ -391,7 +1185,16 @@ class EnterpriseMonitor:
                 <div class="glass-panel rounded-xl overflow-hidden border border-slate-700/50">
                     <div class="p-4 bg-slate-800/80 flex justify-between items-center">
                         <h3 class="font-bold text-white">Top Endpoints Performance</h3>
-                        <span class="text-xs text-slate-500">Click headers to sort</span>
+                        <div class="flex items-center gap-3 text-xs">
+                            <select id="tableMode" onchange="filterTable()" class="bg-slate-900 border border-slate-700 text-slate-300 rounded-lg p-1.5">
+                                <option value="substring">Contient</option>
+                                <option value="prefix">Commence par</option>
+                            </select>
+                            <input id="tableSearch" oninput="filterTable()" type="search" placeholder="Filtrer les chemins..." class="bg-slate-900 border border-slate-700 text-slate-300 rounded-lg p-1.5 w-56 font-mono">
+                            <button id="pagePrev" onclick="changePage(-1)" class="px-2 py-1 rounded bg-slate-700 hover:bg-slate-600 disabled:opacity-30">◀</button>
+                            <span id="tablePager" class="text-slate-500 font-mono"></span>
+                            <button id="pageNext" onclick="changePage(1)" class="px-2 py-1 rounded bg-slate-700 hover:bg-slate-600 disabled:opacity-30">▶</button>
+                        </div>
                     </div>
                     <table class="w-full text-left text-xs">
                         <thead class="bg-slate-800/50 text-slate-400 uppercase font-semibold">
@@ -412,20 +1215,17 @@ class EnterpriseMonitor:
             </main>
 
             <script>
-                // DATA INJECTION
-                const ENDPOINT_DETAILS = {json.dumps(endpoint_details_map)};
-                const GLOBAL_DATA = {{ 
-                    labels: {json.dumps(global_labels)}, 
-                    egress: {json.dumps(global_egress)}, 
-                    sql: {json.dumps(global_sql)},
-                    reqs: {json.dumps(global_reqs)}
-                }};
-                const HOURLY_DB = {json.dumps(hourly_db)};
-                const HOURLY_EVENTS = {json.dumps(hourly_events_db)};
-                let TABLE_DATA = {json.dumps(endpoints_table_data)}; // Raw data for sorting
+                // DATA INJECTION (détails endpoints & événements horaires : chargés via /api à l'ouverture des modales)
+                const GLOBAL_DATA = """
+        html_tail = f"""
+                let TABLE_TOTAL = {first_page['total']};
+                const PAGE_SIZE = {PAGE_SIZE};
+                const LIVE_MODE = {json.dumps(live)};
 
                 // STATE
                 let sortState = {{ key: 'total_egress', dir: 'desc' }};
+                let tableQuery = {{ q: '', mode: 'substring', page: 0 }};
+                let tableRequest = 0; let filterTimer = null;
                 
                 // --- TABLE LOGIC ---
                 function renderTable() {{
@@ -451,6 +1251,50 @@ class EnterpriseMonitor:
                         tbody.appendChild(tr);
                     }});
                     updateSortIcons();
+                    updatePager();
+                }}
+
+                async function loadTable() {{
+                    // Tri, filtre et pagination côté serveur ; seule la dernière requête est affichée
+                    const request = ++tableRequest;
+                    const params = new URLSearchParams({{ sort: sortState.key, dir: sortState.dir, q: tableQuery.q, mode: tableQuery.mode, page: tableQuery.page, size: PAGE_SIZE }});
+                    try {{
+                        const response = await fetch('/api/endpoints?' + params);
+                        if (!response.ok) throw new Error('HTTP ' + response.status);
+                        const data = await response.json();
+                        if (request !== tableRequest) return;
+                        TABLE_DATA = data.rows; TABLE_TOTAL = data.total;
+                    }} catch (e) {{
+                        console.error('Tableau indisponible', e);
+                        return;
+                    }}
+                    renderTable();
+                }}
+
+                function filterTable() {{
+                    clearTimeout(filterTimer);
+                    filterTimer = setTimeout(() => {{
+                        tableQuery.q = document.getElementById('tableSearch').value;
+                        tableQuery.mode = document.getElementById('tableMode').value;
+                        tableQuery.page = 0;
+                        loadTable();
+                    }}, 200);
+                }}
+
+                function changePage(step) {{
+                    const last = Math.max(0, Math.ceil(TABLE_TOTAL / PAGE_SIZE) - 1);
+                    const page = Math.min(last, Math.max(0, tableQuery.page + step));
+                    if (page === tableQuery.page) return;
+                    tableQuery.page = page;
+                    loadTable();
+                }}
+
+                function updatePager() {{
+                    const first = TABLE_TOTAL ? tableQuery.page * PAGE_SIZE + 1 : 0;
+                    const last = Math.min(TABLE_TOTAL, (tableQuery.page + 1) * PAGE_SIZE);
+                    document.getElementById('tablePager').innerText = `${{first.toLocaleString('en-US')}}–${{last.toLocaleString('en-US')}} / ${{TABLE_TOTAL.toLocaleString('en-US')}}`;
+                    document.getElementById('pagePrev').disabled = tableQuery.page === 0;
+                    document.getElementById('pageNext').disabled = last >= TABLE_TOTAL;
                 }}
 
                 function sortTable(key) {{
@@ -461,22 +1305,8 @@ class EnterpriseMonitor:
                         sortState.key = key;
                         sortState.dir = 'desc'; // Default new sorts to descending (usually more useful)
                     }}
-
-                    TABLE_DATA.sort((a, b) => {{
-                        let valA = a[key];
-                        let valB = b[key];
-                        
-                        // String comparison for paths
-                        if (typeof valA === 'string') {{
-                            valA = valA.toLowerCase(); valB = valB.toLowerCase();
-                        }}
-
-                        if (valA < valB) return sortState.dir === 'asc' ? -1 : 1;
-                        if (valA > valB) return sortState.dir === 'asc' ? 1 : -1;
-                        return 0;
-                    }});
-
-                    renderTable();
+                    tableQuery.page = 0;
+                    loadTable();
                 }}
 
                 function updateSortIcons() {{
@@ -498,7 +1328,7 @@ class EnterpriseMonitor:
                 Chart.defaults.color = '#64748b'; Chart.defaults.font.family = 'Inter';
                 let mainChartInstance = null; let modalChartInstance = null; let currentViewMode = 'ALL'; 
 
-                function initMainChart(labels, egressData, sqlData, reqsData, isHourly) {{
+                function initMainChart(labels, egressData, sqlData, reqsData, ipsData, isHourly) {{
                     const ctx = document.getElementById('mainChart').getContext('2d');
                     if (mainChartInstance) mainChartInstance.destroy();
                     mainChartInstance = new Chart(ctx, {{
@@ -525,6 +1355,16 @@ class EnterpriseMonitor:
                                     pointRadius: isHourly ? 3 : 1, 
                                     yAxisID: 'y1' 
                                 }},
+                                {{ 
+                                    label: 'Unique IPs (≈)', 
+                                    data: ipsData, 
+                                    type: 'line', 
+                                    borderColor: '#f59e0b', // Ambre
+                                    borderWidth: 2, 
+                                    tension: 0.4, 
+                                    pointRadius: isHourly ? 3 : 1, 
+                                    yAxisID: 'y1' 
+                                }},
                                 {{ 
                                     label: 'SQL Queries', 
                                     data: sqlData, 
@@ -568,52 +1408,59 @@ class EnterpriseMonitor:
                     const titleEl = document.getElementById('chartTitle'); currentViewMode = val;
                     if (val === 'ALL') {{ 
                         titleEl.innerText = "Global Load Overview (Daily)"; 
-                        initMainChart(GLOBAL_DATA.labels, GLOBAL_DATA.egress, GLOBAL_DATA.sql, GLOBAL_DATA.reqs, false); 
+                        initMainChart(GLOBAL_DATA.labels, GLOBAL_DATA.egress, GLOBAL_DATA.sql, GLOBAL_DATA.reqs, GLOBAL_DATA.ips, false); 
                     }} 
                     else if (HOURLY_DB[val]) {{ 
                         titleEl.innerHTML = `Hourly Analysis for <span class="text-blue-400">${{val}}</span>`; 
                         const hData = HOURLY_DB[val]; 
-                        initMainChart(hData.labels, hData.egress, hData.sql, hData.reqs, true); 
+                        initMainChart(hData.labels, hData.egress, hData.sql, hData.reqs, hData.ips, true); 
                     }}
                 }}
                 document.getElementById('dateFilter').addEventListener('change', (e) => applyFilter(e.target.value));
                 // Init with Global Data
-                initMainChart(GLOBAL_DATA.labels, GLOBAL_DATA.egress, GLOBAL_DATA.sql, GLOBAL_DATA.reqs, false);
+                initMainChart(GLOBAL_DATA.labels, GLOBAL_DATA.egress, GLOBAL_DATA.sql, GLOBAL_DATA.reqs, GLOBAL_DATA.ips, false);
 
                 // --- MODALS & UTILS ---
-                const FLAG_CACHE = {{}};
-                async function resolveFlag(ip, elementId) {{
-                    if(FLAG_CACHE[ip]) {{ document.getElementById(elementId).innerText = FLAG_CACHE[ip]; return; }}
-                    if(ip.startsWith('57.141.') || ip.startsWith('157.240.') || ip.startsWith('66.220.')) {{ updateFlag(ip, elementId, '🇺🇸'); return; }}
-                    if(ip.startsWith('66.249.') || ip.startsWith('64.233.')) {{ updateFlag(ip, elementId, '🇺🇸'); return; }}
-                    try {{
-                        const response = await fetch(`http://ip-api.com/json/${{ip}}?fields=countryCode`);
-                        if(response.ok) {{ const data = await response.json(); updateFlag(ip, elementId, getFlagEmoji(data.countryCode)); }} else {{ updateFlag(ip, elementId, '🌐'); }}
-                    }} catch(e) {{ updateFlag(ip, elementId, '🌐'); }}
+                const API_CACHE = {{}};
+                async function fetchApi(url) {{
+                    if (!API_CACHE[url]) {{
+                        const response = await fetch(url);
+                        if (!response.ok) throw new Error(response.status);
+                        API_CACHE[url] = await response.json();
+                    }}
+                    return API_CACHE[url];
                 }}
-                function updateFlag(ip, elementId, flag) {{ FLAG_CACHE[ip] = flag; const el = document.getElementById(elementId); if(el) el.innerText = flag; }}
+                // URLs construites en un seul endroit : même clé d'API_CACHE à la lecture et à l'invalidation (applyLiveDelta)
+                function endpointUrl(path) {{ return '/api/endpoint?pack=varint&path=' + encodeURIComponent(path); }}
+                function hourUrl(date, hour) {{ return `/api/hour/${{encodeURIComponent(date)}}/${{encodeURIComponent(hour)}}`; }}
+
+                // Pays résolu côté Python (base GeoIP locale), aucun appel réseau
                 function getFlagEmoji(countryCode) {{ if(!countryCode) return '🌐'; const codePoints = countryCode.toUpperCase().split('').map(char =>  127397 + char.charCodeAt()); return String.fromCodePoint(...codePoints); }}
 
-                function openSessionModal(date, hour) {{
+                async function openSessionModal(date, hour) {{
                     const container = document.getElementById('sessionContent');
                     const title = document.getElementById('sessionTitle');
                     container.innerHTML = '';
                     title.innerHTML = `Analyses IP du <span class="text-blue-400">${{date}}</span> à <span class="text-blue-400">${{hour}}h</span>`;
-                    const events = (HOURLY_EVENTS[date] && HOURLY_EVENTS[date][hour]) ? HOURLY_EVENTS[date][hour] : [];
+                    let sample = {{ events: [], seen: 0, sampled: false }};
+                    try {{ sample = await fetchApi(hourUrl(date, hour)); }} catch(e) {{}}
+                    const events = sample.events;
+                    // Échantillon uniforme : les hits par IP sont ceux de l'échantillon, extrapolés au total de l'heure
+                    const scale = sample.sampled ? sample.seen / events.length : 1;
+                    if (sample.sampled) title.innerHTML += ` <span class="text-xs text-yellow-400">échantillon de ${{events.length}} sur ${{sample.seen.toLocaleString('en-US')}} requêtes</span>`;
                     if (events.length === 0) {{ container.innerHTML = '<div class="p-6 text-center text-slate-500">Aucune donnée.</div>'; document.getElementById('sessionModal').classList.add('show'); return; }}
                     
                     const ipClusters = {{}};
                     events.forEach(ev => {{
-                        if(!ipClusters[ev.ip]) ipClusters[ev.ip] = {{ count: 0, sql_sum: 0, type: ev.type, paths: new Set(), events: [] }};
+                        if(!ipClusters[ev.ip]) ipClusters[ev.ip] = {{ count: 0, sql_sum: 0, type: ev.type, cc: ev.cc, paths: new Set(), events: [] }};
                         const c = ipClusters[ev.ip]; c.count++; c.sql_sum += ev.sql; c.paths.add(ev.path); c.events.push(ev);
                     }});
                     const sortedIps = Object.keys(ipClusters).sort((a,b) => ipClusters[b].count - ipClusters[a].count);
 
-                    sortedIps.forEach((ip, index) => {{
+                    sortedIps.forEach(ip => {{
                         const data = ipClusters[ip];
                         const avgSql = (data.sql_sum / data.count).toFixed(1);
                         const cardId = 'ip-' + ip.replace(/[\.:]/g, '-');
-                        const flagId = 'flag-' + ip.replace(/[\.:]/g, '-');
                         let badgeColor = 'bg-slate-700 text-slate-300';
                         if(ip.startsWith('57.141.') || ip.startsWith('66.220.')) badgeColor = 'bg-blue-600 text-white'; 
                         
@@ -621,9 +1468,9 @@ class EnterpriseMonitor:
                         <div class="glass-panel rounded-lg border border-slate-700 overflow-hidden mb-2">
                             <div onclick="toggleIp('${{cardId}}')" class="p-3 bg-slate-800/80 flex justify-between items-center cursor-pointer hover:bg-slate-800 transition">
                                 <div class="flex items-center gap-3">
-                                    <span id="${{flagId}}" class="flag-icon" title="Resolving...">⏳</span>
+                                    <span class="flag-icon" title="${{data.cc || '?'}}">${{getFlagEmoji(data.cc)}}</span>
                                     <span class="font-mono font-bold text-lg text-white">${{ip}}</span>
-                                    <span class="text-xs px-2 py-0.5 rounded ${{badgeColor}}">Hits: ${{data.count}}</span>
+                                    <span class="text-xs px-2 py-0.5 rounded ${{badgeColor}}">Hits: ${{data.count}}${{sample.sampled ? ` (éch.) ≈ ${{Math.round(data.count * scale)}}` : ''}}</span>
                                     <span class="text-xs text-slate-500">${{data.type}}</span>
                                 </div>
                                 <div class="flex gap-4 text-sm text-slate-400">
@@ -642,7 +1489,6 @@ class EnterpriseMonitor:
                             </div>
                         </div>`;
                         container.innerHTML += html;
-                        setTimeout(() => resolveFlag(ip, flagId), index * 50);
                     }});
                     document.getElementById('sessionModal').classList.add('show');
                 }}
@@ -653,8 +1499,29 @@ class EnterpriseMonitor:
                     else {{ el.classList.add('open'); el.style.maxHeight = el.scrollHeight + "px"; }}
                 }}
                 
-                function openEndpointModal(path) {{
-                    const data = ENDPOINT_DETAILS[path]; if (!data) return;
+                // Historique creux (jours actifs, écarts en jours, colonnes varint/base64) réétalé sur l'axe des dates
+                function dayNumber(label) {{ const p = label.split('-'); return Date.UTC(+p[0], p[1] - 1, +p[2]) / 86400000; }}
+                function unpackVarints(text) {{
+                    const bytes = atob(text); const out = []; let value = 0, shift = 0;
+                    for (let i = 0; i < bytes.length; i++) {{
+                        const b = bytes.charCodeAt(i); value += (b & 0x7f) * 2 ** shift;
+                        if (b & 0x80) shift += 7; else {{ out.push(value); value = 0; shift = 0; }}
+                    }}
+                    return out;
+                }}
+                function expandHistory(h, labels) {{
+                    let days = h.days, hits = h.hits, sql = h.avg_sql;
+                    if (h.encoding === 'varint') {{ days = unpackVarints(days); hits = unpackVarints(hits); sql = unpackVarints(sql).map(v => v / h.scale); }}
+                    const position = new Map(); let day = h.start ? dayNumber(h.start) : 0;
+                    days.forEach((delta, i) => {{ day += delta; position.set(day, i); }});
+                    const at = labels.map(l => position.get(dayNumber(l)));
+                    return {{ hits: at.map(i => i === undefined ? 0 : hits[i]), avg_sql: at.map(i => i === undefined ? 0 : sql[i]) }};
+                }}
+
+
+                async function openEndpointModal(path) {{
+                    let data;
+                    try {{ data = await fetchApi(endpointUrl(path)); }} catch(e) {{ return; }}
                     document.getElementById('modalTitle').innerText = path;
                     document.getElementById('m_hits').innerText = data.meta.hits;
                     document.getElementById('m_sql').innerText = data.meta.avg_sql;
@@ -662,35 +1529,384 @@ class EnterpriseMonitor:
                     document.getElementById('m_rows').innerText = data.meta.avg_rows;
                     const ctx = document.getElementById('modalChart').getContext('2d');
                     if (modalChartInstance) modalChartInstance.destroy();
-                    modalChartInstance = new Chart(ctx, {{ type: 'line', data: {{ labels: data.history.map(x => x.date), datasets: [ {{ label: 'Avg SQL', data: data.history.map(x => x.avg_sql), borderColor: '#f59e0b', backgroundColor: 'rgba(245, 158, 11, 0.1)', fill: true }} ] }}, options: {{ responsive: true, maintainAspectRatio: false }} }});
+                    const history = expandHistory(data.history, GLOBAL_DATA.labels);
+                    modalChartInstance = new Chart(ctx, {{ type: 'line', data: {{ labels: GLOBAL_DATA.labels, datasets: [ {{ label: 'Avg SQL', data: history.avg_sql, borderColor: '#f59e0b', backgroundColor: 'rgba(245, 158, 11, 0.1)', fill: true }} ] }}, options: {{ responsive: true, maintainAspectRatio: false }} }});
                     const reportContainer = document.getElementById('reportContainer'); reportContainer.innerHTML = '';
                     data.report.forEach(item => {{ let color = item.level === 'CRITICAL' ? 'border-red-500 bg-red-500/10' : 'border-green-500 bg-green-500/10'; reportContainer.innerHTML += `<div class="p-3 rounded border-l-4 ${{color}} text-sm mb-2"><div class="font-bold text-white">${{item.title}}</div></div>`; }});
                     document.getElementById('detailModal').classList.add('show');
                 }}
                 function closeModal(id) {{ document.getElementById(id).classList.remove('show'); }}
+
+                // --- LIVE (SSE) ---
+                function upsertPoint(db, index, label, values) {{
+                    // Mise à jour en place : Chart.js garde une référence sur ces tableaux
+                    if (index < 0) {{
+                        index = db.labels.length;
+                        db.labels.push(label); db.egress.push(0); db.sql.push(0); db.reqs.push(0); db.ips.push(0);
+                    }}
+                    db.egress[index] = values.egress; db.sql[index] = values.sql; db.reqs[index] = values.reqs; db.ips[index] = values.ips;
+                    return index;
+                }}
+
+                function applyLiveDelta(delta) {{
+                    if (delta.reload) {{ location.reload(); return; }}
+                    document.getElementById('totalReqs').innerText = delta.overview.total_reqs.toLocaleString('en-US');
+                    document.getElementById('uniqueIps').innerText = delta.overview.unique_ips.toLocaleString('en-US');
+                    delta.daily.forEach(d => {{
+                        if (GLOBAL_DATA.labels.indexOf(d.date) < 0) {{
+                            const opt = document.createElement('option'); opt.value = d.date; opt.innerText = d.date;
+                            document.getElementById('dateFilter').appendChild(opt);
+                        }}
+                        upsertPoint(GLOBAL_DATA, GLOBAL_DATA.labels.indexOf(d.date), d.date, d);
+                    }});
+                    delta.hours.forEach(h => {{
+                        const db = HOURLY_DB[h.date] || (HOURLY_DB[h.date] = {{ labels: [], egress: [], sql: [], reqs: [], ips: [], raw_hours: [] }});
+                        let index = db.raw_hours.indexOf(h.hour);
+                        if (index < 0) db.raw_hours.push(h.hour);
+                        upsertPoint(db, index, h.hour + 'h', h);
+                        delete API_CACHE[hourUrl(h.date, h.hour)];
+                    }});
+                    delta.endpoints.forEach(row => {{
+                        delete API_CACHE[endpointUrl(row.path)];
+                    }});
+                    // L'index serveur a été reconstruit : recharger la page courante
+                    loadTable();
+                    if (mainChartInstance) mainChartInstance.update('none');
+                }}
+
+                if (LIVE_MODE && window.EventSource) {{
+                    const source = new EventSource('/api/live');
+                    source.addEventListener('delta', (e) => applyLiveDelta(JSON.parse(e.data)));
+                    source.onerror = () => document.getElementById('liveBadge').classList.add('text-slate-500');
+                    source.onopen = () => document.getElementById('liveBadge').classList.remove('text-slate-500');
+                }}
                 window.onclick = function(event) {{ if (event.target.classList.contains('modal-backdrop')) {{ event.target.classList.remove('show'); }} }}
             </script>
         </body>
         </html>
         """
         
-        with open(OUTPUT_FILENAME, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        print(f"\n🚀 Fichier généré : {os.path.abspath(OUTPUT_FILENAME)}")
+        with stage('generate_html.write') as record:
+            # Variantes pré-compressées écrites à côté du HTML (gzip_static / brotli_static côté reverse proxy)
+            with HtmlStream(OUTPUT_FILENAME) as out:
+                out.write(html_head)
+                out.write_object([('labels', global_labels), ('egress', global_egress), ('sql', global_sql),
+                                  ('reqs', global_reqs), ('ips', global_ips)])
+                out.write(";\n                const HOURLY_DB = ")
+                out.write_object(hourly_db())
+                out.write(";\n                let TABLE_DATA = ")
+                out.write_array(first_page['rows'])
+                out.write("; // Page courante (triée côté serveur)")
+                out.write(html_tail)
+            # Servi depuis la mémoire : une seule copie, à la taille finale
+            with open(OUTPUT_FILENAME, 'rb') as f:
+                body = f.read()
+            self.dashboard_artifacts = build_dashboard_artifacts(body, out.variants(), out.digest.hexdigest())
+            record['bytes'] = out.size
+        gz_kb = len(self.dashboard_artifacts['gzip']) / 1024
+        print(f"\n🚀 Fichier généré : {os.path.abspath(OUTPUT_FILENAME)} ({len(body) / 1024:.0f} KB, {gz_kb:.0f} KB gzip)")
 
 # --- SERVER UTILS ---
+def build_dashboard_artifacts(body, variants=None, digest=None):
+    """
+    HTML généré + variantes compressées et validateurs HTTP, calculés une fois par génération
+    (`variants` / `digest` : déjà produits par l'écriture en flux).
+    """
+    mtime = int(time.time())
+    if variants is None:
+        variants = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(body)
+    artifacts = {
+        'identity': body,
+        'etag': f'W/"{(digest or hashlib.sha1(body).hexdigest())[:20]}"',
+        'mtime': mtime,
+        'last_modified': formatdate(mtime, usegmt=True),
+    }
+    artifacts.update(variants)
+    return artifacts
+
+def _accepted_encodings(header):
+    encodings = set()
+    for token in (header or '').split(','):
+        name, _, params = token.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'): continue
+        if name: encodings.add(name.lower())
+    return encodings
+
 class CustomHandler(SimpleHTTPRequestHandler):
+    # EnterpriseMonitor dont les agrégats alimentent les routes /api
+    monitor = None
+    # LiveFeed du mode --live (route SSE /api/live)
+    live_feed = None
+    # Au-delà, les réponses JSON sont compressées si le client accepte gzip
+    JSON_GZIP_MIN_BYTES = 1024
+    # Octets de corps envoyés par les réponses servies depuis la mémoire (étape serve de --profile)
+    bytes_sent = 0
+    _sent_lock = Lock()
+
+    @classmethod
+    def count_sent(cls, n):
+        with cls._sent_lock:
+            cls.bytes_sent += n
+
+    # Seules routes servies : le dashboard et /api/* ; le reste du répertoire courant
+    # (.env, logs_buffer/, monitor_state.pkl, rollups.sqlite...) n'est jamais exposé
+    DASHBOARD_ROUTES = ('/', '/' + OUTPUT_FILENAME)
+
     def do_GET(self):
-        # Servir le dashboard à la racine
-        if self.path == '/':
-            self.path = OUTPUT_FILENAME
-        return super().do_GET()
+        route = urlsplit(self.path).path
+        if route in self.DASHBOARD_ROUTES:
+            # Depuis la mémoire si déjà généré, sinon le fichier HTML sur disque
+            if self.artifacts() is not None:
+                return self.send_dashboard()
+            self.path = '/' + OUTPUT_FILENAME
+            return super().do_GET()
+        if route.startswith('/api/'):
+            return self.handle_api()
+        self.send_error(404, "Not Found")
+
+    def do_HEAD(self):
+        route = urlsplit(self.path).path
+        if route in self.DASHBOARD_ROUTES:
+            if self.artifacts() is not None:
+                return self.send_dashboard(head_only=True)
+            self.path = '/' + OUTPUT_FILENAME
+            return super().do_HEAD()
+        self.send_error(404, "Not Found")
+
+    def artifacts(self):
+        return self.monitor.dashboard_artifacts if self.monitor is not None else None
+
+    def is_not_modified(self, artifacts):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(',')]
+            return '*' in tags or artifacts['etag'] in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= artifacts['mtime']
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def send_dashboard(self, head_only=False):
+        artifacts = self.artifacts()
+        if self.is_not_modified(artifacts):
+            self.send_response(304)
+            self.send_header('ETag', artifacts['etag'])
+            self.send_header('Last-Modified', artifacts['last_modified'])
+            self.end_headers()
+            return
+
+        accepted = _accepted_encodings(self.headers.get('Accept-Encoding'))
+        encoding = next((e for e in ('br', 'gzip') if e in accepted and e in artifacts), 'identity')
+        body = artifacts[encoding]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', artifacts['etag'])
+        self.send_header('Last-Modified', artifacts['last_modified'])
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+            self.count_sent(len(body))
+
+    def handle_api(self):
+        url = urlsplit(self.path)
+        parts = [unquote(p) for p in url.path.split('/') if p]
+        if self.monitor is None:
+            return self.send_json({'error': 'aucune donnée chargée'}, 503)
+
+        if parts == ['api', 'live'] and self.live_feed is not None:
+            return self.stream_live()
+        if parts == ['api', 'endpoint']:
+            params = parse_qs(url.query)
+            path = params.get('path', [''])[0]
+            try:
+                with self.monitor.stats_lock:
+                    details = self.monitor.endpoint_details(path, params.get('pack', [None])[0])
+            except ValueError as e:
+                return self.send_json({'error': str(e)}, 400)
+            if details is None:
+                return self.send_json({'error': f'endpoint inconnu: {path}'}, 404)
+            return self.send_json(details)
+        if parts == ['api', 'endpoints']:
+            return self.handle_endpoints(parse_qs(url.query))
+        if parts == ['api', 'query']:
+            return self.handle_query(parse_qs(url.query))
+        if parts == ['api', 'rollups']:
+            return self.handle_rollups(parse_qs(url.query))
+        if parts == ['api', 'anomalies']:
+            with self.monitor.stats_lock:
+                found = [a for regressions in self.monitor.detect_anomalies().values() for a in regressions]
+            return self.send_json({'anomalies': sorted(found, key=lambda a: -a['z'])})
+        if len(parts) == 4 and parts[:2] == ['api', 'hour']:
+            with self.monitor.stats_lock:
+                events = self.monitor.hour_events(parts[2], parts[3])
+            return self.send_json(events)
+        return self.send_json({'error': 'route inconnue'}, 404)
+
+    def handle_endpoints(self, params):
+        """/api/endpoints?sort=total_egress&dir=desc&q=/api/&mode=prefix|substring&page=0&size=100"""
+        arg = lambda name, default=None: params.get(name, [default])[0]
+        try:
+            with self.monitor.stats_lock:
+                page = self.monitor.endpoint_index().query(
+                    arg('sort', 'total_egress'), arg('dir', 'desc'), arg('q', ''),
+                    arg('mode', 'substring'), arg('page', 0), arg('size', PAGE_SIZE))
+            return self.send_json(page)
+        except ValueError as e:
+            return self.send_json({'error': str(e)}, 400)
+
+    def handle_query(self, params):
+        """/api/query?by=ip|path|day|hour&sort=reqs&limit=50&start=2026-01-01&end=2026-01-02 10:00"""
+        store = self.monitor.stats['events']
+        if store is None:
+            return self.send_json({'error': 'event store désactivé (EVENT_STORE=1)'}, 404)
+        arg = lambda name, default=None: params.get(name, [default])[0]
+        try:
+            start, end = parse_time(arg('start')), parse_time(arg('end'))
+            with self.monitor.stats_lock:
+                t0 = time.perf_counter()
+                rows = store.top(arg('by', 'path'), arg('sort', 'reqs'), int(arg('limit', 50)), start, end)
+                overview = store.overview(start, end)
+            return self.send_json({'overview': overview, 'rows': rows, 'ms': round((time.perf_counter() - t0) * 1000, 1)})
+        except ValueError as e:
+            return self.send_json({'error': str(e)}, 400)
+
+    def handle_rollups(self, params):
+        """/api/rollups?tier=minute|hour|day&endpoint=/product/{id}/&start=2026-01-01&end=2026-01-02 10:00"""
+        rollups = self.monitor.rollups
+        if rollups is None:
+            return self.send_json({'error': 'rollups désactivés (ROLLUPS=1)'}, 404)
+        arg = lambda name, default=None: params.get(name, [default])[0]
+        try:
+            with self.monitor.stats_lock:
+                series = rollups.series(arg('tier', 'hour'), arg('endpoint', ''), to_epoch(arg('start')), to_epoch(arg('end')))
+            return self.send_json([
+                {'bucket': bucket, 'reqs': b.reqs, 'sql': b.sql, 'rows': b.rows, 'egress_mb': round(b.egress_kb / 1024, 2),
+                 'avg_dur': round(b.dur_sum / b.reqs, 3) if b.reqs else 0, 'dur_max': round(b.dur_max, 3), 'mem_max': round(b.mem_max, 1)}
+                for bucket, b in series
+            ])
+        except ValueError as e:
+            return self.send_json({'error': str(e)}, 400)
+
+    def stream_live(self):
+        """Flux SSE : un événement `delta` par cycle --live, commentaire de heartbeat sinon."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')
+        self.end_headers()
+        subscription = self.live_feed.subscribe()
+        try:
+            self.wfile.write(b"retry: 5000\n\n")
+            self.wfile.flush()
+            while True:
+                try:
+                    event, data = subscription.get(timeout=LIVE_HEARTBEAT)
+                    message = f"event: {event}\ndata: {data}\n\n"
+                except queue.Empty:
+                    message = ": ping\n\n"
+                self.wfile.write(message.encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.live_feed.unsubscribe(subscription)
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        compressed = len(body) >= self.JSON_GZIP_MIN_BYTES and 'gzip' in _accepted_encodings(self.headers.get('Accept-Encoding'))
+        if compressed:
+            body = gzip.compress(body, compresslevel=6)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        self.wfile.write(body)
+        self.count_sent(len(body))
 
     def log_message(self, format, *args):
         # Silence logs
         pass
 
-def start_server_and_open():
+class LiveFeed:
+    """Diffuse les deltas du mode --live à chaque client SSE connecté (une file par client)."""
+
+    def __init__(self, backlog=100):
+        self.backlog = backlog
+        self.subscribers = []
+        self.lock = Lock()
+
+    def subscribe(self):
+        subscription = queue.Queue(maxsize=self.backlog)
+        with self.lock:
+            self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+
+    def publish(self, event, payload):
+        data = json.dumps(payload)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait((event, data))
+            except queue.Full:
+                pass  # Client trop lent : il rattrapera via un rechargement
+
+def live_loop(monitor, feed, interval=LIVE_INTERVAL):
+    """
+    Thread du mode --live : toutes les `interval` secondes, tail des logs distants
+    (sync incrémentale), parsing des seules nouvelles lignes puis publication du delta.
+    """
+    while True:
+        time.sleep(interval)
+        try:
+            # Agrégats Redis : un dashboard lecteur ne télécharge rien, il relit le store partagé
+            files = monitor.fetch_logs() if monitor.shared is None or monitor.ingest else []
+            with monitor.stats_lock:
+                before = monitor.live_snapshot()
+                if monitor.shared is None:
+                    monitor.parse_logs(files)
+                else:
+                    monitor.sync_shared(files)
+                delta = monitor.live_delta(before)
+                if delta is None: continue
+                if monitor.shared is None:
+                    monitor.save_state()
+                # Un rechargement complet de la page repart des agrégats à jour
+                monitor.generate_html(live=True)
+            feed.publish('delta', delta)
+            if not delta.get('reload'):
+                print(f"📡 Live: +{delta['new_reqs']} requêtes, {len(delta['endpoints'])} endpoints mis à jour")
+        except Exception as e:
+            print(f"⚠️ Erreur cycle live: {e}")
+
+def serve_forever(host, port):
+    # Un thread (daemon) par requête : un client lent ne bloque plus les autres
+    with ThreadingHTTPServer((host, port), CustomHandler) as httpd:
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Serveur arrêté.")
+
+def start_server_and_open(monitor=None):
+    CustomHandler.monitor = monitor
     port = 8000
     while True:
         try:
@@ -713,20 +1929,78 @@ def start_server_and_open():
         except: pass
     
     Thread(target=open_browser).start()
+    serve_forever("", port)
 
-    with TCPServer(("", port), CustomHandler) as httpd:
-        try:
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\n🛑 Serveur arrêté.")
+def start_production_server(monitor, host=SERVE_HOST, port=SERVE_PORT):
+    """Mode partagé (--serve) : port fixe, pas de navigateur, dashboard servi depuis la mémoire."""
+    CustomHandler.monitor = monitor
+    print(f"\n🌐 SERVEUR DE PRODUCTION ACTIF sur {host or '*'}:{port} (threads, gzip{'/br' if brotli else ''}, ETag)")
+    print(f"   (CTRL+C pour arrêter)")
+    serve_forever(host, port)
 
 if __name__ == "__main__":
-    monitor = EnterpriseMonitor()
-    files = monitor.fetch_logs()
-    
-    if files:
-        monitor.parse_logs(files)
-        monitor.generate_html()
-        start_server_and_open()
+    # --profile : temps / CPU / octets / mémoire par étape ; --cprofile : dump pstats en plus (PROFILE_DUMP)
+    profiler = None
+    if "--profile" in sys.argv or "--cprofile" in sys.argv:
+        profiler = profiling.enable(profiling.PROFILE_DUMP if "--cprofile" in sys.argv else None)
+    if EVENT_STORE and parse_time is None:
+        print("⚠️ EVENT_STORE=1 ignoré : NumPy n'est pas installé")
+    shared = AggregateStore(connect(REDIS_URL)) if REDIS_URL else None
+    # En mode Redis, les rollups SQLite locaux ne seraient alimentés que par l'ingesteur : désactivés
+    monitor = EnterpriseMonitor(state_file=STATE_FILE, workers=PARSE_WORKERS, io_backend=PARSE_IO_BACKEND,
+                                event_store=EVENT_STORE and parse_time is not None,
+                                rollup_db=ROLLUP_DB if ROLLUPS and shared is None else None,
+                                shared=shared, ingest=REDIS_INGEST)
+    geo = get_database()
+    print(f"🌍 GeoIP local: {len(geo):,} plages" + ("" if geo.loaded else f" ({GEOIP_DB} absent, plages intégrées seulement)"))
+    if shared is not None:
+        print(f"🧮 Agrégats Redis partagés ({'ingesteur' if monitor.ingest else 'lecture seule'}, préfixe {shared.prefix})")
+    files = []
+    if shared is None or monitor.ingest:
+        with stage('fetch_logs') as record:
+            files = monitor.fetch_logs()
+            record['bytes'] = monitor.transfer_stats['wire_bytes']
+
+    if shared is not None:
+        with stage('sync_shared'):
+            monitor.sync_shared(files)
+        has_data = monitor.stats['overview'].total_reqs > 0
+    else:
+        # Sans logs bruts ce passage, l'historique des rollups SQLite suffit à rendre le dashboard
+        has_data = bool(files) or (monitor.rollups is not None and monitor.rollups.window_start() is not None)
+        if files:
+            with stage('load_state'):
+                monitor.load_state()
+            with stage('parse_logs') as record:
+                before = sum(o['offset'] for o in monitor.file_offsets.values())
+                monitor.parse_logs(files)
+                record['bytes'] = sum(o['offset'] for o in monitor.file_offsets.values()) - before
+            with stage('save_state'):
+                monitor.save_state()
+
+    if has_data:
+        live = "--live" in sys.argv
+        with stage('generate_html') as record:
+            monitor.generate_html(live=live)
+            record['bytes'] = len(monitor.dashboard_artifacts['identity'])
+        if profiler is not None:
+            if profiler.cprofile is not None:
+                profiler.cprofile.disable()
+            profiler.summary()
+            profiler.write()
+        if live:
+            CustomHandler.live_feed = LiveFeed()
+            Thread(target=live_loop, args=(monitor, CustomHandler.live_feed), daemon=True).start()
+            print(f"📡 Mode live : synchronisation toutes les {LIVE_INTERVAL}s")
+        with stage('serve') as record:
+            if "--serve" in sys.argv:
+                start_production_server(monitor)
+            else:
+                start_server_and_open(monitor)
+            record['bytes'] = CustomHandler.bytes_sent
+        if profiler is not None:
+            # Rapport complété par l'étape serve après CTRL+C
+            profiler.summary()
+            profiler.write()
     else:
         print("❌ Aucune donnée de logs disponible. Vérifiez vos chemins ou la connexion SSH.")
\ No newline at end of file
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rollups temporels persistés dans SQLite (minute, heure, jour ; par endpoint et global).
+Le parsing accumule des agrégats par (endpoint, minute) ; ingest() les fusionne dans
+les trois niveaux par upsert, puis applique la rétention : chaque niveau fin est purgé
+au-delà de sa fenêtre, les niveaux grossiers gardant l'historique sous-échantillonné.
+Un offset par lignée de fichier source (« plancher », repérée par l'empreinte des
+premiers octets et non par le chemin) rend l'ingestion idempotente : une ré-analyse
+complète (rotation, snapshot d'une autre version) ne compte rien deux fois, y compris
+les lignes d'une archive rotée (x.log.1.gz) déjà ingérées quand elle s'appelait x.log.
+"""
+
+import calendar
+import os
+import pickle
+import sqlite3
+import time
+
+from sketches import UniqueCounter
+
+TIERS = {'minute': 60, 'hour': 3600, 'day': 86400}
+GLOBAL = ''  # Endpoint des rollups globaux (tous endpoints confondus)
+# Jours conservés par niveau, ex. "minute:2,hour:35,day:730"
+ROLLUP_RETENTION = {
+    tier: int(days) for tier, days in
+    (item.split(':') for item in os.getenv("ROLLUP_RETENTION", "minute:2,hour:35,day:730").split(','))
+}
+# Fenêtre (jours) des vues globales du dashboard
+ROLLUP_VIEW_DAYS = int(os.getenv("ROLLUP_VIEW_DAYS", "90"))
+
+# Compteurs d'un agrégat minute du buffer : reqs, sql, rows, egress_kb, dur_sum, dur_max, mem_max
+METRICS = ('reqs', 'sql', 'rows', 'egress_kb', 'dur_sum', 'dur_max', 'mem_max')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    tier TEXT NOT NULL, endpoint TEXT NOT NULL, bucket INTEGER NOT NULL,
+    reqs INTEGER NOT NULL, sql INTEGER NOT NULL, rows INTEGER NOT NULL, egress_kb REAL NOT NULL,
+    dur_sum REAL NOT NULL, dur_max REAL NOT NULL, mem_max REAL NOT NULL,
+    PRIMARY KEY (tier, endpoint, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS uniques (
+    tier TEXT NOT NULL, bucket INTEGER NOT NULL, counter BLOB NOT NULL,
+    PRIMARY KEY (tier, bucket)
+) WITHOUT ROWID;
+-- Planchers par empreinte (hex des premiers octets, décompressés pour une archive) ;
+-- `file` : dernier fichier ayant fait avancer la lignée
+CREATE TABLE IF NOT EXISTS ingested (
+    head TEXT PRIMARY KEY, file TEXT NOT NULL, offset INTEGER NOT NULL
+);
+"""
+
+UPSERT_FLOOR = """
+INSERT INTO ingested VALUES (?, ?, ?)
+ON CONFLICT (head) DO UPDATE SET file = excluded.file, offset = max(offset, excluded.offset)
+"""
+
+UPSERT = """
+INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (tier, endpoint, bucket) DO UPDATE SET
+    reqs = reqs + excluded.reqs, sql = sql + excluded.sql, rows = rows + excluded.rows,
+    egress_kb = egress_kb + excluded.egress_kb, dur_sum = dur_sum + excluded.dur_sum,
+    dur_max = max(dur_max, excluded.dur_max), mem_max = max(mem_max, excluded.mem_max)
+"""
+
+
+def to_epoch(value):
+    """'YYYY-MM-DD' ou 'YYYY-MM-DD HH:MM' -> timestamp epoch ; None si vide."""
+    if not value: return None
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return calendar.timegm(time.strptime(value.strip(), fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"Date invalide: {value}")
+
+
+def _fold(rows, key, acc):
+    """rows[key] += acc (sommes, puis max de durée et de mémoire)."""
+    current = rows.get(key)
+    if current is None:
+        rows[key] = list(acc)
+        return
+    current[0] += acc[0]
+    current[1] += acc[1]
+    current[2] += acc[2]
+    current[3] += acc[3]
+    current[4] += acc[4]
+    if acc[5] > current[5]: current[5] = acc[5]
+    if acc[6] > current[6]: current[6] = acc[6]
+
+
+def merge_buffer(into, other, key_of=None):
+    """Fusionne un buffer minute partiel ; key_of(route) retraduit la route (plafond des templates)."""
+    for (route, date, minute), acc in other.items():
+        _fold(into, (key_of(route) if key_of else route, date, minute), acc)
+
+
+class RollupBucket:
+    """Ligne de rollup lue depuis SQLite ; mêmes attributs que DailyBucket / HourlyBucket."""
+    __slots__ = METRICS + ('ips',)
+
+    def __init__(self, row, ips=None):
+        for name, value in zip(METRICS, row):
+            setattr(self, name, value)
+        self.ips = ips if ips is not None else UniqueCounter()
+
+    @property
+    def avg_sql(self):
+        return self.sql / self.reqs if self.reqs else 0.0
+
+
+class RollupStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Partagé entre le thread --live et les threads HTTP, sous EnterpriseMonitor.stats_lock
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._day_epoch = {}
+
+    def close(self):
+        self.db.close()
+
+    # --- ÉCRITURE ---
+    def floor(self, head):
+        """
+        Offset source déjà intégré aux rollups pour la lignée d'empreinte `head` (la plus longue
+        empreinte enregistrée qui en est un préfixe : un petit fichier a pu grossir depuis) ;
+        -1 si rien (fichier nouveau ou réécrit).
+        """
+        if not head: return -1
+        row = self.db.execute(
+            "SELECT offset FROM ingested WHERE head != '' AND substr(?, 1, length(head)) = head "
+            "ORDER BY length(head) DESC LIMIT 1", (head,)
+        ).fetchone()
+        return -1 if row is None else row[0]
+
+    def _epoch(self, date, minute):
+        midnight = self._day_epoch.get(date)
+        if midnight is None:
+            midnight = self._day_epoch[date] = calendar.timegm(time.strptime(date, '%Y-%m-%d'))
+        return midnight + int(minute[:2]) * 3600 + int(minute[3:5]) * 60
+
+    def _tier_rows(self, buffer):
+        """
+        Buffer minute -> {(tier, endpoint, bucket): compteurs}, par endpoint et global.
+        Chaque niveau est replié depuis le précédent (minute -> heure -> jour), pas depuis le buffer.
+        """
+        rows = {}
+        finer = {}
+        for (route, date, minute), acc in buffer.items():
+            finer[(route, self._epoch(date, minute))] = acc
+        for tier, size in TIERS.items():
+            coarser = {}
+            for (route, bucket), acc in finer.items():
+                if tier != 'minute':
+                    bucket -= bucket % size
+                _fold(coarser, (route, bucket), acc)
+            for (route, bucket), acc in coarser.items():
+                rows[(tier, route, bucket)] = acc
+                _fold(rows, (tier, GLOBAL, bucket), acc)
+            finer = coarser
+        return rows
+
+    def _merge_uniques(self, tier, bucket, counter):
+        row = self.db.execute("SELECT counter FROM uniques WHERE tier = ? AND bucket = ?", (tier, bucket)).fetchone()
+        if row is not None:
+            stored = pickle.loads(row[0])
+            # Union idempotente : ré-ingérer les mêmes IPs ne change rien
+            stored.merge(counter)
+            counter = stored
+        self.db.execute("INSERT OR REPLACE INTO uniques VALUES (?, ?, ?)",
+                        (tier, bucket, pickle.dumps(counter, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def ingest(self, stats, file_offsets):
+        """
+        Verse le buffer minute de `stats['rollups']` (vidé ensuite) dans SQLite, avec les IPs uniques
+        des heures / jours touchés et les planchers des fichiers analysés, en une transaction.
+        Retourne le nombre de lignes de rollup écrites.
+        """
+        buffer = stats['rollups']
+        rows = self._tier_rows(buffer)
+        touched = {(date, minute[:2]) for _, date, minute in buffer}
+        with self.db:
+            self.db.executemany(UPSERT, [(tier, endpoint, bucket, *acc) for (tier, endpoint, bucket), acc in rows.items()])
+            for date, hour in touched:
+                bucket = self._epoch(date, hour + ':00')
+                self._merge_uniques('hour', bucket, stats['hourly'][date][hour].ips)
+            for date in {date for date, _ in touched}:
+                self._merge_uniques('day', self._epoch(date, '00:00'), stats['daily'][date].ips)
+            # Archive : 'lines_end' (octets décompressés), comparable aux offsets du fichier vivant d'origine
+            self.db.executemany(UPSERT_FLOOR, [
+                (checkpoint['head'], path, checkpoint.get('lines_end', checkpoint['offset']))
+                for path, checkpoint in file_offsets.items() if checkpoint['head']
+            ])
+            self.apply_retention()
+        buffer.clear()
+        return len(rows)
+
+    def apply_retention(self):
+        """Purge chaque niveau au-delà de ROLLUP_RETENTION (relatif au rollup le plus récent, pas à l'horloge)."""
+        newest = self.db.execute("SELECT max(bucket) FROM rollups WHERE tier = 'day' AND endpoint = ?", (GLOBAL,)).fetchone()[0]
+        if newest is None: return
+        for tier, days in ROLLUP_RETENTION.items():
+            limit = newest + 86400 - days * 86400
+            self.db.execute("DELETE FROM rollups WHERE tier = ? AND bucket < ?", (tier, limit))
+            self.db.execute("DELETE FROM uniques WHERE tier = ? AND bucket < ?", (tier, limit))
+
+    # --- LECTURE ---
+    def series(self, tier, endpoint=GLOBAL, start=None, end=None):
+        """Lignes [(bucket, RollupBucket)] d'un endpoint sur [start, end) (timestamps epoch), triées."""
+        if tier not in TIERS:
+            raise ValueError(f"Niveau inconnu: {tier} (choix: {', '.join(TIERS)})")
+        rows = self.db.execute(
+            f"SELECT bucket, {', '.join(METRICS)} FROM rollups WHERE tier = ? AND endpoint = ? "
+            "AND bucket >= ? AND bucket < ? ORDER BY bucket",
+            (tier, endpoint, start if start is not None else -2 ** 62, end if end is not None else 2 ** 62)
+        )
+        return [(row[0], RollupBucket(row[1:])) for row in rows]
+
+    def _uniques(self, tier, start):
+        rows = self.db.execute("SELECT bucket, counter FROM uniques WHERE tier = ? AND bucket >= ?", (tier, start))
+        return {bucket: pickle.loads(blob) for bucket, blob in rows}
+
+    def window_start(self, days=ROLLUP_VIEW_DAYS):
+        """Début (epoch) des `days` derniers jours présents dans les rollups ; None si vide."""
+        newest = self.db.execute("SELECT max(bucket) FROM rollups WHERE tier = 'day' AND endpoint = ?", (GLOBAL,)).fetchone()[0]
+        return None if newest is None else newest - (days - 1) * 86400
+
+    def recent(self, days=ROLLUP_VIEW_DAYS):
+        """
+        Vues globales des `days` derniers jours : ({date: bucket}, {date: {heure: bucket}}),
+        au format de stats['daily'] / stats['hourly'] (heures absentes au-delà de leur rétention).
+        """
+        start = self.window_start(days)
+        if start is None: return {}, {}
+        day_ips, hour_ips = self._uniques('day', start), self._uniques('hour', start)
+        daily = {}
+        for bucket, b in self.series('day', GLOBAL, start):
+            b.ips = day_ips.get(bucket, b.ips)
+            daily[time.strftime('%Y-%m-%d', time.gmtime(bucket))] = b
+        hourly = {d: {} for d in daily}
+        for bucket, b in self.series('hour', GLOBAL, start):
+            b.ips = hour_ips.get(bucket, b.ips)
+            date, hour = time.strftime('%Y-%m-%d %H', time.gmtime(bucket)).split()
+            hourly.setdefault(date, {})[hour] = b
+        return daily, hourly
+
+    def totals(self, days=ROLLUP_VIEW_DAYS):
+        """(requêtes, UniqueCounter des IPs) cumulés sur la fenêtre de recent(), depuis le niveau jour."""
+        ips = UniqueCounter()
+        start = self.window_start(days)
+        if start is None: return 0, ips
+        reqs = sum(b.reqs for _, b in self.series('day', GLOBAL, start))
+        for counter in self._uniques('day', start).values():
+            ips.merge(counter)
+        return reqs, ips
+
+    def history(self, endpoint, days=ROLLUP_VIEW_DAYS):
+        """{date: bucket} journalier d'un endpoint sur la même fenêtre que recent()."""
+        start = self.window_start(days)
+        if start is None: return {}
+        return {time.strftime('%Y-%m-%d', time.gmtime(bucket)): b for bucket, b in self.series('day', endpoint, start)}
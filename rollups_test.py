@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests des rollups SQLite : les totaux des rollups doivent égaler ceux du parsing,
+y compris après une rotation (x.log -> x.log.1.gz) récupérée avec FETCH_ROTATED_ARCHIVES.
+Usage : python -m pytest -q rollups_test.py
+"""
+
+import gzip
+import os
+import tempfile
+
+from loggen import LogGenerator
+from remote_analyzer import EnterpriseMonitor
+
+
+def split_lines(files, fraction):
+    """Contenu de chaque fichier coupé en deux listes de lignes à `fraction`."""
+    parts = []
+    for f in files:
+        with open(f, 'rb') as fh:
+            lines = fh.readlines()
+        cut = int(len(lines) * fraction)
+        parts.append((lines[:cut], lines[cut:]))
+    return parts
+
+
+def rollup_total(store, tier):
+    return sum(b.reqs for _, b in store.series(tier))
+
+
+def test_incremental_parse_matches_rollups():
+    with tempfile.TemporaryDirectory() as directory:
+        files = LogGenerator(paths=200, ips=500, days=2, seed=11).write(directory, 8000)
+        parts = split_lines(files, 0.5)
+        for f, (head, _) in zip(files, parts):
+            with open(f, 'wb') as fh:
+                fh.writelines(head)
+        monitor = EnterpriseMonitor(rollup_db=os.path.join(directory, 'rollups.sqlite'))
+        monitor.parse_logs(files)
+        for f, (_, tail) in zip(files, parts):
+            with open(f, 'ab') as fh:
+                fh.writelines(tail)
+        monitor.parse_logs(files)
+        assert monitor.stats['overview'].total_reqs == 8000
+        assert rollup_total(monitor.rollups, 'day') == rollup_total(monitor.rollups, 'hour') == 8000
+
+
+def test_rotation_does_not_double_count():
+    with tempfile.TemporaryDirectory() as directory:
+        generated = LogGenerator(paths=300, ips=800, days=3, seed=7).write(os.path.join(directory, 'all'), 30000)
+        before, after = zip(*split_lines(generated, 2 / 3))
+        live = [os.path.join(directory, os.path.basename(f)) for f in generated]
+
+        # 20k lignes : une partie analysée, le reste écrit avant la rotation sans être vu
+        for f, lines in zip(live, before):
+            with open(f, 'wb') as fh:
+                fh.writelines(lines[:len(lines) // 2])
+        monitor = EnterpriseMonitor(rollup_db=os.path.join(directory, 'rollups.sqlite'))
+        monitor.parse_logs(live)
+        for f, lines in zip(live, before):
+            with open(f, 'ab') as fh:
+                fh.writelines(lines[len(lines) // 2:])
+
+        # Rotation : x.log -> x.log.1.gz, puis 10k nouvelles lignes dans un x.log neuf
+        archives = [f + '.1.gz' for f in live]
+        for f, archive, lines in zip(live, archives, after):
+            with open(f, 'rb') as src, gzip.open(archive, 'wb') as dst:
+                dst.write(src.read())
+            with open(f, 'wb') as fh:
+                fh.writelines(lines)
+        monitor.parse_logs(archives + live)
+
+        assert monitor.stats['overview'].total_reqs == 30000
+        assert rollup_total(monitor.rollups, 'day') == rollup_total(monitor.rollups, 'hour') == 30000
+        # Ré-analyse complète (snapshot perdu) : les planchers par empreinte tiennent toujours
+        again = EnterpriseMonitor(rollup_db=monitor.rollups.path)
+        again.parse_logs(archives + live)
+        assert rollup_total(again.rollups, 'day') == 30000
+
+
+
+def test_dashboard_view_from_rollups_only():
+    with tempfile.TemporaryDirectory() as directory:
+        files = LogGenerator(paths=100, ips=300, days=3, seed=5).write(directory, 6000)
+        path = os.path.join(directory, 'rollups.sqlite')
+        parsed = EnterpriseMonitor(rollup_db=path)
+        parsed.parse_logs(files)
+        # Passage sans logs bruts : en-tête, pics et graphiques viennent tous des rollups
+        reader = EnterpriseMonitor(rollup_db=path)
+        daily, hourly = reader.rollups.recent()
+        reqs, ips = reader.header_totals()
+        assert reqs == sum(b.reqs for b in daily.values()) == 6000
+        # Union des compteurs journaliers (HyperLogLog au-delà du seuil exact) : à ~1.6 % près
+        assert abs(ips - len(parsed.stats['overview'].unique_ips)) <= 0.05 * ips
+        peaks = reader.get_peak_hours(hourly)
+        assert [(p['date'], p['hour'], p['reqs']) for p in peaks] == \
+               [(p['date'], p['hour'], p['reqs']) for p in parsed.get_peak_hours()]
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Normalisation des chemins en templates de route avant agrégation :
+/product/123/ et /product/124/ deviennent /product/{id}/ (mêmes idées que
+clean_path_logic de monitor_v2, motifs précompilés + mémo LRU par chemin brut).
+Le nombre de templates distincts est plafonné : au-delà, tout tombe dans ROUTE_OVERFLOW.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+ROUTE_TEMPLATES = os.getenv("ROUTE_TEMPLATES", "1") == "1"
+ROUTE_TEMPLATES_MAX = int(os.getenv("ROUTE_TEMPLATES_MAX", "5000"))
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "131072"))
+ROUTE_OVERFLOW = "{autres routes}"
+
+# Appliquées dans l'ordre ; les lookaheads gèrent les segments consécutifs (/1/2/)
+ROUTE_RULES = [
+    (re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'), '{uuid}'),
+    (re.compile(r'/(?=[0-9]*[a-fA-F])[0-9a-fA-F]{16,}(?=/|$)'), '/{hash}'),
+    (re.compile(r'/\d+(?=/|$)'), '/{id}'),
+]
+
+
+@lru_cache(maxsize=ROUTE_CACHE_SIZE)
+def route_template(path):
+    """Template de route d'un chemin brut (les commandes CMD:: sont gardées telles quelles)."""
+    if not ROUTE_TEMPLATES or "CMD::" in path: return path
+    path = path.split('?', 1)[0]
+    for pattern, replacement in ROUTE_RULES:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+def endpoint_key(endpoints, route, limit=ROUTE_TEMPLATES_MAX):
+    """Clé d'agrégation : la route, ou ROUTE_OVERFLOW si le plafond `limit` est atteint (None = sans plafond)."""
+    if limit is None or route in endpoints or len(endpoints) < limit:
+        return route
+    return ROUTE_OVERFLOW
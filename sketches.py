@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Structures de résumé en streaming pour les agrégats de EnterpriseMonitor.
+Taille bornée et fusionnables (merge), pour que la mémoire reste plate
+quel que soit le volume de logs analysé.
+"""
+
+import math
+import struct
+from functools import lru_cache
+from hashlib import blake2b
+
+
+class QuantileSketch:
+    """
+    Sketch de quantiles type DDSketch : buckets logarithmiques à erreur relative bornée.
+    Une valeur v tombe dans le bucket ceil(log_gamma(v)) ; le quantile renvoyé
+    est à moins de `relative_accuracy` (en relatif) de la valeur exacte.
+    Au-delà de `max_buckets`, les buckets les plus bas sont fusionnés (seule la
+    précision des petits quantiles se dégrade, le p95/p99 reste exact à alpha près).
+    """
+    __slots__ = ('relative_accuracy', 'gamma', 'log_gamma', 'max_buckets', 'bins', 'zero_count', 'count', 'max')
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.max = 0
+
+    def add(self, value):
+        self.count += 1
+        if value > self.max: self.max = value
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        bins = self.bins
+        bins[key] = bins.get(key, 0) + 1
+        if len(bins) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        # Fusionne les deux plus petits buckets jusqu'à revenir sous la limite
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        for k in keys[:excess]:
+            self.bins[target] += self.bins.pop(k)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Impossible de fusionner des sketches de précisions différentes")
+        for k, c in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if other.max > self.max: self.max = other.max
+        if len(self.bins) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q):
+        """Quantile approché (q entre 0 et 1) ; 0 si le sketch est vide."""
+        if self.count == 0: return 0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank: return 0
+        # Le centre du bucket peut dépasser la vraie valeur max observée
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return min(2 * self.gamma ** key / (self.gamma + 1), self.max)
+        return self.max
+
+    def __len__(self):
+        return len(self.bins)
+
+
+@lru_cache(maxsize=65536)
+def hash64(value):
+    """Hash 64 bits stable d'un processus à l'autre (hash() est salé par processus)."""
+    return int.from_bytes(blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class UniqueCounter:
+    """
+    Cardinalité approchée (visiteurs uniques) : ensemble exact de hashs jusqu'à
+    `threshold`, puis HyperLogLog à 2**precision registres (erreur ~1.04/sqrt(m)).
+    Fusionnable : union exacte, ou max registre par registre.
+    """
+    __slots__ = ('precision', 'threshold', 'exact', 'registers')
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        # Au-delà, l'ensemble exact coûterait plus cher que les registres
+        self.threshold = (1 << precision) // 32
+        self.exact = set()
+        self.registers = None
+
+    def add_hash(self, h):
+        if self.exact is not None:
+            self.exact.add(h)
+            if len(self.exact) > self.threshold:
+                self._to_registers()
+            return
+        p = self.precision
+        index = h >> (64 - p)
+        rho = (64 - p) - (h & ((1 << (64 - p)) - 1)).bit_length() + 1
+        if rho > self.registers[index]:
+            self.registers[index] = rho
+
+    def add(self, value):
+        self.add_hash(hash64(value))
+
+    def _to_registers(self):
+        exact, self.exact = self.exact, None
+        self.registers = bytearray(1 << self.precision)
+        for h in exact:
+            self.add_hash(h)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Impossible de fusionner des compteurs de précisions différentes")
+        if other.exact is not None:
+            for h in other.exact:
+                self.add_hash(h)
+            return
+        if self.exact is not None:
+            self._to_registers()
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def to_bytes(self):
+        """Sérialisation compacte (store Redis) : b'E' + hashs 64 bits, ou b'R' + registres."""
+        if self.exact is not None:
+            return b'E' + bytes([self.precision]) + struct.pack(f'<{len(self.exact)}Q', *self.exact)
+        return b'R' + bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        counter = cls(precision=data[1])
+        body = data[2:]
+        if data[:1] == b'E':
+            counter.exact = set(struct.unpack(f'<{len(body) // 8}Q', body))
+        else:
+            counter.exact, counter.registers = None, bytearray(body)
+        return counter
+
+    def __len__(self):
+        if self.exact is not None:
+            return len(self.exact)
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Petites cardinalités : comptage linéaire, plus juste que l'estimateur brut
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Précision du QuantileSketch face aux percentiles exacts (EnterpriseMonitor.calculate_percentile)
+sur des distributions asymétriques : p50 / p95 / p99 à `relative_accuracy` près.
+Usage : python -m pytest -q sketches_test.py
+"""
+
+import random
+
+from remote_analyzer import EnterpriseMonitor
+from sketches import QuantileSketch
+
+PERCENTILES = (50, 95, 99)
+
+
+def exact_percentile(values, percentile):
+    return EnterpriseMonitor().calculate_percentile(list(values), percentile)
+
+
+def assert_accurate(sketch, values):
+    for percentile in PERCENTILES:
+        exact = exact_percentile(values, percentile)
+        approx = sketch.quantile(percentile / 100)
+        # Marge infime : calculate_percentile interpole entre deux rangs, le sketch en retient un
+        assert abs(approx - exact) <= sketch.relative_accuracy * exact + 1e-9, (percentile, approx, exact)
+
+
+def test_lognormal_durations():
+    rnd = random.Random(42)
+    values = [rnd.lognormvariate(-1, 1.5) for _ in range(100_000)]
+    sketch = QuantileSketch()
+    for v in values:
+        sketch.add(v)
+    assert_accurate(sketch, values)
+
+
+def test_heavy_tail_with_zeros():
+    # Durées absentes (0) + queue de Pareto : le cas des endpoints WEB
+    rnd = random.Random(7)
+    values = [0.0 if rnd.random() < 0.2 else rnd.paretovariate(1.2) * 0.05 for _ in range(50_000)]
+    sketch = QuantileSketch()
+    for v in values:
+        sketch.add(v)
+    assert_accurate(sketch, values)
+
+
+def test_merge_keeps_accuracy():
+    rnd = random.Random(3)
+    parts = [[rnd.expovariate(1 / scale) for _ in range(20_000)] for scale in (0.1, 2.0, 30.0)]
+    merged = QuantileSketch()
+    for part in parts:
+        sketch = QuantileSketch()
+        for v in part:
+            sketch.add(v)
+        merged.merge(sketch)
+    assert_accurate(merged, [v for part in parts for v in part])
+
+
+def test_quantile_never_exceeds_max():
+    sketch = QuantileSketch()
+    for v in (1.0, 1.0, 1.0, 3.7):
+        sketch.add(v)
+    assert sketch.quantile(0.99) <= 3.7
+    assert sketch.quantile(1.0) == 3.7
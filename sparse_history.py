@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Historique journalier d'un endpoint en colonnes creuses pour /api/endpoint : seuls les
+jours avec trafic sont transmis, repérés par leur écart en jours au précédent (delta).
+Le dashboard le réétale sur l'axe de dates qu'il possède déjà (GLOBAL_DATA.labels) ;
+coût en O(jours actifs) au lieu de O(jours de la fenêtre), côté serveur comme en octets.
+Option `varint` : colonnes entières en LEB128 puis base64.
+"""
+
+import base64
+from datetime import date
+from functools import lru_cache
+
+PACKINGS = (None, 'varint')
+# avg_sql arrondi au dixième, transmis en entier en mode varint
+AVG_SQL_SCALE = 10
+
+
+@lru_cache(maxsize=4096)
+def day_number(value):
+    """'YYYY-MM-DD' -> numéro de jour (ordinal)."""
+    return date.fromisoformat(value).toordinal()
+
+
+def encode_varints(values):
+    """Entiers positifs -> LEB128 (7 bits par octet, bit haut = suite) encodé en base64."""
+    out = bytearray()
+    for v in values:
+        while v >= 0x80:
+            out.append((v & 0x7F) | 0x80)
+            v >>= 7
+        out.append(v)
+    return base64.b64encode(bytes(out)).decode('ascii')
+
+
+def decode_varints(text):
+    values, current, shift = [], 0, 0
+    for byte in base64.b64decode(text):
+        current |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(current)
+            current, shift = 0, 0
+    return values
+
+
+def encode(history, hits_of, pack=None):
+    """
+    {date: bucket} -> {'start', 'days', 'hits', 'avg_sql'} : `start` = premier jour actif,
+    `days` = écarts successifs en jours (0 pour le premier) ; jours sans requête omis.
+    """
+    if pack not in PACKINGS:
+        raise ValueError(f"Encodage inconnu: {pack} (choix: varint)")
+    start, previous = None, None
+    days, hits, avg_sql = [], [], []
+    for d in sorted(history):
+        h = history[d]
+        n = hits_of(h)
+        if not n: continue
+        current = day_number(d)
+        if previous is None:
+            start, previous = d, current
+        days.append(current - previous)
+        previous = current
+        hits.append(n)
+        avg_sql.append(round(h.avg_sql, 1))
+    if pack == 'varint':
+        return {
+            'start': start, 'encoding': 'varint', 'scale': AVG_SQL_SCALE,
+            'days': encode_varints(days), 'hits': encode_varints(hits),
+            'avg_sql': encode_varints(int(round(v * AVG_SQL_SCALE)) for v in avg_sql),
+        }
+    return {'start': start, 'days': days, 'hits': hits, 'avg_sql': avg_sql}
+
+
+def expand(sparse, dates):
+    """Inverse côté Python : [{'date', 'hits', 'avg_sql'}] sur l'axe `dates` (jours absents à 0)."""
+    days, hits, avg_sql = sparse['days'], sparse['hits'], sparse['avg_sql']
+    if sparse.get('encoding') == 'varint':
+        days, hits = decode_varints(days), decode_varints(hits)
+        avg_sql = [v / sparse['scale'] for v in decode_varints(avg_sql)]
+    position = {}
+    if sparse['start'] is not None:
+        current = day_number(sparse['start'])
+        for i, delta in enumerate(days):
+            current += delta
+            position[current] = i
+    rows = []
+    for d in dates:
+        i = position.get(day_number(d))
+        rows.append({'date': d, 'hits': hits[i] if i is not None else 0, 'avg_sql': avg_sql[i] if i is not None else 0})
+    return rows
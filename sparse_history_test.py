@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Aller-retour de l'historique creux : expand(encode(historique)) doit redonner, jour par
+jour, les lignes denses { date, hits, avg_sql } de l'axe de dates (jours absents à 0),
+en mode liste comme en mode varint.
+Usage : python -m pytest -q sparse_history_test.py
+"""
+
+import tempfile
+from datetime import date, timedelta
+
+import sparse_history
+from aggregates import HistoryBucket
+from loggen import LogGenerator
+from remote_analyzer import EnterpriseMonitor
+
+
+def dense(history, dates):
+    """Historique dense de référence, une ligne par date de l'axe."""
+    rows = []
+    for d in dates:
+        h = history.get(d)
+        hits = h.hits if h is not None else 0
+        rows.append({'date': d, 'hits': hits, 'avg_sql': round(h.avg_sql, 1) if hits else 0})
+    return rows
+
+
+def assert_roundtrip(history, dates):
+    for pack in sparse_history.PACKINGS:
+        sparse = sparse_history.encode(history, lambda h: h.hits, pack)
+        assert sparse_history.expand(sparse, dates) == dense(history, dates), pack
+
+
+def bucket(hits, sql_sum):
+    h = HistoryBucket()
+    h.hits, h.sql_sum = hits, sql_sum
+    return h
+
+
+def test_varints_roundtrip():
+    values = [0, 1, 127, 128, 300, 16383, 16384, 2 ** 31, 2 ** 40 + 5]
+    assert sparse_history.decode_varints(sparse_history.encode_varints(values)) == values
+    assert sparse_history.decode_varints(sparse_history.encode_varints([])) == []
+
+
+def test_gaps_and_empty_days():
+    start = date(2025, 12, 20)
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(40)]
+    history = {
+        dates[0]: bucket(3, 10),
+        dates[1]: bucket(0, 0),            # Jour présent mais sans requête : omis, réétalé à 0
+        dates[12]: bucket(250_000, 1_234_567),
+        dates[13]: bucket(1, 0),
+        dates[39]: bucket(7, 22),
+    }
+    assert_roundtrip(history, dates)
+    assert_roundtrip({}, dates)
+
+
+def test_parsed_endpoint_histories():
+    with tempfile.TemporaryDirectory() as directory:
+        files = LogGenerator(paths=150, ips=300, days=9, seed=21).write(directory, 6000)
+        monitor = EnterpriseMonitor()
+        monitor.parse_logs(files)
+    dates = sorted(monitor.stats['daily'])
+    for endpoint in monitor.stats['endpoints'].values():
+        assert_roundtrip(endpoint.history, dates)